@@ -1,43 +1,28 @@
 from flask import Flask
-import sqlite3
 import os
+from app import session_store
 
 app = Flask(__name__, template_folder='app/templates')
 
 # Debug: Print template folder path
 print("Template folder:", os.path.abspath(app.template_folder))
 
-# Configuration
-UPLOAD_FOLDER = 'uploads'
-LOG_DB = 'logs/analyzer.db'
+# Configuration; analyzed code is only kept on disk when UPLOAD_RETENTION_DIR is set
+UPLOAD_FOLDER = os.getenv("UPLOAD_RETENTION_DIR") or None
+LOG_DB = session_store.DB_PATH
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 # Ensure directories exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+if UPLOAD_FOLDER:
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs('logs', exist_ok=True)
 
-def init_db():
-    """Initialize SQLite database for analysis logs."""
-    conn = sqlite3.connect(LOG_DB)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sessions (
-            session_id TEXT PRIMARY KEY,
-            created_at DATETIME,
-            original_code TEXT,
-            analysis_results TEXT,
-            optimized_code TEXT,
-            conversation_history TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
 # Initialize database
-init_db()
+session_store.init_db(LOG_DB)
 
 # Register blueprints
-from app.routes import routes
+from app.routes import routes, UploadLimitedRequest
+app.request_class = UploadLimitedRequest
 app.register_blueprint(routes)
 
 if __name__ == '__main__':
@@ -1,43 +1,34 @@
 from flask import Flask
-import sqlite3
 import os
-from app.routes import routes
+import threading
+from app.routes import routes, UploadLimitedRequest
+from app import session_store
 
 def create_app():
     """Create and configure the Flask application."""
-    app = Flask(__name__, template_folder='app/templates')
+    app = Flask(__name__, template_folder='templates')
+    app.request_class = UploadLimitedRequest
     
     # Debug: Print template folder path
     print("Template folder:", os.path.abspath(app.template_folder))
     
-    # Configuration
-    UPLOAD_FOLDER = 'Uploads'
-    LOG_DB = 'logs/analyzer.db'
+    # Configuration; analyzed code is only kept on disk when UPLOAD_RETENTION_DIR is set
+    UPLOAD_FOLDER = os.getenv("UPLOAD_RETENTION_DIR") or None
+    LOG_DB = session_store.DB_PATH
     app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
     
     # Ensure directories exist
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    if UPLOAD_FOLDER:
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     os.makedirs('logs', exist_ok=True)
     
-    def init_db():
-        """Initialize SQLite database for analysis logs."""
-        conn = sqlite3.connect(LOG_DB)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                session_id TEXT PRIMARY KEY,
-                created_at DATETIME,
-                original_code TEXT,
-                analysis_results TEXT,
-                optimized_code TEXT,
-                conversation_history TEXT
-            )
-        ''')
-        conn.commit()
-        conn.close()
-    
     # Initialize database
-    init_db()
+    session_store.init_db(LOG_DB)
+    
+    # Heavy analyzer imports are lazy; optionally pay for them in the background at startup
+    if os.getenv("ANALYZER_WARMUP") == "1":
+        from app.analyzer import warm_up
+        threading.Thread(target=warm_up, name="analyzer-warmup", daemon=True).start()
     
     # Register blueprints
     app.register_blueprint(routes)
@@ -1,117 +1,138 @@
-import os
 import json
+import time
 import sqlite3
-from openai import OpenAI
+from concurrent.futures import wait
 from tenacity import retry, stop_after_attempt, wait_exponential
 from dotenv import load_dotenv
+from app.llm import chat_completion, stream_chat_completion, is_json_block
+from app import session_store, safety
+from app.metrics import SQLITE_SECONDS, record_retry
+from app.prompt_budget import count_tokens, compact_history, REGENERATE_PROMPT_BUDGET
+from app.chunking import chunk_module, merge_chunk_results, AI_CHUNK_TOKENS, AI_CHUNK_WORKERS, AI_CHUNK_RESPONSE_TOKENS
+from app.workers import get_executor
 
 load_dotenv()
 
-# Debug: Print environment variables
-print("OPENAI_API_KEY:", os.getenv("OPENAI_API_KEY"))
-print("HTTP_PROXY:", os.getenv("HTTP_PROXY"))
-print("HTTPS_PROXY:", os.getenv("HTTPS_PROXY"))
+DEADLINE_EXCEEDED_ERROR = "AI analysis stopped: request deadline exceeded"
 
-# Initialize OpenAI client with minimal arguments
-try:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    print("OpenAI client initialized successfully")
-except Exception as e:
-    print("OpenAI client initialization failed:", str(e))
-    raise
+def _past_deadline(retry_state):
+    """tenacity stop condition: no more retries once the call's deadline= has passed."""
+    deadline = retry_state.kwargs.get("deadline")
+    return deadline is not None and time.monotonic() >= deadline
 
 def get_db():
-    """Get SQLite database connection."""
-    conn = sqlite3.connect('logs/analyzer.db')
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def validate_code_content(code):
-    """Check for potentially harmful code."""
-    dangerous_patterns = [
-        "eval(",
-        "exec(",
-        "os.system(",
-        "subprocess.run(",
-        "subprocess.call(",
-        "subprocess.Popen(",
-        "__import__('os').system(",
-        "__import__('subprocess')."
-    ]
-    for pattern in dangerous_patterns:
-        if pattern in code:
-            return {"is_safe": False, "message": f"Potentially harmful code detected: {pattern}"}
-    return {"is_safe": True}
+    """Get this thread's pooled SQLite connection; callers must not close it."""
+    return session_store.get_connection()
 
+def validate_code_content(code, tree=None):
+    """Check for potentially harmful code (cached per source, so repeat checks are cheap)."""
+    return safety.check_code(code, tree)
+
+@SQLITE_SECONDS.time("sessions", "write")
 def save_session(session_id, original_code, analysis_results, optimized_code):
-    """Save session data to SQLite."""
+    """Save session data to SQLite.
+
+    An existing session is updated in place: an AI stage that finishes after
+    the request gave up on it must not wipe the stored artifacts or turns, nor
+    overwrite code the user has since regenerated.
+    """
     conn = get_db()
     cursor = conn.cursor()
     cursor.execute(
         """
-        CREATE TABLE IF NOT EXISTS sessions (
-            session_id TEXT PRIMARY KEY,
-            created_at TEXT,
-            original_code TEXT,
-            analysis_results TEXT,
-            optimized_code TEXT,
-            conversation_history TEXT
-        )
-        """
-    )
-    cursor.execute(
-        """
-        INSERT OR REPLACE INTO sessions (session_id, created_at, original_code, analysis_results, optimized_code, conversation_history)
+        INSERT INTO sessions (session_id, created_at, original_code, analysis_results, optimized_code, conversation_history)
         VALUES (?, datetime('now'), ?, ?, ?, ?)
+        ON CONFLICT(session_id) DO UPDATE SET
+            original_code = excluded.original_code,
+            analysis_results = excluded.analysis_results,
+            optimized_code = CASE
+                WHEN EXISTS (SELECT 1 FROM conversation_turns WHERE session_id = excluded.session_id)
+                THEN sessions.optimized_code ELSE excluded.optimized_code END
         """,
         (session_id, original_code, json.dumps(analysis_results), optimized_code, json.dumps([]))
     )
     conn.commit()
-    conn.close()
+    session_store.maybe_sweep_expired_sessions(conn)
 
-def load_session(session_id):
-    """Load session data from SQLite."""
+@SQLITE_SECONDS.time("sessions", "read")
+def load_session(session_id, history_limit=None):
+    """Load session data from SQLite (only the last history_limit turns, if given)."""
     conn = get_db()
     cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
     cursor.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,))
     result = cursor.fetchone()
-    conn.close()
     if result:
         return {
             "session_id": result["session_id"],
             "original_code": result["original_code"],
             "ai_analysis": json.loads(result["analysis_results"]),
             "optimized_code": result["optimized_code"],
-            "conversation_history": json.loads(result["conversation_history"])
+            "conversation_history": load_conversation_turns(session_id, history_limit),
+            "static_analysis": _load_json_column(result, "static_results"),
+            "readability_analysis": _load_json_column(result, "readability_results"),
+            "complexity": _load_json_column(result, "complexity_data")
         }
     return None
 
+def _load_json_column(row, column):
+    """Decode an optional JSON column; None if it is missing or empty."""
+    if column not in row.keys() or row[column] is None:
+        return None
+    return json.loads(row[column])
+
+@SQLITE_SECONDS.time("sessions", "write")
+def save_analysis_artifacts(session_id, static_result, readability_result, complexity):
+    """Persist static, readability and complexity results for a session."""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE sessions SET static_results = ?, readability_results = ?, complexity_data = ? WHERE session_id = ?",
+        (json.dumps(static_result), json.dumps(readability_result), json.dumps(complexity), session_id)
+    )
+    conn.commit()
+
+@SQLITE_SECONDS.time("sessions", "read")
+def load_conversation_turns(session_id, limit=None):
+    """Return a session's turns oldest first; only the most recent `limit` if given."""
+    conn = get_db()
+    rows = conn.execute(
+        "SELECT user_command, response FROM ("
+        "SELECT seq, user_command, response FROM conversation_turns WHERE session_id = ? "
+        "ORDER BY seq DESC LIMIT ?) ORDER BY seq",
+        (session_id, -1 if limit is None else limit)
+    ).fetchall()
+    return [{"user_command": row[0], "response": row[1]} for row in rows]
+
+@SQLITE_SECONDS.time("sessions", "write")
 def update_session(session_id, new_optimized_code, user_command):
-    """Update session with new optimized code and conversation history."""
+    """Update session with new optimized code and append one conversation turn."""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute("SELECT conversation_history FROM sessions WHERE session_id = ?", (session_id,))
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
+    cursor.execute("UPDATE sessions SET optimized_code = ? WHERE session_id = ?", (new_optimized_code, session_id))
+    if cursor.rowcount == 0:
+        conn.rollback()
         return
-    history = json.loads(row["conversation_history"])
-    history.append({"user_command": user_command, "response": new_optimized_code})
     cursor.execute(
-        "UPDATE sessions SET optimized_code = ?, conversation_history = ? WHERE session_id = ?",
-        (new_optimized_code, json.dumps(history), session_id)
+        """
+        INSERT INTO conversation_turns (session_id, seq, created_at, user_command, response)
+        SELECT ?, COALESCE(MAX(seq), 0) + 1, datetime('now'), ?, ?
+        FROM conversation_turns WHERE session_id = ?
+        """,
+        (session_id, user_command, new_optimized_code, session_id)
     )
     conn.commit()
-    conn.close()
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def analyze_code_with_ai(code, session_id):
-    """Analyze code using OpenAI's gpt-4o-mini."""
-    validation_result = validate_code_content(code)
-    if not validation_result["is_safe"]:
-        return {"error": validation_result["message"]}
-    
-    prompt = (
+def build_analysis_prompt(code, chunk=None):
+    """Build the analysis prompt for a whole file, or for one chunk of a larger file."""
+    excerpt = ""
+    if chunk is not None:
+        excerpt = (
+            f"The code is lines {chunk.start_line}-{chunk.end_line} of a larger module. "
+            "Give line numbers relative to this excerpt, counting its first line as 1, "
+            "and put only the optimized version of this excerpt in 'optimized_code'. "
+        )
+    return (
         "You are a Python code analysis assistant. Analyze the following Python code for potential bugs, maintenance issues, and refactoring opportunities. "
         "Return a JSON object with the following fields: "
         "1. 'bugs': A list of objects with 'line_number', 'description', and 'severity' (high, medium, low). "
@@ -119,32 +140,90 @@ def analyze_code_with_ai(code, session_id):
         "3. 'optimized_code': A string containing the optimized version of the code. "
         "4. 'issues_severity': A list of objects with 'issue' and 'severity'. "
         "Ensure the response is valid JSON, enclosed in ```json\n...\n```. Do not include additional text outside the JSON. "
+        f"{excerpt}"
         f"Code: ```\n{code}\n```"
     )
+
+@retry(stop=stop_after_attempt(3) | _past_deadline, wait=wait_exponential(multiplier=1, min=4, max=10), before_sleep=record_retry, reraise=True)
+def request_analysis(code, use_cache=True, chunk=None, max_tokens=1500, deadline=None):
+    """Send one analysis prompt and parse the JSON reply; API errors are retried, then propagate.
+
+    With a `deadline` (a time.monotonic() value, passed by keyword) nothing is sent
+    or retried once it has passed.
+    """
+    if deadline is not None and time.monotonic() >= deadline:
+        return {"error": DEADLINE_EXCEEDED_ERROR}
+    result = chat_completion(build_analysis_prompt(code, chunk), max_tokens=max_tokens, use_cache=use_cache, operation="analysis")
+    print("Raw OpenAI response:", result)  # Debug
+    
+    # Extract JSON from ```json``` block
+    if is_json_block(result):
+        result = result[7:-4].strip()
+    else:
+        return {"error": "AI response not in expected JSON format"}
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": prompt}
-            ],
-            max_tokens=1500,
-            temperature=0.3
-        )
-        result = response.choices[0].message.content
-        print("Raw OpenAI response:", result)  # Debug
-        
-        # Extract JSON from ```json``` block
-        if result.startswith("```json\n") and result.endswith("\n```"):
-            result = result[7:-4].strip()
+        return json.loads(result)
+    except json.JSONDecodeError as e:
+        print("JSON parsing error:", str(e))
+        return {"error": f"Invalid AI response format: {str(e)}"}
+
+def analyze_chunk(chunk, use_cache=True, deadline=None):
+    """Analyze one chunk; failures come back as an error dict."""
+    try:
+        return request_analysis(chunk.code, use_cache, chunk=chunk, max_tokens=AI_CHUNK_RESPONSE_TOKENS, deadline=deadline)
+    except Exception as e:
+        print("OpenAI API error (chunk):", str(e))
+        return {"error": f"OpenAI API failed: {str(e)}"}
+
+def analyze_in_chunks(code, use_cache=True, max_tokens=None, max_workers=None, deadline=None):
+    """Analyze a large module chunk by chunk in parallel and merge the findings.
+
+    Once `deadline` passes, chunks still queued are cancelled and an error is returned.
+    """
+    try:
+        chunks = chunk_module(code, max_tokens=max_tokens or AI_CHUNK_TOKENS)
+    except SyntaxError:
+        chunks = []
+    if len(chunks) < 2:
+        return request_analysis(code, use_cache, deadline=deadline)
+    
+    # A pool of its own: this may already be running on the shared LLM pool
+    executor = get_executor("ai-chunks", max_workers or AI_CHUNK_WORKERS)
+    futures = [executor.submit(analyze_chunk, chunk, use_cache, deadline) for chunk in chunks]
+    timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+    not_done = wait(futures, timeout=timeout).not_done
+    if not_done:
+        # Don't spend tokens on an answer nobody is waiting for
+        for future in not_done:
+            future.cancel()
+        return {"error": DEADLINE_EXCEEDED_ERROR}
+    results = [future.result() for future in futures]
+    if all("error" in result for result in results):
+        return {"error": results[0]["error"]}
+    return merge_chunk_results(chunks, results)
+
+def analyze_code_with_ai(code, session_id, use_cache=True, chunked=None, deadline=None):
+    """Analyze code using OpenAI's gpt-4o-mini (set use_cache=False to force a fresh call).
+
+    Files larger than AI_CHUNK_TOKENS are analyzed in chunks unless chunked is set explicitly.
+    No request is sent or retried after `deadline` (a time.monotonic() value).
+    """
+    validation_result = validate_code_content(code)
+    if not validation_result["is_safe"]:
+        return {"error": validation_result["message"]}
+    
+    if chunked is None:
+        # Tokens never outnumber characters, so short code skips the count
+        chunked = len(code) > AI_CHUNK_TOKENS and count_tokens(code) > AI_CHUNK_TOKENS
+    
+    try:
+        if chunked:
+            parsed_result = analyze_in_chunks(code, use_cache, deadline=deadline)
         else:
-            return {"error": "AI response not in expected JSON format"}
-        
-        try:
-            parsed_result = json.loads(result)
-        except json.JSONDecodeError as e:
-            print("JSON parsing error:", str(e))
-            return {"error": f"Invalid AI response format: {str(e)}"}
+            parsed_result = request_analysis(code, use_cache, deadline=deadline)
+        if "error" in parsed_result:
+            return parsed_result
         
         optimized_code = parsed_result.get("optimized_code", code)
         save_session(session_id, code, parsed_result, optimized_code)
@@ -154,54 +233,100 @@ def analyze_code_with_ai(code, session_id):
         print("OpenAI API error:", str(e))
         return {"error": f"OpenAI API failed: {str(e)}"}
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def regenerate_code(session_id, user_command):
-    """Regenerate optimized code based on user command."""
+def build_regenerate_prompt(session, user_command, token_budget=None):
+    """Build the regeneration prompt from a loaded session, compacting history to fit the token budget.
+
+    Returns (prompt, report), where report describes the tokens saved by compaction.
+    """
+    def render(history):
+        return (
+            f"You are a Python code optimization assistant. "
+            f"Original code: ```\n{session['original_code']}\n```. "
+            f"Previous optimized code: ```\n{session['optimized_code']}\n```. "
+            f"Conversation history: {json.dumps(history)}. "
+            f"User request: '{user_command}'. "
+            "Return a JSON object with: "
+            "'optimized_code': The updated optimized code, "
+            "'explanation': A string explaining the changes. "
+            "Ensure the response is valid JSON, enclosed in ```json\n...\n```."
+        )
+    
+    history, report = compact_history(
+        session["conversation_history"],
+        token_budget or REGENERATE_PROMPT_BUDGET,
+        reserved_tokens=count_tokens(render([])) - count_tokens("[]")
+    )
+    print("Regenerate prompt budget:", report)  # Debug
+    return render(history), report
+
+def apply_regeneration(session_id, session, user_command, result):
+    """Parse a raw regeneration response and record it in the session."""
+    print("Raw OpenAI response (regenerate):", result)  # Debug
+    
+    # Extract JSON from ```json``` block
+    if is_json_block(result):
+        result = result[7:-4].strip()
+    else:
+        return {"error": "AI response not in expected JSON format"}
+    
+    try:
+        parsed_result = json.loads(result)
+    except json.JSONDecodeError as e:
+        print("JSON parsing error (regenerate):", str(e))
+        return {"error": f"Invalid AI response format: {str(e)}"}
+    
+    new_optimized_code = parsed_result.get("optimized_code", session["optimized_code"])
+    update_session(session_id, new_optimized_code, user_command)
+    return parsed_result
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), before_sleep=record_retry, reraise=True)
+def request_regeneration(prompt, use_cache=True):
+    """Send a regeneration prompt and return the raw reply; API errors are retried, then propagate."""
+    return chat_completion(prompt, max_tokens=1500, use_cache=use_cache, operation="regenerate")
+
+def regenerate_code(session_id, user_command, use_cache=True):
+    """Regenerate optimized code based on user command (set use_cache=False to force a fresh call)."""
     session = load_session(session_id)
     if not session:
         return {"error": "Session not found"}
     
-    original_code = session["original_code"]
-    optimized_code = session["optimized_code"]
-    history = session["conversation_history"]
-    
-    prompt = (
-        f"You are a Python code optimization assistant. "
-        f"Original code: ```\n{original_code}\n```. "
-        f"Previous optimized code: ```\n{optimized_code}\n```. "
-        f"Conversation history: {json.dumps(history)}. "
-        f"User request: '{user_command}'. "
-        "Return a JSON object with: "
-        "'optimized_code': The updated optimized code, "
-        "'explanation': A string explaining the changes. "
-        "Ensure the response is valid JSON, enclosed in ```json\n...\n```."
-    )
+    prompt, budget_report = build_regenerate_prompt(session, user_command)
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": prompt}],
-            max_tokens=1500,
-            temperature=0.3
-        )
-        result = response.choices[0].message.content
-        print("Raw OpenAI response (regenerate):", result)  # Debug
-        
-        # Extract JSON from ```json``` block
-        if result.startswith("```json\n") and result.endswith("\n```"):
-            result = result[7:-4].strip()
-        else:
-            return {"error": "AI response not in expected JSON format"}
-        
-        try:
-            parsed_result = json.loads(result)
-            new_optimized_code = parsed_result.get("optimized_code", optimized_code)
-            update_session(session_id, new_optimized_code, user_command)
-            return parsed_result
-        except json.JSONDecodeError as e:
-            print("JSON parsing error (regenerate):", str(e))
-            return {"error": f"Invalid AI response format: {str(e)}"}
-    
+        result = request_regeneration(prompt, use_cache)
+        parsed_result = apply_regeneration(session_id, session, user_command, result)
+        if "error" not in parsed_result:
+            parsed_result["prompt_budget"] = budget_report
+        return parsed_result
     except Exception as e:
         print("OpenAI API error (regenerate):", str(e))
-        return {"error": f"OpenAI API failed: {str(e)}"}
\ No newline at end of file
+        return {"error": f"OpenAI API failed: {str(e)}"}
+
+def stream_regenerate_code(session_id, user_command, use_cache=True):
+    """Regenerate optimized code, yielding ("delta", text) events as tokens arrive.
+
+    Ends with ("result", parsed_json) once the session has been updated, or ("error", message).
+    """
+    session = load_session(session_id)
+    if not session:
+        yield "error", "Session not found"
+        return
+    
+    prompt, budget_report = build_regenerate_prompt(session, user_command)
+    chunks = []
+    try:
+        for text in stream_chat_completion(prompt, max_tokens=1500, use_cache=use_cache, operation="regenerate"):
+            chunks.append(text)
+            yield "delta", text
+    except Exception as e:
+        print("OpenAI API error (regenerate stream):", str(e))
+        yield "error", f"OpenAI API failed: {str(e)}"
+        return
+    
+    # Persist only once the whole response has arrived
+    result = apply_regeneration(session_id, session, user_command, ''.join(chunks))
+    if "error" in result:
+        yield "error", result["error"]
+    else:
+        result["prompt_budget"] = budget_report
+        yield "result", result
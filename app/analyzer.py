@@ -1,94 +1,148 @@
-import ast
-from flake8.api import legacy as flake8
-import radon.complexity as radon_cc
-import radon.metrics as radon_metrics
-import json
 import os
-import tempfile
-import subprocess
+import functools
+import pylint
+import flake8
+import radon
+from app.cache import static_cache, make_cache_key
+from app.parsing import parse_module
+from app.linters import get_pylint_engine, get_flake8_engine, lint_config_fingerprint, FLAKE8_CODE_PREFIXES
+from app.pipeline import Stage, run_pipeline, make_deadline, STAGE_DONE, STAGE_TIMEOUT
 
-def analyze_code_static(code):
-    """Perform static analysis on Python code."""
-    try:
-        # Validate syntax
-        ast.parse(code)
-    except SyntaxError as e:
-        return {"error": f"Invalid Python code: {str(e)}"}
-    
-    # Ensure code ends with a newline
-    if not code.endswith('\n'):
-        code += '\n'
-    
-    # Temporary file for analysis
-    with tempfile.NamedTemporaryFile(suffix='.py', delete=False, mode='w', encoding='utf-8') as temp_file:
-        temp_file.write(code)
-        temp_file_path = temp_file.name
-    print("Temp file path:", temp_file_path)  # Debug
+# Bump when the shape of analyze_code_static results changes
+STATIC_RESULT_VERSION = 3
+
+# Run the independent analyzers side by side unless STATIC_ANALYSIS_PARALLEL=0
+STATIC_ANALYSIS_PARALLEL = os.getenv("STATIC_ANALYSIS_PARALLEL", "1") != "0"
+STATIC_ANALYSIS_WORKERS = int(os.getenv("STATIC_ANALYSIS_WORKERS", "3"))
+# "process" runs each tool in a sandbox worker that is killed when it overruns its
+# time or memory limit; "thread" runs in-process, where an overrunning tool is only abandoned
+STATIC_ANALYSIS_ISOLATION = os.getenv("STATIC_ANALYSIS_ISOLATION", "process")
+# Per-tool limits; memory is headroom above the sandbox worker's own footprint
+STATIC_TOOL_TIMEOUTS = {
+    "pylint": float(os.getenv("PYLINT_TIMEOUT_SECONDS", "30")),
+    "flake8": float(os.getenv("FLAKE8_TIMEOUT_SECONDS", "15")),
+    "radon": float(os.getenv("RADON_TIMEOUT_SECONDS", "15")),
+}
+STATIC_TOOL_MEMORY_MB = int(os.getenv("STATIC_TOOL_MEMORY_MB", "512"))
+
+def static_cache_key(code):
+    """Cache key for code under the current linter versions and configuration."""
+    return make_cache_key(
+        code,
+        STATIC_RESULT_VERSION,
+        {"pylint": pylint.__version__, "flake8": flake8.__version__, "radon": radon.__version__},
+        lint_config_fingerprint()
+    )
+
+def analyze_code_static(code, use_cache=True, parallel=None, parsed=None, deadline=None, isolation=None):
+    """Perform static analysis on Python code, reusing cached results for identical source.
+
+    Pass the request's ParsedModule as `parsed` to avoid parsing the code again.
+    Each tool runs under its own time limit and the request `deadline` (a
+    time.monotonic() value); a tool that overruns is reported in "warnings" and
+    "stages" while the other tools' findings are still returned.
+    """
+    if not use_cache:
+        return _run_static_analysis(code, parallel, parsed, deadline, isolation)[0]
     
-    result = {"complexity": {}, "style_issues": [], "warnings": []}
+    key = static_cache_key(code)
+    cached = static_cache.get(key)
+    if cached is not None:
+        return cached
     
-    # Pylint analysis
-    try:
-        pylint_version = subprocess.run(['pylint', '--version'], capture_output=True, text=True, check=True)
-        print("Pylint version:", pylint_version.stdout)  # Debug
-        
-        pylint_cmd = ['pylint', '--output-format=json', '--disable=invalid-name', temp_file_path]
-        pylint_result = subprocess.run(pylint_cmd, capture_output=True, text=True)
-        pylint_raw_output = pylint_result.stdout
-        print("Pylint raw output:", pylint_raw_output)  # Debug
-        print("Pylint stderr:", pylint_result.stderr)  # Debug
-        
-        if pylint_result.returncode & 32:
-            result["warnings"].append({"line": 0, "message": f"Pylint failed with exit code {pylint_result.returncode}: {pylint_result.stderr}"})
-        elif not pylint_raw_output.strip():
-            result["warnings"].append({"line": 0, "message": "Pylint produced no output"})
+    result, failed_tools = _run_static_analysis(code, parallel, parsed, deadline, isolation)
+    # Don't pin a transient tool failure in the cache
+    if not failed_tools:
+        static_cache.set(key, result)
+    return result
+
+def warm_up():
+    """Build the lint engines (and start the sandbox workers) ahead of the first request."""
+    analyze_code_static("x = 1\n", use_cache=False)
+
+def _pylint_issues(source):
+    """Collect pylint findings."""
+    return [
+        {"line": issue.line, "message": issue.msg}
+        for issue in get_pylint_engine().check(source)
+    ]
+
+def _flake8_issues(source):
+    """Collect flake8 findings with their real line numbers."""
+    return [
+        {"line": violation.line_number, "message": violation.text}
+        for violation in get_flake8_engine().check(source)
+        if violation.code.startswith(FLAKE8_CODE_PREFIXES)
+    ]
+
+def _radon_complexity(parsed):
+    """Compute cyclomatic complexity with radon from the shared AST."""
+    return {
+        "functions": parsed.function_complexity,
+        "module_complexity": parsed.module_complexity
+    }
+
+# (name, label used in failure warnings, analyzer); results are merged in this order
+STATIC_ANALYZERS = [
+    ("pylint", "Pylint", _pylint_issues),
+    ("flake8", "Flake8", _flake8_issues),
+    ("radon", "Radon", _radon_complexity),
+]
+# Analyzers that take the source text rather than the ParsedModule; only these run in the
+# sandbox, so a worker never parses the code again (radon reads the request's own AST)
+SOURCE_ANALYZERS = {"pylint", "flake8"}
+
+def _in_process_tool(analyzer, key, context):
+    return analyzer(context[key])
+
+def _tool_stages(isolation):
+    """Pipeline stages for the analyzers in STATIC_ANALYZERS."""
+    stages = []
+    for name, _, analyzer in STATIC_ANALYZERS:
+        timeout = STATIC_TOOL_TIMEOUTS.get(name, max(STATIC_TOOL_TIMEOUTS.values()))
+        if name not in SOURCE_ANALYZERS:
+            stages.append(Stage(name, functools.partial(_in_process_tool, analyzer, "parsed"), timeout, None, (), False))
+        elif isolation == "process":
+            stages.append(Stage(name, analyzer, timeout, STATIC_TOOL_MEMORY_MB, (), True))
         else:
-            try:
-                pylint_issues = json.loads(pylint_raw_output)
-                style_issues = [
-                    {"line": issue["line"], "message": issue["message"]}
-                    for issue in pylint_issues
-                ]
-                result["style_issues"].extend(style_issues)
-                result["warnings"].extend(style_issues)
-            except json.JSONDecodeError as e:
-                result["warnings"].append({"line": 0, "message": f"Pylint output invalid JSON: {str(e)}"})
-    except subprocess.CalledProcessError as e:
-        result["warnings"].append({"line": 0, "message": f"Pylint subprocess failed: {str(e)}"})
-    except Exception as e:
-        result["warnings"].append({"line": 0, "message": f"Pylint failed: {str(e)}"})
+            stages.append(Stage(name, functools.partial(_in_process_tool, analyzer, "code"), timeout, None, (), False))
+    return stages
+
+def _run_static_analysis(code, parallel=None, parsed=None, deadline=None, isolation=None):
+    """Run pylint, flake8 and radon; return the result and the names of tools that failed."""
+    if parsed is None:
+        try:
+            # Validate syntax
+            parsed = parse_module(code)
+        except SyntaxError as e:
+            return {"error": f"Invalid Python code: {str(e)}"}, []
     
-    # Flake8 analysis
-    try:
-        flake8_style = flake8.get_style_guide()
-        flake8_report = flake8_style.check_files([temp_file_path])
-        flake8_issues = [
-            {"line": error.line_number, "message": error.text}
-            for error in flake8_report.get_statistics('E')
-        ]
-        result["style_issues"].extend(flake8_issues)
-        result["warnings"].extend(flake8_issues)
-    except Exception as e:
-        result["warnings"].append({"line": 0, "message": f"Flake8 failed: {str(e)}"})
+    if parallel is None:
+        parallel = STATIC_ANALYSIS_PARALLEL
     
-    # Radon complexity analysis
-    try:
-        cc_results = radon_cc.cc_visit(code)
-        result["complexity"] = {
-            "functions": [
-                {"name": block.name, "complexity": block.complexity}
-                for block in cc_results
-                if block.classname is None  # Exclude classes
-            ],
-            "module_complexity": sum(block.complexity for block in cc_results)
-        }
-    except Exception as e:
-        result["warnings"].append({"line": 0, "message": f"Radon failed: {str(e)}"})
+    report = run_pipeline(
+        _tool_stages(isolation or STATIC_ANALYSIS_ISOLATION),
+        {"code": parsed.source, "parsed": parsed},
+        deadline=deadline or make_deadline(),
+        parallel=parallel,
+        pool="static-analysis",
+        pool_size=STATIC_ANALYSIS_WORKERS
+    )
     
-    # Clean up
-    try:
-        os.remove(temp_file_path)
-    except OSError:
-        pass
+    # Merge in a fixed order so parallel and sequential runs give identical results
+    result = {"complexity": {}, "style_issues": [], "warnings": [], "stages": {}}
+    failed_tools = []
+    for name, label, _ in STATIC_ANALYZERS:
+        state = report["stages"][name]
+        result["stages"][name] = {key: state[key] for key in ("status", "error") if key in state}
+        if state["status"] != STAGE_DONE:
+            verb = "stopped" if state["status"] == STAGE_TIMEOUT else "failed"
+            result["warnings"].append({"line": 0, "message": f"{label} {verb}: {state.get('error', 'unknown error')}"})
+            failed_tools.append(name)
+        elif name == "radon":
+            result["complexity"] = report["results"][name]
+        else:
+            result["style_issues"].extend(report["results"][name])
+            result["warnings"].extend(report["results"][name])
     
-    return result
\ No newline at end of file
+    return result, failed_tools
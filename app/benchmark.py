@@ -0,0 +1,278 @@
+"""Offline benchmarks: python -m app.benchmark [--sizes tiny,small] [-o results.json] [--baseline old.json]"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+import contextlib
+
+# Bump when the shape of the results file changes
+BENCHMARK_VERSION = 1
+# Synthetic corpus sizes in bytes, from a snippet up to the 5MB upload limit
+CORPUS_SIZES = {
+    "tiny": 512,
+    "small": 10 * 1024,
+    "medium": 100 * 1024,
+    "large": 1024 * 1024,
+    "max": 5 * 1024 * 1024,
+}
+BENCHMARK_STAGES = ["parse", "static", "chart", "route"]
+
+FUNCTION_TEMPLATES = [
+    "def compute_{n}(values, limit={k}):\n"
+    "    total = 0\n"
+    "    for index, value in enumerate(values):\n"
+    "        if value is None:\n"
+    "            continue\n"
+    "        elif value > limit and index % 2 == 0:\n"
+    "            total += value * {k}\n"
+    "        else:\n"
+    "            total -= value\n"
+    "    return total\n\n\n",
+    "class Record{n}:\n"
+    "    \"\"\"Synthetic record {n}.\"\"\"\n\n"
+    "    def __init__(self, name, size={k}):\n"
+    "        self.name = name\n"
+    "        self.size = size\n\n"
+    "    def describe(self):\n"
+    "        return f\"{{self.name}} ({{self.size}})\"\n\n"
+    "    def grow(self, amount):\n"
+    "        while amount > 0:\n"
+    "            self.size += 1\n"
+    "            amount -= 1\n"
+    "        return self.size\n\n\n",
+    "def lookup_{n}(mapping, keys):\n"
+    "    found = [mapping[key] for key in keys if key in mapping]\n"
+    "    try:\n"
+    "        return max(found) if found else {k}\n"
+    "    except TypeError:\n"
+    "        return None\n\n\n",
+]
+
+def make_corpus(size, seed=0):
+    """Deterministic, valid Python source of at most `size` bytes (at least one definition)."""
+    rng = random.Random(seed)
+    parts = ["import math\n\n\n"]
+    length = len(parts[0])
+    n = 0
+    while True:
+        block = rng.choice(FUNCTION_TEMPLATES).format(n=n, k=rng.randint(1, 99))
+        if length + len(block) > size and n:
+            break
+        parts.append(block)
+        length += len(block)
+        n += 1
+    return ''.join(parts)
+
+# What the stand-in LLM client answers every benchmark prompt with
+FAKE_LLM_RESPONSE = "```json\n" + json.dumps({
+    "bugs": [], "issues_severity": [], "refactoring_suggestions": [],
+    "score": 7, "justification": "Synthetic benchmark response"
+}) + "\n```"
+
+def _stage_totals():
+    from app.metrics import STAGE_SECONDS
+    return {labels[0]: totals for labels, totals in STAGE_SECONDS.totals().items()}
+
+def _substage_latencies(before, after):
+    """Mean seconds per observation of each instrumented stage between two snapshots."""
+    latencies = {}
+    for stage, (count, total) in after.items():
+        prev_count, prev_total = before.get(stage, (0, 0.0))
+        if count > prev_count:
+            latencies[stage] = (total - prev_total) / (count - prev_count)
+    return latencies
+
+def _summarize(corpus, code, stage, timings, peak, statuses, substages):
+    lines = code.count("\n")
+    median = statistics.median(timings)
+    return {
+        "corpus": corpus,
+        "bytes": len(code.encode('utf-8')),
+        "lines": lines,
+        "stage": stage,
+        "iterations": len(timings),
+        "latency_seconds": {
+            "min": min(timings),
+            "median": median,
+            "mean": statistics.fmean(timings),
+            "max": max(timings)
+        },
+        "throughput": {
+            "bytes_per_second": len(code) / median if median else None,
+            "lines_per_second": lines / median if median else None
+        },
+        "peak_memory_bytes": peak,
+        "statuses": statuses,
+        "substages_seconds": substages
+    }
+
+def _measure(fn, variants, trace_memory):
+    """Run fn over each code variant; return (timings, peak traced bytes, last result, substage latencies)."""
+    timings = []
+    result = None
+    before = _stage_totals()
+    for code in variants:
+        start = time.perf_counter()
+        result = fn(code)
+        timings.append(time.perf_counter() - start)
+    substages = _substage_latencies(before, _stage_totals())
+    peak = None
+    if trace_memory:
+        # A separate pass: tracing slows allocation-heavy code too much to time it at once
+        tracemalloc.start()
+        try:
+            fn(variants[0] + "\n# memory pass\n")
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return timings, peak, result, substages
+
+def run_benchmarks(sizes=None, stages=None, iterations=3, llm_latency=0.05, isolation="process", trace_memory=True):
+    """Benchmark each stage over each corpus size; return the results document."""
+    from app import llm, analyzer
+    from app.parsing import parse_module
+    from app.visualize import create_complexity_chart
+
+    sizes = sizes or list(CORPUS_SIZES)
+    stages = stages or BENCHMARK_STAGES
+    fake = llm.StandInChatClient(default=FAKE_LLM_RESPONSE, latency=llm_latency)
+    previous_client = llm.use_client(fake)
+    previous_isolation = analyzer.STATIC_ANALYSIS_ISOLATION
+    analyzer.STATIC_ANALYSIS_ISOLATION = isolation
+    results = []
+    try:
+        client = None
+        if "route" in stages:
+            from app import create_app
+            client = create_app().test_client()
+        for corpus in sizes:
+            base = make_corpus(CORPUS_SIZES[corpus])
+            # A unique trailing comment per run defeats every cache, so each run measures cold work
+            variants = [f"{base}# run {i}\n" for i in range(iterations)]
+            stage_fns = {
+                "parse": parse_module,
+                "static": lambda code: analyzer.analyze_code_static(code, use_cache=False, isolation=isolation),
+                "chart": create_complexity_chart,
+                "route": lambda code: client.post('/analyze_code', data={'code': code}),
+            }
+            for stage in stages:
+                print(f"Benchmarking {stage} on {corpus} ({len(base)} bytes)", file=sys.stderr)
+                timings, peak, result, substages = _measure(stage_fns[stage], variants, trace_memory)
+                statuses = {}
+                if stage == "static":
+                    statuses = {name: state["status"] for name, state in result.get("stages", {}).items()}
+                elif stage == "route":
+                    statuses = {"http": result.status_code}
+                results.append(_summarize(corpus, base, stage, timings, peak, statuses, substages))
+    finally:
+        llm.use_client(previous_client)
+        analyzer.STATIC_ANALYSIS_ISOLATION = previous_isolation
+
+    import pylint, flake8, radon
+    return {
+        "version": BENCHMARK_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pylint": pylint.__version__,
+            "flake8": flake8.__version__,
+            "radon": radon.__version__
+        },
+        "config": {
+            "iterations": iterations,
+            "llm_latency_seconds": llm_latency,
+            "isolation": isolation,
+            # tracemalloc only sees this process, not sandbox workers
+            "memory_scope": "python-allocations-in-process",
+            "llm_calls": len(fake.calls)
+        },
+        "results": results
+    }
+
+def compare(current, baseline, threshold=0.2):
+    """Stages whose median latency grew by more than `threshold` (a fraction) over the baseline."""
+    previous = {(r["corpus"], r["stage"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get((result["corpus"], result["stage"]))
+        if old is None:
+            continue
+        before = old["latency_seconds"]["median"]
+        after = result["latency_seconds"]["median"]
+        if before and after > before * (1 + threshold):
+            regressions.append({
+                "corpus": result["corpus"],
+                "stage": result["stage"],
+                "baseline_seconds": before,
+                "current_seconds": after,
+                "ratio": after / before
+            })
+    return regressions
+
+def use_scratch_databases(directory):
+    """Keep benchmark sessions and fake LLM responses out of the real databases."""
+    from app import session_store, llm
+    from app.cache import static_cache
+    from app.fingerprints import function_index
+    session_store.DB_PATH = os.path.join(directory, "analyzer.db")
+    static_cache.use_database(os.path.join(directory, "analysis_cache.db"))
+    llm.llm_cache.use_database(os.path.join(directory, "llm_cache.db"))
+    function_index.use_database(os.path.join(directory, "function_index.db"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.benchmark", description="Benchmark the analysis pipeline offline.")
+    parser.add_argument("--sizes", default=",".join(CORPUS_SIZES), help=f"comma-separated corpus sizes ({', '.join(CORPUS_SIZES)})")
+    parser.add_argument("--stages", default=",".join(BENCHMARK_STAGES), help=f"comma-separated stages ({', '.join(BENCHMARK_STAGES)})")
+    parser.add_argument("--iterations", "-n", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds the fake OpenAI client waits per call")
+    parser.add_argument("--isolation", choices=["thread", "process"], default="process",
+                        help="how static tools run; 'thread' makes their memory visible to the benchmark")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", "-o", help="write results here (default: stdout)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed median slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes.split(",")
+    stages = args.stages.split(",")
+    for name in sizes:
+        if name not in CORPUS_SIZES:
+            parser.error(f"unknown size: {name}")
+    for name in stages:
+        if name not in BENCHMARK_STAGES:
+            parser.error(f"unknown stage: {name}")
+
+    from app.workers import shutdown_executors
+    use_scratch_databases(tempfile.mkdtemp(prefix="analyzer-bench-"))
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            report = run_benchmarks(sizes, stages, args.iterations, args.llm_latency, args.isolation, not args.no_memory)
+    finally:
+        shutdown_executors()
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+        for regression in report["regressions"]:
+            print(f"Regression: {regression['stage']} on {regression['corpus']} is {regression['ratio']:.2f}x slower", file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
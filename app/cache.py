@@ -0,0 +1,170 @@
+import os
+import json
+import sqlite3
+import hashlib
+import time
+import threading
+from collections import OrderedDict
+from app.metrics import SQLITE_SECONDS
+
+CACHE_DB = os.getenv("ANALYSIS_CACHE_DB", "logs/analysis_cache.db")
+CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_SIZE", "256"))
+
+def make_cache_key(code, *parts):
+    """Build a content-addressed key from source text plus anything that affects the result."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(parts, sort_keys=True, default=str).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(code.encode('utf-8'))
+    return digest.hexdigest()
+
+class ResultCache:
+    """Two-tier result cache: a bounded in-memory LRU in front of a SQLite table.
+
+    With `ttl` (seconds) entries expire; with `max_disk_entries` the SQLite
+    table is trimmed to the most recently stored rows.
+    """
+
+    def __init__(self, db_path=CACHE_DB, max_entries=CACHE_MAX_ENTRIES, table='analysis_cache',
+                 ttl=None, max_disk_entries=None):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.table = table
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._schema_ready = False
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._schema_ready:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "cache_key TEXT PRIMARY KEY, value TEXT, created_at REAL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_created_at ON {self.table} (created_at)")
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _is_expired(self, created_at):
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            if key in self._memory:
+                value, created_at = self._memory[key]
+                if not self._is_expired(created_at):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return json.loads(value)
+                del self._memory[key]
+        try:
+            with SQLITE_SECONDS.time(self.table, "read"):
+                conn = self._connect()
+                try:
+                    row = conn.execute(
+                        f"SELECT value, created_at FROM {self.table} WHERE cache_key = ?", (key,)
+                    ).fetchone()
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            print("Result cache read failed:", str(e))  # Debug
+            row = None
+        with self._lock:
+            if row is not None and self._is_expired(row[1]):
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, row[0], row[1])
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store a JSON-serializable value in both tiers."""
+        serialized = json.dumps(value)
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, serialized, created_at)
+        try:
+            with SQLITE_SECONDS.time(self.table, "write"):
+                conn = self._connect()
+                try:
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO {self.table} (cache_key, value, created_at) "
+                        "VALUES (?, ?, ?)",
+                        (key, serialized, created_at)
+                    )
+                    if self.max_disk_entries is not None:
+                        conn.execute(
+                            f"DELETE FROM {self.table} WHERE cache_key NOT IN "
+                            f"(SELECT cache_key FROM {self.table} ORDER BY created_at DESC LIMIT ?)",
+                            (self.max_disk_entries,)
+                        )
+                    conn.commit()
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            print("Result cache write failed:", str(e))  # Debug
+
+    def use_database(self, db_path):
+        """Point the disk tier at another SQLite file and empty the memory tier."""
+        with self._lock:
+            self._memory.clear()
+            self.db_path = db_path
+            self._schema_ready = False
+
+    def clear(self):
+        """Drop every entry from both tiers and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.memory_hits = self.disk_hits = self.misses = 0
+            self.expired = self.evictions = 0
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(f"DELETE FROM {self.table}")
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print("Result cache clear failed:", str(e))  # Debug
+
+    def stats(self):
+        """Return hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries
+            }
+
+# Shared cache for analyze_code_static results
+static_cache = ResultCache()
@@ -0,0 +1,112 @@
+import ast
+import os
+from collections import namedtuple
+from app.prompt_budget import count_tokens
+
+# Token size of each chunk sent to the model, and how many chunks are analyzed at once
+AI_CHUNK_TOKENS = int(os.getenv("AI_CHUNK_TOKENS", "3000"))
+AI_CHUNK_WORKERS = int(os.getenv("AI_CHUNK_WORKERS", "4"))
+# Response size per chunk; room for the optimized excerpt as well as the findings
+AI_CHUNK_RESPONSE_TOKENS = int(os.getenv("AI_CHUNK_RESPONSE_TOKENS", "4000"))
+
+# A contiguous run of source lines; start_line and end_line are 1-based and inclusive
+CodeChunk = namedtuple('CodeChunk', ['code', 'start_line', 'end_line'])
+
+def _statement_spans(body, first_line, last_line):
+    """Line spans covering first_line..last_line, split at the statements in body.
+
+    Comments and blank lines before a statement belong to that statement's span.
+    """
+    spans = []
+    start = first_line
+    for index, node in enumerate(body):
+        end = node.end_lineno if index < len(body) - 1 else last_line
+        spans.append((start, end, node))
+        start = end + 1
+    return spans
+
+def _split_span(start, end, node):
+    """Split an oversized class along its members; anything else stays whole."""
+    if not isinstance(node, ast.ClassDef) or len(node.body) < 2:
+        return [(start, end)]
+    header_end = node.body[0].lineno - 1
+    pieces = []
+    for member_start, member_end, member in _statement_spans(node.body, header_end + 1, end):
+        pieces.extend(_split_span(member_start, member_end, member))
+    # The class header (decorators, signature, docstring lines before the first member) joins the first piece
+    pieces[0] = (start, pieces[0][1])
+    return pieces
+
+def chunk_module(code, tree=None, max_tokens=AI_CHUNK_TOKENS):
+    """Split code along top-level function and class boundaries into chunks of about max_tokens.
+
+    Chunks cover every line of the file in order; a single function larger than
+    max_tokens becomes a chunk of its own.
+    """
+    lines = code.splitlines(keepends=True)
+    if tree is None:
+        tree = ast.parse(code)
+    if not tree.body:
+        return [CodeChunk(code, 1, max(len(lines), 1))]
+
+    spans = []
+    for start, end, node in _statement_spans(tree.body, 1, len(lines)):
+        tokens = count_tokens(''.join(lines[start - 1:end]))
+        if tokens > max_tokens:
+            for piece_start, piece_end in _split_span(start, end, node):
+                spans.append((piece_start, piece_end, count_tokens(''.join(lines[piece_start - 1:piece_end]))))
+        else:
+            spans.append((start, end, tokens))
+
+    # Greedily pack neighbouring spans into chunks
+    chunks = []
+    chunk_start, chunk_end, chunk_tokens = spans[0]
+    for start, end, tokens in spans[1:]:
+        if chunk_tokens + tokens > max_tokens:
+            chunks.append(CodeChunk(''.join(lines[chunk_start - 1:chunk_end]), chunk_start, chunk_end))
+            chunk_start, chunk_tokens = start, 0
+        chunk_end = end
+        chunk_tokens += tokens
+    chunks.append(CodeChunk(''.join(lines[chunk_start - 1:chunk_end]), chunk_start, chunk_end))
+    return chunks
+
+def remap_line(line_number, chunk):
+    """Map a line number relative to a chunk onto the original file, clamped to the chunk."""
+    try:
+        line_number = int(line_number)
+    except (TypeError, ValueError):
+        return line_number
+    return min(max(line_number, 1), chunk.end_line - chunk.start_line + 1) + chunk.start_line - 1
+
+def merge_chunk_results(chunks, results):
+    """Combine per-chunk AI results into one result for the whole file.
+
+    Findings are concatenated with line numbers remapped, optimized code is stitched
+    back together (falling back to the original lines for chunks that failed), and
+    failed chunks are listed under 'chunk_errors'.
+    """
+    merged = {"bugs": [], "refactoring_suggestions": [], "issues_severity": [], "chunk_errors": []}
+    optimized_parts = []
+    for chunk, result in zip(chunks, results):
+        if "error" in result:
+            merged["chunk_errors"].append(
+                {"start_line": chunk.start_line, "end_line": chunk.end_line, "error": result["error"]}
+            )
+            optimized_parts.append(chunk.code)
+            continue
+        for bug in result.get("bugs", []):
+            if isinstance(bug, dict) and "line_number" in bug:
+                bug = dict(bug, line_number=remap_line(bug["line_number"], chunk))
+            merged["bugs"].append(bug)
+        for issue in result.get("issues_severity", []):
+            if isinstance(issue, dict) and "line_number" in issue:
+                issue = dict(issue, line_number=remap_line(issue["line_number"], chunk))
+            merged["issues_severity"].append(issue)
+        merged["refactoring_suggestions"].extend(result.get("refactoring_suggestions", []))
+        optimized = result.get("optimized_code")
+        if not isinstance(optimized, str):
+            optimized = chunk.code
+        optimized_parts.append(optimized if optimized.endswith('\n') else optimized + '\n')
+    merged["optimized_code"] = ''.join(optimized_parts)
+    merged["chunks"] = len(chunks)
+    return merged
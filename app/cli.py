@@ -0,0 +1,213 @@
+"""Batch analyzer for CI: python -m app.cli <directory> [--format json|sarif] [--ai]"""
+import os
+import sys
+import json
+import re
+import fnmatch
+import hashlib
+import argparse
+import contextlib
+from concurrent.futures import FIRST_COMPLETED, wait
+from app.analyzer import static_cache_key
+from app.project import analyze_project_file, PROJECT_WORKERS, PROJECT_MAX_FILE_BYTES
+from app.workers import get_process_pool, shutdown_executors
+
+MANIFEST_NAME = ".code-analyzer-manifest.json"
+# Bump when the shape of manifest entries changes
+MANIFEST_VERSION = 1
+SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", ".tox", ".nox", ".venv", "venv", "env", "node_modules", "build", "dist"}
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+SARIF_LEVELS = {"high": "error", "medium": "warning", "low": "note"}
+
+def iter_python_files(root, exclude=()):
+    """Relative paths of .py files under root, in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if name not in SKIP_DIRS and not name.endswith('.egg-info'))
+        for filename in sorted(filenames):
+            if not filename.endswith('.py'):
+                continue
+            path = os.path.relpath(os.path.join(dirpath, filename), root).replace(os.sep, '/')
+            if any(fnmatch.fnmatch(path, pattern) for pattern in exclude):
+                continue
+            yield path
+
+def load_manifest(path, config):
+    """Previous results keyed by file path, or {} if missing, unreadable or from another configuration."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("config") != config:
+        return {}
+    return manifest.get("files", {})
+
+def save_manifest(path, config, entries):
+    """Write the manifest atomically so an interrupted run can't leave it half-written."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": MANIFEST_VERSION, "config": config, "files": entries}, f)
+    os.replace(tmp_path, path)
+
+def reusable(result):
+    """True if a result can be kept in the manifest: no error and every tool finished.
+
+    Like the result cache, this keeps a transient failure from being replayed on later runs.
+    """
+    if "error" in result:
+        return False
+    stages = result.get("static_analysis", {}).get("stages", {})
+    if any(state["status"] != "done" for state in stages.values()):
+        return False
+    return not any("error" in (result.get(key) or {}) for key in ("ai_analysis", "readability_analysis"))
+
+def analyze_file_with_ai(path, code, digest):
+    """AI analysis for one file."""
+    from app import ai_helper
+    return {"ai_analysis": ai_helper.analyze_code_with_ai(code, f"cli-{digest[:16]}")}
+
+def _quiet_worker():
+    # Debug output from the analyzers must not end up in a report written to stdout
+    sys.stdout = sys.stderr
+
+def run(root, jobs=None, manifest_path=None, use_ai=False, exclude=(), executor=None):
+    """Analyze every .py file under root, reusing manifest results for unchanged files.
+
+    Returns (results sorted by file, number of files re-analyzed).
+    """
+    config = {"static": static_cache_key(""), "ai": use_ai}
+    manifest_path = manifest_path or os.path.join(root, MANIFEST_NAME)
+    previous = load_manifest(manifest_path, config)
+    jobs = jobs or PROJECT_WORKERS
+    executor = executor or get_process_pool("cli-analysis", jobs, initializer=_quiet_worker)
+
+    entries = {}
+    pending = {}
+    ai_pending = {}
+    ai_codes = {}
+    def collect(future):
+        path, data, digest = pending.pop(future)
+        result = future.result()
+        entries[path] = {"sha256": digest, "result": result}
+        if use_ai and "error" not in result:
+            # AI calls are network-bound and run on the LLM thread pool while files keep flowing
+            from app import llm
+            ai_codes[path] = data.decode('utf-8')
+            ai_pending[path] = llm.submit(analyze_file_with_ai, path, ai_codes[path], digest)
+
+    for path in iter_python_files(root, exclude):
+        with open(os.path.join(root, path), 'rb') as f:
+            data = f.read(PROJECT_MAX_FILE_BYTES + 1)
+        digest = hashlib.sha256(data).hexdigest()
+        cached = previous.get(path)
+        if cached and cached["sha256"] == digest:
+            entries[path] = cached
+            continue
+        if len(data) > PROJECT_MAX_FILE_BYTES:
+            entries[path] = {"sha256": digest, "result": {"file": path, "error": "File too large (max 5MB)"}}
+            continue
+        # Keep a bounded number of files in flight
+        if len(pending) >= jobs * 2:
+            for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                collect(future)
+        pending[executor.submit(analyze_project_file, path, data)] = (path, data, digest)
+    for future in wait(list(pending)).done:
+        collect(future)
+    if ai_codes:
+        # Readability is scored for all files together, several per LLM call
+        from app.readability import get_readability_scores
+        for path, score in zip(ai_codes, get_readability_scores(list(ai_codes.values()))):
+            entries[path]["result"]["readability_analysis"] = score
+    for path, future in ai_pending.items():
+        entries[path]["result"].update(future.result())
+
+    save_manifest(manifest_path, config, {path: entry for path, entry in entries.items() if reusable(entry["result"])})
+    reanalyzed = sum(1 for path, entry in entries.items() if previous.get(path) is not entry)
+    return [entries[path]["result"] for path in sorted(entries)], reanalyzed
+
+def to_json(results):
+    """The report format used by /analyze_project."""
+    from app.project import build_project_report
+    return build_project_report(results)
+
+def sarif_line(line):
+    """SARIF start line for a reported line: its leading integer (as in "12-14"), else 1."""
+    match = re.match(r"\s*(\d+)", str(line))
+    return max(int(match.group(1)), 1) if match else 1
+
+def to_sarif(results, max_complexity=10):
+    """SARIF 2.1.0 log with lint findings, overly complex functions, AI bugs and failed files."""
+    sarif_results = []
+    def add(rule_id, level, message, path, line):
+        sarif_results.append({
+            "ruleId": rule_id,
+            "level": level,
+            "message": {"text": message},
+            "locations": [{"physicalLocation": {
+                "artifactLocation": {"uri": path},
+                "region": {"startLine": sarif_line(line)}
+            }}]
+        })
+
+    for result in results:
+        path = result["file"]
+        if "error" in result:
+            add("analysis-error", "error", result["error"], path, 1)
+            continue
+        static = result["static_analysis"]
+        for issue in static["style_issues"]:
+            add("static-analysis", "warning", issue["message"], path, issue["line"])
+        for function in static["complexity"].get("functions", []):
+            if function["complexity"] > max_complexity:
+                add("high-complexity", "warning",
+                    f"{function['name']} has cyclomatic complexity {function['complexity']} (max {max_complexity})",
+                    path, result.get("function_lines", {}).get(function["name"], 1))
+        for bug in (result.get("ai_analysis") or {}).get("bugs", []):
+            add("ai-bug", SARIF_LEVELS.get(bug.get("severity"), "warning"), bug.get("description", ""),
+                path, bug.get("line_number", 1))
+
+    rules = [
+        {"id": "static-analysis", "shortDescription": {"text": "pylint or pycodestyle finding"}},
+        {"id": "high-complexity", "shortDescription": {"text": "Function exceeds the complexity threshold"}},
+        {"id": "ai-bug", "shortDescription": {"text": "Potential bug reported by AI analysis"}},
+        {"id": "analysis-error", "shortDescription": {"text": "File could not be analyzed"}}
+    ]
+    return {
+        "$schema": SARIF_SCHEMA,
+        "version": "2.1.0",
+        "runs": [{"tool": {"driver": {"name": "ai-code-analyzer", "rules": rules}}, "results": sarif_results}]
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Analyze every Python file under a directory.")
+    parser.add_argument("root", help="directory to analyze")
+    parser.add_argument("--format", choices=["json", "sarif"], default="json")
+    parser.add_argument("--output", "-o", help="write the report here instead of stdout")
+    parser.add_argument("--manifest", help=f"manifest path (default: <root>/{MANIFEST_NAME})")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--exclude", action="append", default=[], help="glob of relative paths to skip (repeatable)")
+    parser.add_argument("--ai", action="store_true", help="also run AI analysis and readability (needs OPENAI_API_KEY)")
+    parser.add_argument("--max-complexity", type=int, default=10, help="SARIF: flag functions above this complexity")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        parser.error(f"not a directory: {args.root}")
+
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            results, reanalyzed = run(args.root, args.jobs, args.manifest, args.ai, args.exclude)
+    finally:
+        shutdown_executors()
+    report = to_sarif(results, args.max_complexity) if args.format == "sarif" else to_json(results)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
+    print(f"Analyzed {reanalyzed} of {len(results)} files", file=sys.stderr)
+    return 1 if any("error" in result for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+import os
+import ast
+import time
+import hashlib
+from concurrent.futures import wait
+import pylint
+import flake8
+import radon
+import radon.complexity as radon_cc
+from app import ai_helper
+from app.cache import ResultCache, make_cache_key
+from app.chunking import CodeChunk, remap_line, AI_CHUNK_WORKERS
+from app.linters import get_pylint_engine, get_flake8_engine, lint_config_fingerprint, FLAKE8_CODE_PREFIXES
+from app.llm import DEFAULT_MODEL
+from app.parsing import parse_module
+from app.workers import get_executor
+from app.analyzer import STATIC_ANALYSIS_WORKERS
+
+FUNCTION_INDEX_DB = os.getenv("FUNCTION_INDEX_DB", "logs/function_index.db")
+FUNCTION_INDEX_SIZE = int(os.getenv("FUNCTION_INDEX_SIZE", "2048"))
+# Bump when the shape of a function record changes
+FUNCTION_INDEX_VERSION = 1
+
+# Pylint messages that only make sense for the whole module, not a function on its own
+MODULE_CONTEXT_SYMBOLS = {
+    "missing-module-docstring", "undefined-variable", "used-before-assignment",
+    "unused-import", "import-error", "wrong-import-position", "missing-final-newline",
+    "trailing-newlines", "function-redefined", "global-variable-not-assigned"
+}
+
+# Results per function fingerprint, shared by every session that contains the same function
+function_index = ResultCache(db_path=FUNCTION_INDEX_DB, max_entries=FUNCTION_INDEX_SIZE, table='function_index')
+
+def function_fingerprint(node):
+    """Hash of the function's AST, so formatting, comments and position don't matter."""
+    return hashlib.sha256(ast.dump(node).encode('utf-8')).hexdigest()
+
+def function_source(lines, info):
+    """Source of a function, decorators included, with its own indentation removed, and its first line number.
+
+    Only the def's indentation (its col_offset) is cut, so lines that start further
+    left, such as the body of a multiline string at column 0, are kept as they are.
+    """
+    start = min([info.node.lineno] + [decorator.lineno for decorator in info.node.decorator_list])
+    indent = info.node.col_offset
+    source = []
+    for line in lines[start - 1:info.end_lineno]:
+        prefix = line[:indent]
+        source.append(line[indent:] if prefix and not prefix.strip(' \t') else line)
+    return ''.join(source), start
+
+def _static_key(fingerprint, lint_config):
+    return make_cache_key(
+        fingerprint,
+        FUNCTION_INDEX_VERSION,
+        "static",
+        {"pylint": pylint.__version__, "flake8": flake8.__version__, "radon": radon.__version__},
+        lint_config
+    )
+
+def _ai_key(fingerprint):
+    return make_cache_key(fingerprint, FUNCTION_INDEX_VERSION, "ai", DEFAULT_MODEL)
+
+def function_complexity(source):
+    """Cyclomatic complexity of one standalone function."""
+    blocks = radon_cc.cc_visit_ast(ast.parse(source))
+    return blocks[0].complexity if blocks else 1
+
+def analyze_function_static(source):
+    """Complexity and lint findings for one standalone function, with lines relative to it."""
+    complexity = function_complexity(source)
+    source = source if source.endswith('\n') else source + '\n'
+    lint = [
+        {"line": message.line, "message": message.msg}
+        for message in get_pylint_engine().check(source)
+        if message.symbol not in MODULE_CONTEXT_SYMBOLS
+    ]
+    lint.extend(
+        {"line": violation.line_number, "message": violation.text}
+        for violation in get_flake8_engine().check(source)
+        if violation.code.startswith(FLAKE8_CODE_PREFIXES)
+    )
+    lint.sort(key=lambda issue: issue["line"])
+    return {"complexity": complexity, "lint": lint}
+
+def index_functions(code, parsed=None, ai=False, use_cache=True, deadline=None):
+    """Per-function complexity, lint and (with ai=True) AI findings for code.
+
+    Only functions whose fingerprint is not in the index yet are analyzed; the rest
+    reuse stored results. Line numbers in the returned records refer to `code`.
+    Analysis runs on the bounded static-analysis pool; functions not analyzed by
+    `deadline` (a time.monotonic() value) keep their complexity but get an "error"
+    instead of lint or AI findings, and are counted in "incomplete".
+    """
+    parsed = parsed or parse_module(code)
+    lines = code.splitlines(keepends=True)
+    records = []
+    reanalyzed = reused = 0
+    pending_static = []
+    pending_ai = []
+    lint_config = lint_config_fingerprint()
+
+    for info in parsed.functions:
+        source, start = function_source(lines, info)
+        fingerprint = function_fingerprint(info.node)
+        chunk = CodeChunk(source, start, info.end_lineno)
+        record = {
+            "name": info.qualname,
+            "lineno": info.lineno,
+            "end_lineno": info.end_lineno,
+            "fingerprint": fingerprint,
+            "complexity": None,
+            "lint": [],
+            "ai_findings": None
+        }
+        records.append(record)
+
+        static_key = _static_key(fingerprint, lint_config)
+        static = function_index.get(static_key) if use_cache else None
+        if static is None:
+            pending_static.append((record, chunk, static_key))
+        else:
+            _apply_static(record, static, chunk)
+            reused += 1
+
+        if ai:
+            findings = function_index.get(_ai_key(fingerprint)) if use_cache else None
+            if findings is None:
+                pending_ai.append((record, chunk))
+            else:
+                record["ai_findings"] = _remap_findings(findings, chunk)
+
+    if pending_static:
+        executor = get_executor("static-analysis", STATIC_ANALYSIS_WORKERS)
+        futures = [executor.submit(analyze_function_static, chunk.code) for _, chunk, _ in pending_static]
+        done = _wait_until(futures, deadline)
+        for (record, chunk, static_key), future in zip(pending_static, futures):
+            if future not in done:
+                record["complexity"] = function_complexity(chunk.code)
+                record["error"] = "Not analyzed: request deadline exceeded"
+                continue
+            static = future.result()
+            function_index.set(static_key, static)
+            _apply_static(record, static, chunk)
+            reanalyzed += 1
+
+    if pending_ai:
+        executor = get_executor("ai-chunks", AI_CHUNK_WORKERS)
+        futures = [executor.submit(ai_helper.analyze_chunk, chunk, use_cache, deadline) for _, chunk in pending_ai]
+        done = _wait_until(futures, deadline)
+        for (record, chunk), future in zip(pending_ai, futures):
+            result = future.result() if future in done else {"error": "Not analyzed: request deadline exceeded"}
+            if "error" in result:
+                record["ai_findings"] = {"error": result["error"]}
+                continue
+            findings = {"bugs": result.get("bugs", []), "issues_severity": result.get("issues_severity", [])}
+            function_index.set(_ai_key(record["fingerprint"]), findings)
+            record["ai_findings"] = _remap_findings(findings, chunk)
+
+    incomplete = sum(1 for record in records if "error" in record or "error" in (record["ai_findings"] or {}))
+    return {"functions": records, "reanalyzed": reanalyzed, "reused": reused, "incomplete": incomplete}
+
+def _apply_static(record, static, chunk):
+    record["complexity"] = static["complexity"]
+    record["lint"] = [dict(issue, line=remap_line(issue["line"], chunk)) for issue in static["lint"]]
+
+def _wait_until(futures, deadline):
+    """Wait for futures until deadline (None: no limit); cancel the rest and return the finished ones."""
+    timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+    done, not_done = wait(futures, timeout=timeout)
+    for future in not_done:
+        future.cancel()
+    return done
+
+def _remap_findings(findings, chunk):
+    return {
+        name: [
+            dict(item, line_number=remap_line(item["line_number"], chunk))
+            if isinstance(item, dict) and "line_number" in item else item
+            for item in items
+        ]
+        for name, items in findings.items()
+    }
+
+def complexity_delta(original_code, optimized_code, optimized_index=None, deadline=None):
+    """Per-function complexity before and after optimization, matched by qualified name.
+
+    Pass index_functions(optimized_code) as `optimized_index` if it was already computed.
+    """
+    optimized_index = optimized_index or index_functions(optimized_code, deadline=deadline)
+    original = {record["name"]: record for record in index_functions(original_code, deadline=deadline)["functions"]}
+    optimized = {record["name"]: record for record in optimized_index["functions"]}
+    delta = []
+    for name in list(original) + [name for name in optimized if name not in original]:
+        before, after = original.get(name), optimized.get(name)
+        if before and after:
+            status = "unchanged" if before["fingerprint"] == after["fingerprint"] else "changed"
+        else:
+            status = "removed" if before else "added"
+        delta.append({
+            "name": name,
+            "status": status,
+            "original": before["complexity"] if before else None,
+            "optimized": after["complexity"] if after else None,
+            "delta": (after["complexity"] if after else 0) - (before["complexity"] if before else 0)
+        })
+    return delta
@@ -0,0 +1,136 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from app import ai_helper
+from app.pipeline import run_pipeline, get_stages
+from app.stages import ANALYSIS_STAGES
+from app.workers import get_executor
+
+JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.getenv("ANALYSIS_JOB_MAX_PENDING", "32"))
+JOB_MAX_RETAINED = int(os.getenv("ANALYSIS_JOB_MAX_RETAINED", "200"))
+
+# Stages in the order they are reported; static results land before the AI ones
+JOB_STAGES = ANALYSIS_STAGES
+
+class AnalysisJob:
+    """Progress and partial results of one background analysis."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.status = "queued"
+        self.created_at = time.time()
+        self.finished_at = None
+        self.error = None
+        self.stages = {name: {"status": "pending"} for name in JOB_STAGES}
+        self.version = 0
+
+    def snapshot(self):
+        """JSON-serializable view of the job for polling clients."""
+        return {
+            "job_id": self.job_id,
+            "session_id": self.job_id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "stages": {name: dict(stage) for name, stage in self.stages.items()}
+        }
+
+    @property
+    def done(self):
+        return self.status in ("completed", "failed")
+
+class JobQueue:
+    """In-process analysis queue backed by a bounded worker pool."""
+
+    def __init__(self, max_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, max_retained=JOB_MAX_RETAINED):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_retained = max_retained
+        self._jobs = OrderedDict()
+        self._changed = threading.Condition()
+
+    def submit(self, code, parsed=None):
+        """Queue code for analysis; return the job, or None if the queue is full."""
+        with self._changed:
+            pending = sum(1 for job in self._jobs.values() if not job.done)
+            if pending >= self.max_pending:
+                return None
+            job = AnalysisJob(str(uuid.uuid4()))
+            self._jobs[job.job_id] = job
+            self._evict_finished()
+        get_executor("analysis-jobs", self.max_workers).submit(self._run, job, code, parsed)
+        return job
+
+    def get(self, job_id):
+        """Return a snapshot of the job, or None if it is unknown."""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return job.snapshot() if job else None
+
+    def wait_for_change(self, job_id, version, timeout=15):
+        """Block until the job changes past `version`; return (version, snapshot)."""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return version, None
+            self._changed.wait_for(lambda: job.version != version or job.done, timeout=timeout)
+            return job.version, job.snapshot()
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        while len(self._jobs) > self.max_retained and finished:
+            del self._jobs[finished.pop(0)]
+
+    def _update(self, job, stage=None, **fields):
+        with self._changed:
+            if stage:
+                job.stages[stage].update(fields)
+            else:
+                for name, value in fields.items():
+                    setattr(job, name, value)
+            job.version += 1
+            self._changed.notify_all()
+
+    def _start_stage(self, job, stage):
+        self._update(job, stage, status="running", started_at=time.time())
+
+    def _finish_stage(self, job, stage, state, output):
+        fields = dict(state, finished_at=time.time())
+        if state["status"] == "done":
+            fields["result"] = output
+        self._update(job, stage, **fields)
+
+    def _run(self, job, code, parsed):
+        self._update(job, status="running")
+        try:
+            report = run_pipeline(
+                get_stages(JOB_STAGES),
+                {"code": code, "parsed": parsed, "session_id": job.job_id},
+                on_start=lambda stage: self._start_stage(job, stage),
+                on_done=lambda stage, state, output: self._finish_stage(job, stage, state, output)
+            )
+            stages = report["stages"]
+            # Only static analysis is essential; as in /analyze, the rest can be missing
+            if stages["static"]["status"] != "done":
+                self._update(job, status="failed", error=stages["static"].get("error"), finished_at=time.time())
+                return
+            if stages["ai"]["status"] != "done":
+                # Keep a session so export and regenerate still work without the AI report
+                ai_helper.save_session(job.job_id, code, {"error": stages["ai"].get("error", "AI analysis did not finish")}, code)
+
+            static_result = report["results"]["static"]
+            readability_result = report["results"].get("readability")
+            if stages["readability"]["status"] != "done":
+                readability_result = {"score": 0, "justification": "Readability analysis failed"}
+            ai_helper.save_analysis_artifacts(job.job_id, static_result, readability_result, static_result.get("complexity", {}))
+            self._update(job, status="completed", finished_at=time.time())
+        except Exception as e:
+            print("Analysis job failed:", str(e))  # Debug
+            self._update(job, status="failed", error=str(e), finished_at=time.time())
+
+# Shared queue used by the /jobs routes
+job_queue = JobQueue()
@@ -0,0 +1,156 @@
+import os
+import threading
+
+# pylint, astroid and flake8 are imported when an engine is first built, not at import time
+
+PYLINT_ARGS = ['--disable=invalid-name']
+FLAKE8_ARGS = []
+# Only pycodestyle errors are reported; pylint already covers the rest
+FLAKE8_CODE_PREFIXES = ('E',)
+SUBMISSION_MODULE = 'submission'
+
+class PylintEngine:
+    """In-process pylint runner that keeps its linter and astroid manager warm."""
+
+    def __init__(self, args=None):
+        import pylint
+        from pylint.config import find_default_config_files
+        from pylint.config.config_initialization import _config_initialization
+        from pylint.lint import PyLinter
+        from pylint.reporters import CollectingReporter
+
+        self.args = list(args or PYLINT_ARGS)
+        self.version = pylint.__version__
+        print("Pylint version:", self.version)  # Debug
+        self._lock = threading.Lock()
+        self.reporter = CollectingReporter()
+
+        # Mirror what `pylint` does on the command line, but only once
+        rcfile = next(find_default_config_files(), None)
+        self.linter = PyLinter(pylintrc=str(rcfile) if rcfile else None)
+        self.linter.load_default_plugins()
+        self.linter.disable("I")
+        self.linter.enable("c-extension-no-member")
+        _config_initialization(self.linter, self.args, self.reporter, config_file=rcfile)
+
+    def check(self, code, modname=SUBMISSION_MODULE):
+        """Lint source text and return the collected pylint messages."""
+        from astroid import MANAGER
+        from pylint.typing import FileItem
+        from pylint.utils import FileState
+
+        filepath = f"{modname}.py"
+        fileitem = FileItem(modname, filepath, filepath)
+        linter = self.linter
+        # The linter and astroid's manager are process-global, so runs are serialized
+        with self._lock:
+            self.reporter.reset()
+            linter.msg_status = 0
+            linter.open()
+            linter.initialize()
+            try:
+                # Same steps as PyLinter.check(), fed from memory instead of disk
+                with linter._astroid_module_checker() as check_astroid_module:
+                    ast_per_fileitem = linter._get_asts(iter([fileitem]), code)
+                    linter._lint_files(ast_per_fileitem, check_astroid_module)
+            finally:
+                # Forget the submission so the next run starts from a clean module state
+                MANAGER.astroid_cache.pop(modname, None)
+                linter.file_state = FileState(modname, linter.msgs_store, is_base_filestate=True)
+            return list(self.reporter.messages)
+
+_source_file_checker = None
+
+def _source_file_checker_class():
+    """Build the in-memory FileChecker subclass once flake8 is imported."""
+    global _source_file_checker
+    if _source_file_checker is None:
+        from flake8 import checker as flake8_checker
+        from flake8 import processor as flake8_processor
+
+        class _SourceFileChecker(flake8_checker.FileChecker):
+            """flake8 FileChecker fed from in-memory lines instead of a file on disk."""
+
+            def __init__(self, *, lines, **kwargs):
+                self._lines = lines
+                super().__init__(**kwargs)
+
+            def _make_processor(self):
+                return flake8_processor.FileProcessor(self.filename, self.options, lines=self._lines)
+
+        _source_file_checker = _SourceFileChecker
+    return _source_file_checker
+
+class Flake8Engine:
+    """flake8 checker whose options and plugins are loaded once and reused."""
+
+    def __init__(self, args=None):
+        import flake8
+        from flake8.options.parse_args import parse_args as parse_flake8_args
+        from flake8.style_guide import DecisionEngine
+
+        self.args = list(args if args is not None else FLAKE8_ARGS)
+        self.version = flake8.__version__
+        self.plugins, self.options = parse_flake8_args(self.args)
+        self.decider = DecisionEngine(self.options)
+
+    def check(self, code, filename=f"{SUBMISSION_MODULE}.py"):
+        """Check source text and return selected, non-noqa violations sorted by position."""
+        from flake8.style_guide import Decision
+        from flake8.violation import Violation
+
+        file_checker = _source_file_checker_class()(
+            filename=filename,
+            plugins=self.plugins.checkers,
+            options=self.options,
+            lines=code.splitlines(True)
+        )
+        _, results, _ = file_checker.run_checks()
+        violations = []
+        for error_code, line_number, column, text, physical_line in sorted(results, key=lambda r: (r[1], r[2])):
+            violation = Violation(error_code, filename, line_number, (column or 0) + 1, text, physical_line)
+            if self.decider.decision_for(error_code) is not Decision.Selected:
+                continue
+            if violation.is_inline_ignored(self.options.disable_noqa):
+                continue
+            violations.append(violation)
+        return violations
+
+def _file_fingerprint(path):
+    return {"path": str(path), "mtime": os.path.getmtime(path)} if path else None
+
+def lint_config_fingerprint():
+    """Describe the lint configuration in effect, for use in cache keys."""
+    from flake8.options.config import _find_config_file as find_flake8_config_file
+    from pylint.config import find_default_config_files
+
+    return {
+        "pylint_args": PYLINT_ARGS,
+        "pylintrc": _file_fingerprint(next(find_default_config_files(), None)),
+        "flake8_args": FLAKE8_ARGS,
+        "flake8_codes": FLAKE8_CODE_PREFIXES,
+        "flake8_config": _file_fingerprint(find_flake8_config_file(os.getcwd()))
+    }
+
+_pylint_engine = None
+_pylint_engine_lock = threading.Lock()
+_flake8_engine = None
+_flake8_engine_lock = threading.Lock()
+
+def get_pylint_engine():
+    """Return the shared pylint engine, building it on first use."""
+    global _pylint_engine
+    if _pylint_engine is None:
+        with _pylint_engine_lock:
+            if _pylint_engine is None:
+                _pylint_engine = PylintEngine()
+    return _pylint_engine
+
+def get_flake8_engine():
+    """Return the shared flake8 engine, building it on first use."""
+    global _flake8_engine
+    if _flake8_engine is None:
+        with _flake8_engine_lock:
+            if _flake8_engine is None:
+                _flake8_engine = Flake8Engine()
+    return _flake8_engine
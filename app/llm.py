@@ -0,0 +1,205 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from app.cache import ResultCache, make_cache_key
+from app.metrics import OPENAI_SECONDS, OPENAI_REQUESTS, OPENAI_TOKENS, OPENAI_HTTP_ATTEMPTS
+from app.workers import get_executor
+
+load_dotenv()
+
+DEFAULT_MODEL = "gpt-4o-mini"
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "8"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "logs/llm_cache.db")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "10000"))
+
+def create_client():
+    """Create an OpenAI client backed by a keep-alive connection pool."""
+    import httpx
+    from openai import OpenAI, DefaultHttpxClient
+
+    http_client = DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS
+        ),
+        event_hooks={"request": [lambda request: OPENAI_HTTP_ATTEMPTS.inc()]}
+    )
+    # Bound each call so a timed-out AI stage doesn't leave a thread waiting forever
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client, timeout=LLM_REQUEST_TIMEOUT)
+
+class LazyClient:
+    """Stands in for the shared OpenAI client and creates it on first use.
+
+    Importing openai and building the client costs more than the rest of startup,
+    so it waits until a request actually needs the API.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the real client, creating it if needed."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    try:
+                        self._client = create_client()
+                        print("OpenAI client initialized successfully")  # Debug
+                    except Exception as e:
+                        print("OpenAI client initialization failed:", str(e))  # Debug
+                        raise
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+# One client for the whole process, shared by ai_helper and readability
+client = LazyClient()
+
+# Responses keyed by model, parameters and prompt hash
+llm_cache = ResultCache(
+    db_path=LLM_CACHE_DB,
+    max_entries=LLM_CACHE_SIZE,
+    table='llm_cache',
+    ttl=LLM_CACHE_TTL,
+    max_disk_entries=LLM_CACHE_MAX_ROWS
+)
+
+def use_client(new_client):
+    """Swap the shared client (e.g. for a local stand-in) and return the previous one.
+
+    The previous client is None if it had not been created yet; passing None back
+    restores lazy creation.
+    """
+    with client._lock:
+        previous, client._client = client._client, new_client
+    return previous
+
+class StandInChatClient:
+    """Offline replacement for the OpenAI client, for tests and benchmarks (install with use_client).
+
+    Serves `responses` in order, then `default` if one is given; each call sleeps
+    `latency` seconds, reports rough token usage and is recorded in `calls`.
+    Supports stream=True.
+    """
+
+    def __init__(self, responses=(), default=None, latency=0.0):
+        self.responses = list(responses)
+        self.default = default
+        self.latency = latency
+        self.calls = []
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        time.sleep(self.latency)
+        content = self.responses.pop(0) if self.responses or self.default is None else self.default
+        prompt = ''.join(message["content"] for message in kwargs.get("messages", []))
+        usage = type("obj", (), {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4})
+        if kwargs.get("stream"):
+            return self._stream(content, usage)
+        message = type("obj", (), {"content": content})
+        return type("obj", (), {"choices": [type("obj", (), {"message": message})], "usage": usage})
+
+    def _stream(self, content, usage, size=8):
+        for start in range(0, len(content), size):
+            delta = type("obj", (), {"content": content[start:start + size]})
+            yield type("obj", (), {"choices": [type("obj", (), {"delta": delta})]})
+        yield type("obj", (), {"choices": [], "usage": usage})
+
+def is_json_block(text):
+    """True if text is a ```json fenced block, the format every prompt asks for."""
+    return text.startswith("```json\n") and text.endswith("\n```")
+
+def _record_usage(operation, usage):
+    """Count the prompt and completion tokens the API reported, if any."""
+    if usage is None:
+        return
+    OPENAI_TOKENS.inc(operation, "prompt", amount=usage.prompt_tokens or 0)
+    OPENAI_TOKENS.inc(operation, "completion", amount=usage.completion_tokens or 0)
+
+def chat_completion(prompt, max_tokens, temperature=0.3, model=DEFAULT_MODEL, use_cache=True, cacheable=is_json_block,
+                    operation="chat"):
+    """Send a single system prompt to the chat API and return the message text.
+
+    Identical requests are answered from llm_cache unless use_cache is False.
+    Only responses accepted by `cacheable` are stored. `operation` labels the call's metrics.
+    """
+    key = None
+    if use_cache:
+        key = make_cache_key(prompt, {"model": model, "max_tokens": max_tokens, "temperature": temperature})
+        cached = llm_cache.get(key)
+        if cached is not None:
+            OPENAI_REQUESTS.inc(operation, "cached")
+            return cached
+    
+    try:
+        with OPENAI_SECONDS.time(operation):
+            response = client.chat.completions.create(
+                model=model,
+                messages=[{"role": "system", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+    except Exception:
+        OPENAI_REQUESTS.inc(operation, "error")
+        raise
+    OPENAI_REQUESTS.inc(operation, "ok")
+    _record_usage(operation, getattr(response, "usage", None))
+    result = response.choices[0].message.content
+    if key is not None and result and (cacheable is None or cacheable(result)):
+        llm_cache.set(key, result)
+    return result
+
+def stream_chat_completion(prompt, max_tokens, temperature=0.3, model=DEFAULT_MODEL, use_cache=True, cacheable=is_json_block,
+                           operation="chat"):
+    """Like chat_completion, but yield the response text as it streams in.
+
+    A cached response is yielded in one piece; a streamed one is cached once complete.
+    """
+    key = None
+    if use_cache:
+        key = make_cache_key(prompt, {"model": model, "max_tokens": max_tokens, "temperature": temperature})
+        cached = llm_cache.get(key)
+        if cached is not None:
+            OPENAI_REQUESTS.inc(operation, "cached")
+            yield cached
+            return
+    
+    chunks = []
+    try:
+        with OPENAI_SECONDS.time(operation):
+            stream = client.chat.completions.create(
+                model=model,
+                messages=[{"role": "system", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True
+            )
+            for chunk in stream:
+                # Only sent when the request asks for it, but counted if present
+                _record_usage(operation, getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    chunks.append(text)
+                    yield text
+    except Exception:
+        OPENAI_REQUESTS.inc(operation, "error")
+        raise
+    OPENAI_REQUESTS.inc(operation, "ok")
+    result = ''.join(chunks)
+    if key is not None and result and (cacheable is None or cacheable(result)):
+        llm_cache.set(key, result)
+
+def submit(fn, *args, **kwargs):
+    """Run fn on the shared LLM worker pool and return its future."""
+    return get_executor("llm", LLM_MAX_WORKERS).submit(fn, *args, **kwargs)
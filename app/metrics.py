@@ -0,0 +1,164 @@
+import time
+import bisect
+import threading
+import functools
+
+# Upper bounds in seconds; spans sub-millisecond SQLite reads to minute-long AI calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry = []
+
+class Counter:
+    """Monotonic counter, optionally split by label values."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        # Samples carry the _total suffix, so HELP and TYPE must name the family the same way
+        self.family_name = name + "_total"
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, value in values:
+            yield self.family_name, dict(zip(self.labelnames, labelvalues)), value
+
+class Histogram:
+    """Cumulative histogram of observations, optionally split by label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.family_name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                # Per-bucket counts (plus +Inf), sum
+                series = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labelvalues):
+        """Context manager and decorator that observes the elapsed seconds."""
+        return _Timer(self, labelvalues)
+
+    def totals(self):
+        """{label values: (count, sum)} for every series observed so far."""
+        with self._lock:
+            return {labelvalues: (sum(counts), total) for labelvalues, (counts, total) in self._values.items()}
+
+    def samples(self):
+        with self._lock:
+            values = sorted((labelvalues, list(counts), total) for labelvalues, (counts, total) in self._values.items())
+        for labelvalues, counts, total in values:
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield self.name + "_bucket", dict(labels, le=_format_value(bound)), cumulative
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, cumulative
+
+class _Timer:
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labelvalues):
+                return fn(*args, **kwargs)
+        return wrapper
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.family_name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.family_name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            if labels:
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                name = f"{name}{{{label_text}}}"
+            lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def record_retry(retry_state):
+    """tenacity before_sleep hook: count a retry of the wrapped OpenAI request."""
+    OPENAI_RETRIES.inc(retry_state.fn.__name__)
+
+STAGE_SECONDS = Histogram(
+    "analyzer_stage_duration_seconds",
+    "Time spent in each analysis stage (upload, validation, tools, AI, rendering).",
+    ["stage"]
+)
+STAGE_OUTCOMES = Counter(
+    "analyzer_stage_outcomes",
+    "Analysis stages finished, by final status.",
+    ["stage", "status"]
+)
+OPENAI_SECONDS = Histogram(
+    "openai_request_duration_seconds",
+    "Latency of OpenAI chat completion calls (streams until the last token).",
+    ["operation"]
+)
+OPENAI_REQUESTS = Counter(
+    "openai_requests",
+    "OpenAI chat completion calls by outcome; cached calls never reach the API.",
+    ["operation", "outcome"]
+)
+OPENAI_TOKENS = Counter(
+    "openai_tokens",
+    "Tokens reported by the OpenAI API.",
+    ["operation", "kind"]
+)
+OPENAI_RETRIES = Counter(
+    "openai_retries",
+    "Retries of whole OpenAI-backed operations.",
+    ["function"]
+)
+OPENAI_HTTP_ATTEMPTS = Counter(
+    "openai_http_attempts",
+    "HTTP requests sent to the OpenAI API, including the client's own retries."
+)
+SQLITE_SECONDS = Histogram(
+    "sqlite_query_duration_seconds",
+    "Time spent in SQLite reads and writes by store.",
+    ["store", "operation"]
+)
@@ -0,0 +1,68 @@
+import ast
+from collections import namedtuple
+import radon.complexity as radon_cc
+from radon.visitors import Function
+
+# One entry per def/async def in the module, methods and nested functions included
+FunctionInfo = namedtuple('FunctionInfo', ['name', 'qualname', 'lineno', 'end_lineno', 'node'])
+
+class ParsedModule:
+    """Source text parsed once per request and shared by validation, analysis and charts."""
+
+    def __init__(self, code, tree):
+        self.code = code
+        self.tree = tree
+        self._radon_blocks = None
+        self._functions = None
+
+    @property
+    def source(self):
+        """The code with a trailing newline, as the linters expect it."""
+        return self.code if self.code.endswith('\n') else self.code + '\n'
+
+    @property
+    def radon_blocks(self):
+        """Radon complexity blocks, computed from the existing AST on first access."""
+        if self._radon_blocks is None:
+            self._radon_blocks = radon_cc.cc_visit_ast(self.tree)
+        return self._radon_blocks
+
+    @property
+    def function_complexity(self):
+        """Name and complexity of every module-level function (classes and methods excluded)."""
+        return [
+            {"name": block.name, "complexity": block.complexity}
+            for block in self.radon_blocks
+            if isinstance(block, Function) and block.classname is None
+        ]
+
+    @property
+    def module_complexity(self):
+        """Sum of the complexity of all radon blocks."""
+        return sum(block.complexity for block in self.radon_blocks)
+
+    @property
+    def functions(self):
+        """Inventory of every function definition in source order."""
+        if self._functions is None:
+            self._functions = []
+            self._collect_functions(self.tree, '')
+            self._functions.sort(key=lambda info: info.lineno)
+        return self._functions
+
+    def _collect_functions(self, node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                qualname = f"{prefix}{child.name}"
+                self._functions.append(
+                    FunctionInfo(child.name, qualname, child.lineno, child.end_lineno, child)
+                )
+                self._collect_functions(child, f"{qualname}.")
+            elif isinstance(child, ast.ClassDef):
+                self._collect_functions(child, f"{prefix}{child.name}.")
+            else:
+                self._collect_functions(child, prefix)
+
+def parse_module(code):
+    """Parse code into a ParsedModule; raises SyntaxError for invalid Python."""
+    return ParsedModule(code, ast.parse(code))
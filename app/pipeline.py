@@ -0,0 +1,143 @@
+import os
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+from app.metrics import STAGE_SECONDS, STAGE_OUTCOMES
+from app.sandbox import StageTimeout, StageMemoryExceeded
+from app.workers import get_executor, get_sandbox
+
+# Overall budget for one analysis request, shared by all of its stages
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv("ANALYSIS_DEADLINE_SECONDS", "120"))
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "32"))
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "3"))
+
+# One unit of work in an analysis.
+# run: callable(context) -> output, or for isolated stages a picklable callable(code)
+#      that runs in a sandbox process (the only way memory_mb is enforced).
+# timeout: seconds; requires: names of stages that must finish first.
+Stage = namedtuple('Stage', ['name', 'run', 'timeout', 'memory_mb', 'requires', 'isolated'])
+
+# Final statuses; a stage is "pending" or "running" before it reaches one of these
+STAGE_DONE, STAGE_FAILED, STAGE_TIMEOUT, STAGE_SKIPPED = "done", "failed", "timeout", "skipped"
+
+_registry = OrderedDict()
+
+def register_stage(name, run, timeout, memory_mb=None, requires=(), isolated=False):
+    """Add or replace a named stage in the registry."""
+    if memory_mb is not None and not isolated:
+        # A thread shares the process heap, so there is nothing to enforce the limit on
+        raise ValueError(f"Stage {name}: memory_mb needs isolated=True")
+    _registry[name] = Stage(name, run, timeout, memory_mb, tuple(requires), isolated)
+    return _registry[name]
+
+def get_stages(names):
+    """Registered stages by name, in the order given."""
+    return [_registry[name] for name in names]
+
+def make_deadline(seconds=None):
+    """Monotonic deadline for a request starting now."""
+    return time.monotonic() + (ANALYSIS_DEADLINE_SECONDS if seconds is None else seconds)
+
+def _run_stage(stage, context, limit_at):
+    if stage.isolated:
+        timeout = max(limit_at - time.monotonic(), 0)
+        return get_sandbox("sandbox", SANDBOX_WORKERS).run(stage.run, (context["code"],), timeout, stage.memory_mb)
+    return stage.run(context)
+
+def run_pipeline(stages, context, deadline=None, parallel=True, pool="pipeline", on_start=None, on_done=None, pool_size=None):
+    """Run stages under their own limits and an overall deadline; never raises for a stage.
+
+    Stages start as soon as their requirements are done (one at a time unless
+    `parallel`). A stage that overruns is reported as timed out: isolated stages
+    are killed, others are abandoned and their late result ignored. Stages whose
+    requirements did not finish are skipped.
+
+    Returns {"results": {name: output}, "stages": {name: status}, "deadline_exceeded": bool};
+    results hold only stages that finished, including ones that returned an error dict.
+    on_start(name) and on_done(name, status, output) are called as stages progress.
+    Stages run on the named thread `pool`, created with `pool_size` workers
+    (PIPELINE_WORKERS by default) the first time it is used.
+    """
+    deadline = deadline or make_deadline()
+    results = {}
+    context = dict(context, deadline=deadline, results=results)
+    names = {stage.name for stage in stages}
+    statuses = OrderedDict((stage.name, {"status": "pending"}) for stage in stages)
+    pending = list(stages)
+    running = {}
+    executor = get_executor(pool, pool_size or PIPELINE_WORKERS)
+
+    def finish(stage, status, started=None, output=None, error=None):
+        state = {"status": status}
+        if started is not None:
+            elapsed = time.monotonic() - started
+            state["elapsed"] = round(elapsed, 4)
+            STAGE_SECONDS.observe(elapsed, stage.name)
+        STAGE_OUTCOMES.inc(stage.name, status)
+        if error is not None:
+            state["error"] = error
+        statuses[stage.name] = state
+        if output is not None:
+            results[stage.name] = output
+        if on_done:
+            on_done(stage.name, state, output)
+
+    while pending or running:
+        for stage in list(pending):
+            if running and not parallel:
+                break
+            required = [statuses[name]["status"] for name in stage.requires if name in names]
+            if any(status in (STAGE_FAILED, STAGE_TIMEOUT, STAGE_SKIPPED) for status in required):
+                pending.remove(stage)
+                finish(stage, STAGE_SKIPPED, error=f"requires {', '.join(stage.requires)}")
+                continue
+            if not all(status == STAGE_DONE for status in required):
+                continue
+            pending.remove(stage)
+            now = time.monotonic()
+            if now >= deadline:
+                finish(stage, STAGE_TIMEOUT, error="request deadline exceeded")
+                continue
+            statuses[stage.name] = {"status": "running"}
+            if on_start:
+                on_start(stage.name)
+            limit_at = min(now + stage.timeout, deadline)
+            running[executor.submit(_run_stage, stage, context, limit_at)] = (stage, now, limit_at)
+
+        if not running:
+            continue
+        next_limit = min(limit_at for _, _, limit_at in running.values())
+        done, _ = wait(list(running), timeout=max(next_limit - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        for future in done:
+            stage, started, limit_at = running.pop(future)
+            try:
+                output = future.result()
+            except StageTimeout:
+                finish(stage, STAGE_TIMEOUT, started, error=_timeout_message(stage, limit_at, deadline))
+            except StageMemoryExceeded as e:
+                finish(stage, STAGE_FAILED, started, error=str(e))
+            except Exception as e:
+                finish(stage, STAGE_FAILED, started, error=str(e) or type(e).__name__)
+            else:
+                if isinstance(output, dict) and "error" in output:
+                    finish(stage, STAGE_FAILED, started, output=output, error=output["error"])
+                else:
+                    finish(stage, STAGE_DONE, started, output=output)
+        now = time.monotonic()
+        for future, (stage, started, limit_at) in list(running.items()):
+            if now >= limit_at:
+                # Threads can't be stopped; drop the future and ignore whatever it returns
+                future.cancel()
+                del running[future]
+                finish(stage, STAGE_TIMEOUT, started, error=_timeout_message(stage, limit_at, deadline))
+
+    return {
+        "results": results,
+        "stages": statuses,
+        "deadline_exceeded": any(state.get("error") == "request deadline exceeded" for state in statuses.values())
+    }
+
+def _timeout_message(stage, limit_at, deadline):
+    if limit_at >= deadline:
+        return "request deadline exceeded"
+    return f"timed out after {stage.timeout:g}s"
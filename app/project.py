@@ -0,0 +1,121 @@
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from app.analyzer import analyze_code_static
+from app.parsing import parse_module
+from app.workers import get_process_pool, reset_executor
+
+# Static analysis is CPU-bound, so files are spread over one process per core
+PROJECT_WORKERS = int(os.getenv("PROJECT_WORKERS", str(os.cpu_count() or 1)))
+PROJECT_MAX_FILES = int(os.getenv("PROJECT_MAX_FILES", "2000"))
+PROJECT_MAX_FILE_BYTES = 5 * 1024 * 1024
+PROJECT_MAX_TOTAL_BYTES = int(os.getenv("PROJECT_MAX_TOTAL_BYTES", str(100 * 1024 * 1024)))
+PROJECT_WORST_FUNCTIONS = 10
+
+class ProjectTooLarge(ValueError):
+    """The upload exceeds the project file-count or size limits."""
+
+def iter_archive_files(fileobj):
+    """Yield (path, code) for each .py file in a zip archive, reading one member at a time."""
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.endswith('.py'):
+                continue
+            if info.file_size > PROJECT_MAX_FILE_BYTES:
+                yield info.filename, None
+                continue
+            with archive.open(info) as member:
+                # Read at most the limit, whatever the header claims
+                data = member.read(PROJECT_MAX_FILE_BYTES + 1)
+            yield info.filename, data if len(data) <= PROJECT_MAX_FILE_BYTES else None
+
+def iter_uploaded_files(files):
+    """Yield (path, code) for each uploaded .py file, reading one upload at a time."""
+    for file in files:
+        if not file.filename.endswith('.py'):
+            continue
+        data = file.read(PROJECT_MAX_FILE_BYTES + 1)
+        yield file.filename, data if len(data) <= PROJECT_MAX_FILE_BYTES else None
+
+def analyze_project_file(path, data):
+    """Static analysis and complexity for one project file; runs in a worker process."""
+    try:
+        code = data.decode('utf-8')
+        parsed = parse_module(code)
+    except UnicodeDecodeError:
+        return {"file": path, "error": "File is not valid UTF-8"}
+    except SyntaxError as e:
+        return {"file": path, "error": f"Invalid Python code: {str(e)}"}
+    # Each worker is a single process already; don't fan out again or spawn sandboxes inside it
+    result = analyze_code_static(code, parallel=False, parsed=parsed, isolation="thread")
+    if "error" in result:
+        return {"file": path, "error": result["error"]}
+    return {
+        "file": path,
+        "lines": len(code.splitlines()),
+        "function_lines": {info.qualname: info.lineno for info in parsed.functions},
+        "static_analysis": result
+    }
+
+def analyze_project(files, max_workers=None, executor=None):
+    """Analyze (path, bytes) pairs across a process pool and return the aggregated report.
+
+    At most two files per worker are held in memory at once; the rest stay in the
+    archive or upload until a worker frees up.
+    """
+    max_workers = max_workers or PROJECT_WORKERS
+    executor = executor or get_process_pool("project-analysis", max_workers)
+    results = []
+    pending = set()
+    total_bytes = 0
+    count = 0
+    try:
+        for path, data in files:
+            if data is None:
+                results.append({"file": path, "error": "File too large (max 5MB)"})
+                continue
+            count += 1
+            total_bytes += len(data)
+            if count > PROJECT_MAX_FILES:
+                raise ProjectTooLarge(f"Too many files (max {PROJECT_MAX_FILES})")
+            if total_bytes > PROJECT_MAX_TOTAL_BYTES:
+                raise ProjectTooLarge(f"Project too large (max {PROJECT_MAX_TOTAL_BYTES // (1024 * 1024)}MB)")
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+            pending.add(executor.submit(analyze_project_file, path, data))
+        results.extend(future.result() for future in wait(pending).done)
+    except BrokenProcessPool:
+        reset_executor("project-analysis")
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+    results.sort(key=lambda result: result["file"])
+    return build_project_report(results)
+
+def build_project_report(results):
+    """Totals, worst functions by complexity and per-file results."""
+    analyzed = [result for result in results if "error" not in result]
+    functions = [
+        {"file": result["file"], "name": function["name"], "complexity": function["complexity"]}
+        for result in analyzed
+        for function in result["static_analysis"]["complexity"].get("functions", [])
+    ]
+    functions.sort(key=lambda function: function["complexity"], reverse=True)
+    return {
+        "totals": {
+            "files": len(results),
+            "analyzed": len(analyzed),
+            "failed": len(results) - len(analyzed),
+            "lines": sum(result["lines"] for result in analyzed),
+            "functions": len(functions),
+            "style_issues": sum(len(result["static_analysis"]["style_issues"]) for result in analyzed),
+            "module_complexity": sum(
+                result["static_analysis"]["complexity"].get("module_complexity", 0) for result in analyzed
+            )
+        },
+        "worst_functions": functions[:PROJECT_WORST_FUNCTIONS],
+        "files": results
+    }
@@ -0,0 +1,76 @@
+import os
+import re
+import json
+
+try:
+    import tiktoken
+except ImportError:  # Optional; fall back to a local estimate
+    tiktoken = None
+
+# Upper bound for a whole regenerate prompt, history included
+REGENERATE_PROMPT_BUDGET = int(os.getenv("REGENERATE_PROMPT_BUDGET", "6000"))
+# Most recent turns that are kept verbatim while they fit
+REGENERATE_RECENT_TURNS = int(os.getenv("REGENERATE_RECENT_TURNS", "2"))
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_encoding = None
+
+def count_tokens(text):
+    """Count tokens locally: tiktoken when installed, otherwise a BPE-like estimate."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text))
+    # Words split into ~4 character pieces, each punctuation mark on its own
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_PATTERN.findall(text))
+
+def summarize_turn(turn):
+    """Shorten a turn to its request and the size of the code it produced."""
+    response = turn.get("response") or ""
+    return {
+        "user_command": turn.get("user_command"),
+        "summary": f"returned {len(response.splitlines())} lines of code"
+    }
+
+def _history_tokens(history):
+    return count_tokens(json.dumps(history))
+
+def compact_history(history, budget, keep_recent=REGENERATE_RECENT_TURNS, reserved_tokens=0):
+    """Fit conversation history into `budget` tokens alongside `reserved_tokens` of other prompt text.
+
+    The most recent `keep_recent` turns stay verbatim while they fit, older turns are
+    summarized, and the oldest summaries are dropped if that is still too much.
+    Returns (compacted_history, report).
+    """
+    available = budget - reserved_tokens
+    original_tokens = _history_tokens(history)
+    compacted = list(history)
+    verbatim = len(history)
+
+    if original_tokens > available:
+        # Summarize everything but the recent turns, then recent turns oldest first
+        verbatim = min(keep_recent, len(history))
+        compacted = [summarize_turn(turn) for turn in history[:-verbatim or None]] + list(history[len(history) - verbatim:])
+        while verbatim and _history_tokens(compacted) > available:
+            index = len(compacted) - verbatim
+            compacted[index] = summarize_turn(compacted[index])
+            verbatim -= 1
+
+    dropped = 0
+    while compacted and _history_tokens(compacted) > available:
+        compacted.pop(0)
+        dropped += 1
+
+    compacted_tokens = _history_tokens(compacted)
+    report = {
+        "budget": budget,
+        "prompt_tokens": reserved_tokens + compacted_tokens,
+        "original_prompt_tokens": reserved_tokens + original_tokens,
+        "saved_tokens": original_tokens - compacted_tokens,
+        "turns_verbatim": verbatim,
+        "turns_summarized": len(compacted) - verbatim,
+        "turns_dropped": dropped,
+        "over_budget": reserved_tokens + compacted_tokens > budget
+    }
+    return compacted, report
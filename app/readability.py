@@ -1,21 +1,20 @@
+import os
 import json
-from openai import OpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
 from app.ai_helper import validate_code_content
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def get_readability_score(code):
-    """Evaluate code readability using gpt-4o-mini."""
-    validation_result = validate_code_content(code)
-    if not validation_result["is_safe"]:
-        return {"error": validation_result["message"]}
-    
-    prompt = (
+from app.llm import chat_completion, is_json_block, submit
+from app.metrics import OPENAI_RETRIES
+from app.prompt_budget import count_tokens
+
+# Snippets are packed into one prompt up to this many tokens of code, and this many snippets
+READABILITY_BATCH_TOKENS = int(os.getenv("READABILITY_BATCH_TOKENS", "6000"))
+READABILITY_BATCH_SIZE = int(os.getenv("READABILITY_BATCH_SIZE", "20"))
+# Response tokens allowed per snippet in a batch (a single snippet keeps the old 500)
+READABILITY_ITEM_RESPONSE_TOKENS = int(os.getenv("READABILITY_ITEM_RESPONSE_TOKENS", "150"))
+READABILITY_MAX_ATTEMPTS = 3
+
+def build_readability_prompt(code):
+    """Prompt for scoring a single snippet."""
+    return (
         "Evaluate the readability and maintainability of the following Python code on a scale of 1-10. "
         "Consider factors like code clarity, structure, naming conventions, and comments. "
         "Return a JSON object with: "
@@ -24,30 +23,133 @@ def get_readability_score(code):
         "Ensure the response is valid JSON, enclosed in ```json\n...\n```. "
         f"Code: ```\n{code}\n```"
     )
-    
+
+def build_batch_prompt(snippets):
+    """Prompt for scoring several snippets at once, numbered from 1."""
+    parts = [
+        f"Evaluate the readability and maintainability of each of the following {len(snippets)} Python snippets "
+        "on a scale of 1-10, independently of each other. "
+        "Consider factors like code clarity, structure, naming conventions, and comments. "
+        "Return a JSON object with: "
+        "'results': A list with one object per snippet, each with "
+        "'id': The snippet number, "
+        "'score': An integer from 1 to 10, "
+        "'justification': A short string explaining the score. "
+        "Ensure the response is valid JSON, enclosed in ```json\n...\n```."
+    ]
+    for number, code in enumerate(snippets, start=1):
+        parts.append(f"Snippet {number}: ```\n{code}\n```")
+    return "\n".join(parts)
+
+def _valid_score(item):
+    """True if a parsed item has an integer 1-10 score and a justification."""
+    return (
+        isinstance(item, dict)
+        and isinstance(item.get("score"), int) and not isinstance(item["score"], bool)
+        and 1 <= item["score"] <= 10
+        and isinstance(item.get("justification"), str)
+    )
+
+def _errors(message, count):
+    return [{"error": message} for _ in range(count)]
+
+def _request_scores(snippets, use_cache):
+    """One LLM call for a batch; returns a result dict per snippet (with "error" for failures)."""
+    if len(snippets) == 1:
+        prompt, max_tokens = build_readability_prompt(snippets[0]), 500
+    else:
+        prompt = build_batch_prompt(snippets)
+        max_tokens = READABILITY_ITEM_RESPONSE_TOKENS * len(snippets) + 100
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": prompt}],
-            max_tokens=500,
-            temperature=0.3
-        )
-        result = response.choices[0].message.content
-        print("Readability raw response:", result)  # Debug
-        
-        # Extract JSON from ```json``` block
-        if result.startswith("```json\n") and result.endswith("\n```"):
-            result = result[7:-4].strip()
-        else:
-            return {"error": "AI response not in expected JSON format"}
-        
-        try:
-            parsed_result = json.loads(result)
-            return parsed_result
-        except json.JSONDecodeError as e:
-            print("Readability JSON parsing error:", str(e))
-            return {"error": f"Invalid AI response format: {str(e)}"}
-    
+        result = chat_completion(prompt, max_tokens=max_tokens, use_cache=use_cache, operation="readability")
     except Exception as e:
         print("Readability API error:", str(e))
-        return {"error": f"OpenAI API failed: {str(e)}"}
\ No newline at end of file
+        return _errors(f"OpenAI API failed: {str(e)}", len(snippets))
+    print("Readability raw response:", result)  # Debug
+
+    # Extract JSON from ```json``` block
+    if not is_json_block(result):
+        return _errors("AI response not in expected JSON format", len(snippets))
+    try:
+        parsed_result = json.loads(result[7:-4].strip())
+    except json.JSONDecodeError as e:
+        print("Readability JSON parsing error:", str(e))
+        return _errors(f"Invalid AI response format: {str(e)}", len(snippets))
+
+    if len(snippets) == 1:
+        if not _valid_score(parsed_result):
+            return _errors("AI response has no valid score", 1)
+        return [{"score": parsed_result["score"], "justification": parsed_result["justification"]}]
+
+    scores = _errors("No score returned for this snippet", len(snippets))
+    items = parsed_result.get("results") if isinstance(parsed_result, dict) else None
+    for item in items if isinstance(items, list) else []:
+        number = item.get("id") if isinstance(item, dict) else None
+        if isinstance(number, int) and 1 <= number <= len(snippets) and _valid_score(item):
+            scores[number - 1] = {"score": item["score"], "justification": item["justification"]}
+    return scores
+
+def pack_batches(indices, snippets, token_budget=None, max_items=None):
+    """Group snippet indices into batches of at most token_budget code tokens and max_items snippets."""
+    token_budget = token_budget or READABILITY_BATCH_TOKENS
+    max_items = max_items or READABILITY_BATCH_SIZE
+    batches = []
+    current, current_tokens = [], 0
+    for index in indices:
+        tokens = count_tokens(snippets[index])
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        # An oversized snippet still gets a batch of its own
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def get_readability_scores(snippets, use_cache=True, token_budget=None, max_items=None):
+    """Score many snippets with as few gpt-4o-mini calls as the token budget allows.
+
+    Returns one result per snippet, in order: {"score", "justification"} or {"error"}.
+    Snippets whose score is missing or malformed are retried in new batches, up
+    to READABILITY_MAX_ATTEMPTS calls each; the ones already scored are not resent.
+    Unsafe snippets are rejected without a call.
+    """
+    results = [None] * len(snippets)
+    pending = []
+    for index, code in enumerate(snippets):
+        validation_result = validate_code_content(code)
+        if validation_result["is_safe"]:
+            pending.append(index)
+        else:
+            results[index] = {"error": f"Invalid code content: {validation_result['message']}"}
+
+    for attempt in range(READABILITY_MAX_ATTEMPTS):
+        if not pending:
+            break
+        batches = pack_batches(pending, snippets, token_budget, max_items)
+        if attempt:
+            # One per retried call, like record_retry, however many snippets it carries
+            OPENAI_RETRIES.inc("get_readability_scores", amount=len(batches))
+        if len(batches) == 1:
+            outcomes = [_request_scores([snippets[index] for index in batches[0]], use_cache)]
+        else:
+            # Batches are independent; send them side by side on the LLM pool
+            futures = [submit(_request_scores, [snippets[index] for index in batch], use_cache) for batch in batches]
+            outcomes = [future.result() for future in futures]
+
+        pending = []
+        for batch, scores in zip(batches, outcomes):
+            for index, score in zip(batch, scores):
+                results[index] = score
+                # API errors were already retried by the OpenAI client; retry bad or missing answers
+                if "error" in score and not score["error"].startswith("OpenAI API failed"):
+                    pending.append(index)
+        # A retry must not be answered by the same cached (bad) response
+        use_cache = False
+    return results
+
+def get_readability_score(code, use_cache=True):
+    """Evaluate code readability using gpt-4o-mini (set use_cache=False to force a fresh call)."""
+    return get_readability_scores([code], use_cache=use_cache)[0]
@@ -1,38 +1,89 @@
-from flask import Blueprint, render_template, request, jsonify, current_app, make_response
+from flask import Blueprint, Request, render_template, request, jsonify, current_app, Response, url_for, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
 import uuid
-import ast
 import json
-import inspect
-import importlib
+import zipfile
+from io import BytesIO
 from app.analyzer import analyze_code_static
+from app.cache import static_cache
+from app.parsing import parse_module
 from app.readability import get_readability_score
 from app.visualize import create_complexity_chart
-from app.ai_helper import analyze_code_with_ai, regenerate_code, load_session
+from app.llm import llm_cache
+from app.metrics import STAGE_SECONDS, render as render_metrics
+from app.jobs import job_queue
+from app.pipeline import run_pipeline, get_stages, make_deadline
+from app.stages import ANALYSIS_STAGES, STATIC_STAGE_TIMEOUT
+from app.fingerprints import index_functions, complexity_delta, function_index
+from app.project import analyze_project, iter_archive_files, iter_uploaded_files, ProjectTooLarge
+from app import ai_helper
+from app.ai_helper import regenerate_code, stream_regenerate_code, load_session, save_session, save_analysis_artifacts
 
 routes = Blueprint('routes', __name__)
 
-# Debug: Verify analyze_code_static at import
-print(f"analyze_code_static module: {analyze_code_static.__module__}")
-print(f"analyze_code_static file: {inspect.getfile(analyze_code_static)}")
-print(f"analyze_code_static signature: {inspect.signature(analyze_code_static)}")
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024  # 5MB limit
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Room for multipart boundaries, headers and other form fields around the file itself
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+# Single-file endpoints whose whole request body is capped while it is read
+UPLOAD_BODY_LIMITS = {
+    'routes.analyze': MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD,
+    'routes.submit_job': MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD,
+}
 
-def validate_python_file(file_path):
-    """Validate that the file contains valid Python code."""
+class UploadLimitedRequest(Request):
+    """Request that caps single-file upload bodies as they arrive and keeps their files in memory.
+
+    Werkzeug checks max_content_length against Content-Length up front and, for
+    chunked bodies, while reading, raising RequestEntityTooLarge either way.
+    """
+
+    @property
+    def max_content_length(self):
+        limit = UPLOAD_BODY_LIMITS.get(self.endpoint)
+        return limit if limit is not None else super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint in UPLOAD_BODY_LIMITS:
+            # The body is already capped, so the file never needs spooling to disk
+            return BytesIO()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+@routes.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({"error": "File too large (max 5MB)"}), 400
+
+def read_upload(file, limit=MAX_UPLOAD_BYTES):
+    """Read an uploaded file in bounded chunks, stopping once it exceeds limit; return (code, error)."""
+    buffer = bytearray()
+    while True:
+        chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > limit:
+            return None, "File too large (max 5MB)"
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            ast.parse(f.read())
-        return True
-    except SyntaxError:
-        return False
+        return buffer.decode('utf-8'), None
+    except UnicodeDecodeError:
+        return None, "File must be UTF-8 encoded"
 
+def retain_upload(session_id, code):
+    """Keep a copy of the analyzed code only when an upload folder is configured."""
+    folder = current_app.config.get('UPLOAD_FOLDER')
+    if not folder:
+        return
+    with STAGE_SECONDS.time("upload_save"), open(os.path.join(folder, f"{session_id}.py"), 'w', encoding='utf-8') as f:
+        f.write(code)
+
+@STAGE_SECONDS.time("validation")
 def validate_python_code(code):
-    """Validate that the code is valid Python."""
+    """Validate that the code is valid Python; return its ParsedModule, or None."""
     try:
-        ast.parse(code)
-        return True
+        return parse_module(code)
     except SyntaxError:
-        return False
+        return None
 
 @routes.route('/')
 def index():
@@ -45,54 +96,47 @@ def debug_templates():
     templates = current_app.jinja_env.list_templates()
     return jsonify({"available_templates": templates})
 
-@routes.route('/analyze', methods=['POST'])
-def analyze():
-    """Handle file upload, run static and AI analysis, and create session."""
-    file = request.files.get('file')
-    if not file or not file.filename.endswith('.py'):
-        return jsonify({"error": "Invalid file: Only .py files allowed"}), 400
-    if file.content_length > 5 * 1024 * 1024:  # 5MB limit
-        return jsonify({"error": "File too large (max 5MB)"}), 400
-    
-    # Save file
-    session_id = str(uuid.uuid4())
-    file_path = os.path.join('Uploads', f"{session_id}.py")
-    file.save(file_path)
-    
-    if not validate_python_file(file_path):
-        os.remove(file_path)
-        return jsonify({"error": "Invalid Python code"}), 400
+@routes.route('/debug_cache')
+def debug_cache():
+    """Report static analysis and LLM response cache hit/miss counters."""
+    return jsonify({
+        "static_cache": static_cache.stats(),
+        "llm_cache": llm_cache.stats(),
+        "function_index": function_index.stats()
+    })
+
+def run_analysis(code, parsed, session_id):
+    """Run every analysis stage under the request deadline and render whatever finished.
+
+    Stages that failed, timed out or were skipped are listed with their status
+    instead of failing the whole request.
+    """
+    report = run_pipeline(
+        get_stages(ANALYSIS_STAGES),
+        {"code": code, "parsed": parsed, "session_id": session_id}
+    )
+    stages = report["stages"]
+    results = report["results"]
     
-    # Read code
-    with open(file_path, 'r', encoding='utf-8') as f:
-        code = f.read()
-    
-    # Debug: Verify analyze_code_static before call
-    importlib.reload(importlib.import_module('app.analyzer'))
-    from app.analyzer import analyze_code_static
-    print(f"Runtime analyze_code_static signature: {inspect.signature(analyze_code_static)}")
-    
-    # Run static analysis
-    static_result = analyze_code_static(code)
-    if "error" in static_result:
-        os.remove(file_path)
-        return jsonify(static_result), 400
-    
-    # Run AI analysis
-    ai_result = analyze_code_with_ai(code, session_id)
-    if "error" in ai_result:
-        os.remove(file_path)
-        return jsonify(ai_result), 400
-    
-    # Run readability analysis
-    readability_result = get_readability_score(code)
-    if "error" in readability_result:
+    static_result = results.get("static") if stages["static"]["status"] == "done" else None
+    if static_result is None:
+        static_result = {
+            "complexity": {},
+            "style_issues": [],
+            "warnings": [{"line": 0, "message": f"Static analysis {stages['static']['status']}: {stages['static'].get('error', '')}"}]
+        }
+    ai_result = results.get("ai") if stages["ai"]["status"] == "done" else None
+    if ai_result is None:
+        # Keep a session so export and regenerate still work without the AI report
+        ai_result = {"bugs": [], "issues_severity": [], "optimized_code": code, "refactoring_suggestions": []}
+        save_session(session_id, code, {"error": stages["ai"].get("error", "AI analysis did not finish")}, code)
+    readability_result = results.get("readability") if stages["readability"]["status"] == "done" else None
+    if readability_result is None:
         readability_result = {"score": 0, "justification": "Readability analysis failed"}
+    complexity_chart = results.get("chart") or {"error": stages["chart"].get("error", "Chart unavailable")}
     
-    # Run complexity visualization
-    complexity_chart = create_complexity_chart(code)
-    if "error" in complexity_chart:
-        complexity_chart = {"chart_html": "<p>No complexity chart available</p>"}
+    # Persist results so /export can serve them without recomputing
+    save_analysis_artifacts(session_id, static_result, readability_result, static_result.get("complexity", {}))
     
     # Prepare AI analysis for rendering
     ai_result_render = {
@@ -109,15 +153,51 @@ def analyze():
     }
     
     # Render results with session ID and original code
-    return render_template(
-        'index.html',
-        session_id=session_id,
-        static_result=static_result,
-        ai_result=ai_result_render,
-        readability_result=readability_result,
-        complexity_chart=complexity_chart,
-        original_code=code
-    )
+    with STAGE_SECONDS.time("template_render"):
+        return render_template(
+            'index.html',
+            session_id=session_id,
+            static_result=static_result,
+            ai_result=ai_result_render,
+            readability_result=readability_result,
+            complexity_chart=complexity_chart,
+            analysis_stages=stages,
+            original_code=code
+        )
+
+@routes.route('/metrics')
+def metrics():
+    """Stage timings, OpenAI usage and SQLite latency in Prometheus text format."""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@routes.route('/analyze', methods=['POST'])
+def analyze():
+    """Handle file upload, run static and AI analysis, and create session."""
+    # UploadLimitedRequest refuses an oversized body while it is being read
+    file = request.files.get('file')
+    if not file or not file.filename.endswith('.py'):
+        return jsonify({"error": "Invalid file: Only .py files allowed"}), 400
+    
+    # Read and decode once; the code stays in memory from here on
+    with STAGE_SECONDS.time("upload_read"):
+        code, error = read_upload(file)
+    if error:
+        return jsonify({"error": error}), 400
+    
+    # Parse once; the module is shared by every stage below
+    parsed = validate_python_code(code)
+    if parsed is None:
+        return jsonify({"error": "Invalid Python code"}), 400
+    
+    # Harmful code is rejected outright rather than analyzed partially
+    with STAGE_SECONDS.time("safety_check"):
+        safety = ai_helper.validate_code_content(code, parsed.tree)
+    if not safety["is_safe"]:
+        return jsonify({"error": safety["message"]}), 400
+    
+    session_id = str(uuid.uuid4())
+    retain_upload(session_id, code)
+    return run_analysis(code, parsed, session_id)
 
 @routes.route('/analyze_code', methods=['POST'])
 def analyze_code():
@@ -126,66 +206,37 @@ def analyze_code():
     if not code:
         return jsonify({"error": "No code provided"}), 400
     
-    if not validate_python_code(code):
+    # Parse once; the module is shared by every stage below
+    parsed = validate_python_code(code)
+    if parsed is None:
         return jsonify({"error": "Invalid Python code"}), 400
     
-    # Save code to a temporary file
-    session_id = str(uuid.uuid4())
-    file_path = os.path.join('Uploads', f"{session_id}.py")
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(code)
-    
-    # Debug: Verify analyze_code_static before call
-    importlib.reload(importlib.import_module('app.analyzer'))
-    from app.analyzer import analyze_code_static
-    print(f"Runtime analyze_code_static signature: {inspect.signature(analyze_code_static)}")
-    
-    # Run static analysis
-    static_result = analyze_code_static(code)
-    if "error" in static_result:
-        os.remove(file_path)
-        return jsonify(static_result), 400
-    
-    # Run AI analysis
-    ai_result = analyze_code_with_ai(code, session_id)
-    if "error" in ai_result:
-        os.remove(file_path)
-        return jsonify(ai_result), 400
-    
-    # Run readability analysis
-    readability_result = get_readability_score(code)
-    if "error" in readability_result:
-        readability_result = {"score": 0, "justification": "Readability analysis failed"}
+    # Harmful code is rejected outright rather than analyzed partially
+    with STAGE_SECONDS.time("safety_check"):
+        safety = ai_helper.validate_code_content(code, parsed.tree)
+    if not safety["is_safe"]:
+        return jsonify({"error": safety["message"]}), 400
     
-    # Run complexity visualization
-    complexity_chart = create_complexity_chart(code)
-    if "error" in complexity_chart:
-        complexity_chart = {"chart_html": "<p>No complexity chart available</p>"}
-    
-    # Prepare AI analysis for rendering
-    ai_result_render = {
-        "bugs": ai_result.get("bugs", []),
-        "issues_severity": ai_result.get("issues_severity", []),
-        "optimized_code": ai_result.get("optimized_code", code),
-        "refactoring_suggestions": [
-            {
-                "description": sug["description"],
-                "example_code": sug.get("example_code", "")
-            }
-            for sug in ai_result.get("refactoring_suggestions", [])
-        ]
-    }
-    
-    # Render results with session ID and original code
-    return render_template(
-        'index.html',
-        session_id=session_id,
-        static_result=static_result,
-        ai_result=ai_result_render,
-        readability_result=readability_result,
-        complexity_chart=complexity_chart,
-        original_code=code
-    )
+    session_id = str(uuid.uuid4())
+    retain_upload(session_id, code)
+    return run_analysis(code, parsed, session_id)
+
+# Export is streamed in chunks of roughly this many characters
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def _stream_json(data):
+    """Yield the indented JSON encoding of data in bounded chunks."""
+    buffer = []
+    size = 0
+    for piece in json.JSONEncoder(indent=2).iterencode(data):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
 
 @routes.route('/export/<session_id>')
 def export_analysis(session_id):
@@ -194,33 +245,163 @@ def export_analysis(session_id):
     if not session:
         return jsonify({"error": "Session not found"}), 404
     
-    # Debug: Verify analyze_code_static before call
-    importlib.reload(importlib.import_module('app.analyzer'))
-    from app.analyzer import analyze_code_static
-    print(f"Runtime analyze_code_static signature: {inspect.signature(analyze_code_static)}")
-    
-    # Use stored data to avoid re-running AI analysis
     code = session["original_code"]
-    static_result = analyze_code_static(code)
-    ai_result = session.get("ai_analysis", {})
-    readability_result = get_readability_score(code)
-    complexity_chart = create_complexity_chart(code)
+    static_result = session["static_analysis"]
+    readability_result = session["readability_analysis"]
+    complexity = session["complexity"]
+    if static_result is None:
+        # Session predates stored artifacts: fall back to the (cached) analyzers
+        static_result = analyze_code_static(code)
+        complexity = static_result.get("complexity", {})
+    if readability_result is None:
+        readability_result = get_readability_score(code)
     
     export_data = {
         "original_code": code,
         "static_analysis": static_result,
-        "ai_analysis": ai_result,
+        "ai_analysis": session.get("ai_analysis", {}),
         "readability_analysis": readability_result,
         "complexity_chart": {
-            "functions": complexity_chart.get("functions", []),
-            "module_complexity": complexity_chart.get("module_complexity", 0)
+            "functions": (complexity or {}).get("functions", []),
+            "module_complexity": (complexity or {}).get("module_complexity", 0)
         }
     }
     
-    response = make_response(json.dumps(export_data, indent=2))
-    response.headers['Content-Type'] = 'application/json'
-    response.headers['Content-Disposition'] = f'attachment; filename=analysis_{session_id}.json'
-    return response
+    return Response(
+        _stream_json(export_data),
+        mimetype='application/json',
+        headers={'Content-Disposition': f'attachment; filename=analysis_{session_id}.json'}
+    )
+
+@routes.route('/analyze_project', methods=['POST'])
+def analyze_project_upload():
+    """Run static analysis over a zip archive ('archive') or several .py uploads ('files') and return a project report."""
+    archive = request.files.get('archive')
+    uploads = request.files.getlist('files')
+    if archive:
+        if not archive.filename.endswith('.zip'):
+            return jsonify({"error": "Invalid archive: Only .zip files allowed"}), 400
+        if not zipfile.is_zipfile(archive.stream):
+            return jsonify({"error": "Invalid archive: Not a zip file"}), 400
+        archive.stream.seek(0)
+        files = iter_archive_files(archive.stream)
+    elif uploads:
+        files = iter_uploaded_files(uploads)
+    else:
+        return jsonify({"error": "No project files provided"}), 400
+    
+    try:
+        report = analyze_project(files)
+    except ProjectTooLarge as e:
+        return jsonify({"error": str(e)}), 400
+    except zipfile.BadZipFile as e:
+        return jsonify({"error": f"Invalid archive: {str(e)}"}), 400
+    if not report["files"]:
+        return jsonify({"error": "No .py files found"}), 400
+    return jsonify(report)
+
+@routes.route('/functions/<session_id>')
+def session_functions(session_id):
+    """Per-function findings for the session's optimized code and the complexity delta from the original.
+
+    Only functions changed since they were last indexed are re-analyzed; pass ?ai=1 to include AI findings.
+    """
+    session = load_session(session_id)
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+    
+    try:
+        # Bounded like the static stage of an analysis; whatever isn't done by then is marked incomplete
+        deadline = make_deadline(STATIC_STAGE_TIMEOUT)
+        functions = index_functions(session["optimized_code"], ai=request.args.get('ai') == '1', deadline=deadline)
+        delta = complexity_delta(session["original_code"], session["optimized_code"], functions, deadline=deadline)
+    except SyntaxError as e:
+        return jsonify({"error": f"Optimized code is not valid Python: {str(e)}"}), 400
+    
+    return jsonify(dict(functions, complexity_delta=delta))
+
+@routes.route('/chart/<session_id>')
+def complexity_chart_data(session_id):
+    """Complexity chart spec for a session, loaded lazily by the results page (?top=N caps the functions shown)."""
+    session = load_session(session_id)
+    if not session:
+        return jsonify({"error": "Session not found"}), 404
+    
+    complexity = session["complexity"]
+    if complexity is None:
+        # Session predates stored artifacts
+        complexity = analyze_code_static(session["original_code"]).get("complexity", {})
+    chart = create_complexity_chart(session["original_code"], complexity, top_n=request.args.get('top', type=int))
+    if "error" in chart:
+        return jsonify(chart), 404
+    
+    # The spec only changes with the session, so let the browser revalidate instead of refetching
+    response = jsonify(chart)
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@routes.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue an analysis from an uploaded .py file or editor code and return its job ID."""
+    file = request.files.get('file')
+    if file:
+        if not file.filename.endswith('.py'):
+            return jsonify({"error": "Invalid file: Only .py files allowed"}), 400
+        code, error = read_upload(file)
+        if error:
+            return jsonify({"error": error}), 400
+    else:
+        code = request.form.get('code')
+        if not code:
+            return jsonify({"error": "No code provided"}), 400
+    
+    parsed = validate_python_code(code)
+    if parsed is None:
+        return jsonify({"error": "Invalid Python code"}), 400
+    
+    # Harmful code is rejected before it is queued, as in /analyze
+    with STAGE_SECONDS.time("safety_check"):
+        safety = ai_helper.validate_code_content(code, parsed.tree)
+    if not safety["is_safe"]:
+        return jsonify({"error": safety["message"]}), 400
+    
+    job = job_queue.submit(code, parsed)
+    if job is None:
+        return jsonify({"error": "Analysis queue is full, try again later"}), 503
+    return jsonify({
+        "job_id": job.job_id,
+        "session_id": job.job_id,
+        "status_url": url_for('routes.job_status', job_id=job.job_id),
+        "events_url": url_for('routes.job_events', job_id=job.job_id)
+    }), 202
+
+@routes.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Poll a job's per-stage progress and partial results."""
+    snapshot = job_queue.get(job_id)
+    if snapshot is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(snapshot)
+
+@routes.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream job progress as Server-Sent Events until the job finishes."""
+    if job_queue.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    def generate():
+        version = None
+        while True:
+            version, snapshot = job_queue.wait_for_change(job_id, version)
+            if snapshot is None:
+                return
+            yield f"data: {json.dumps(snapshot)}\n\n"
+            if snapshot["status"] in ("completed", "failed"):
+                return
+    
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 @routes.route('/regenerate', methods=['POST'])
 def regenerate():
@@ -234,4 +415,31 @@ def regenerate():
     if "error" in result:
         return jsonify(result), 400
     
-    return jsonify({"response": result})
\ No newline at end of file
+    return jsonify({"response": result})
+
+def _sse_event(event, data):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@routes.route('/regenerate/stream', methods=['POST'])
+def regenerate_stream():
+    """Stream regenerated code to the browser as Server-Sent Events (POST only: it changes the session)."""
+    session_id = request.form.get('session_id')
+    user_command = request.form.get('user_command')
+    if not session_id or not user_command:
+        return jsonify({"error": "Missing session_id or command"}), 400
+    
+    def generate():
+        for event, payload in stream_regenerate_code(session_id, user_command):
+            if event == "delta":
+                yield _sse_event("delta", {"text": payload})
+            elif event == "result":
+                yield _sse_event("done", {"response": payload})
+            else:
+                yield _sse_event("error", {"error": payload})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,119 @@
+import ast
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Verdicts kept per source hash, so every stage of a request reuses the first scan
+SAFETY_CACHE_SIZE = int(os.getenv("SAFETY_CACHE_SIZE", "256"))
+
+# Fully qualified calls that are refused; a module name covers every function in it
+DANGEROUS_CALLS = {"eval", "exec", "__import__", "importlib.import_module", "os.system", "os.popen", "subprocess"}
+# Spellings of the builtins module; builtins.exec is the same call as exec
+BUILTINS_PREFIXES = ("builtins.", "__builtins__.")
+
+# Every dangerous call, aliased or not, needs one of these words somewhere in the source
+_TRIGGER_WORDS = re.compile(r"eval|exec|__import__|import_module|system|popen|subprocess")
+
+# Substring fallback for source that does not parse, where no AST is available
+LEGACY_PATTERNS = [
+    "eval(",
+    "exec(",
+    "os.system(",
+    "subprocess.run(",
+    "subprocess.call(",
+    "subprocess.Popen(",
+    "__import__('os').system(",
+    "__import__('subprocess')."
+]
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _qualified_name(node, aliases):
+    """Dotted name a call target refers to, with import aliases resolved; None if not a plain name."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(aliases.get(node.id, node.id))
+    return ".".join(reversed(parts))
+
+def _is_dangerous(name):
+    for prefix in BUILTINS_PREFIXES:
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    return any(name == call or name.startswith(call + ".") for call in DANGEROUS_CALLS)
+
+def find_dangerous_calls(tree):
+    """Dangerous calls in a parsed module as [{"line", "call"}], in source order.
+
+    Import aliases (`import subprocess as sp`, `from os import system as run`)
+    are resolved wherever they appear in the module. Strings and comments are
+    never flagged because only real call nodes are inspected.
+    """
+    aliases = {}
+    calls = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    aliases[alias.asname] = alias.name
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            for alias in node.names:
+                aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+        elif isinstance(node, ast.Call):
+            calls.append(node)
+
+    findings = []
+    for node in calls:
+        name = _qualified_name(node.func, aliases)
+        if name is not None and _is_dangerous(name):
+            findings.append({"line": node.lineno, "call": name})
+    findings.sort(key=lambda finding: finding["line"])
+    return findings
+
+def _scan(code, tree):
+    if not _TRIGGER_WORDS.search(code):
+        # Nothing to resolve, so skip the walk (the common case for large files)
+        return {"is_safe": True, "findings": []}
+    if tree is None:
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            for pattern in LEGACY_PATTERNS:
+                if pattern in code:
+                    return {"is_safe": False, "message": f"Potentially harmful code detected: {pattern}", "findings": []}
+            return {"is_safe": True, "findings": []}
+
+    findings = find_dangerous_calls(tree)
+    if not findings:
+        return {"is_safe": True, "findings": []}
+    first = findings[0]
+    return {
+        "is_safe": False,
+        "message": f"Potentially harmful code detected: {first['call']}() on line {first['line']}",
+        "findings": findings
+    }
+
+def check_code(code, tree=None):
+    """Safety verdict for code: {"is_safe", "findings"} plus "message" when unsafe.
+
+    Pass the request's AST as `tree` to skip parsing. Verdicts are cached by
+    source hash, so later checks of the same code cost one hash.
+    """
+    key = hashlib.sha256(code.encode('utf-8', 'surrogatepass')).hexdigest()
+    with _cache_lock:
+        verdict = _cache.get(key)
+        if verdict is not None:
+            _cache.move_to_end(key)
+            return verdict
+    verdict = _scan(code, tree)
+    with _cache_lock:
+        _cache[key] = verdict
+        while len(_cache) > SAFETY_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return verdict
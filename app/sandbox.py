@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+import threading
+import multiprocessing
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; memory limits are skipped there
+    resource = None
+
+class StageTimeout(Exception):
+    """A stage ran past its time limit and was stopped."""
+
+class StageMemoryExceeded(Exception):
+    """A stage allocated more than its memory limit."""
+
+class StageFailed(Exception):
+    """A stage raised an error or its worker process died."""
+
+def _address_space_bytes():
+    """Current virtual memory size of this process, or 0 if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def _worker_main(conn):
+    """Sandbox worker loop: run (fn, args, memory_mb) requests until the pipe closes."""
+    # Analyzer debug output must not mix with reports written to stdout by the CLI tools
+    sys.stdout = sys.stderr
+    limits = resource.getrlimit(resource.RLIMIT_AS) if resource else None
+    while True:
+        try:
+            fn, args, memory_mb = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            if memory_mb and resource:
+                # The limit is headroom on top of what the worker already uses
+                limit = _address_space_bytes() + memory_mb * 1024 * 1024
+                if limits[1] != resource.RLIM_INFINITY:
+                    limit = min(limit, limits[1])
+                resource.setrlimit(resource.RLIMIT_AS, (limit, limits[1]))
+            reply = ("ok", fn(*args))
+        except MemoryError:
+            reply = ("memory", f"memory limit exceeded ({memory_mb}MB)")
+        except Exception as e:
+            reply = ("error", str(e) or type(e).__name__)
+        finally:
+            if memory_mb and resource:
+                resource.setrlimit(resource.RLIMIT_AS, limits)
+        conn.send(reply)
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+class SandboxPool:
+    """Worker processes that run CPU-heavy stages under time and memory limits.
+
+    Workers are spawned on demand up to `size` and reused; a worker whose stage
+    runs out of time or memory is killed and replaced, which is the only reliable
+    way to stop runaway pylint or radon work.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = []
+        self._count = 0
+        self._available = threading.Condition()
+
+    def _acquire(self, end):
+        with self._available:
+            while not self._idle and self._count >= self.size:
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise StageTimeout("timed out waiting for a sandbox worker")
+                self._available.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._count += 1
+        try:
+            return _Worker(self._context)
+        except Exception:
+            with self._available:
+                self._count -= 1
+                self._available.notify()
+            raise
+
+    def _release(self, worker, discard=False):
+        if discard:
+            worker.kill()
+        with self._available:
+            if discard:
+                self._count -= 1
+            else:
+                self._idle.append(worker)
+            self._available.notify()
+
+    def run(self, fn, args=(), timeout=None, memory_mb=None):
+        """Run fn(*args) in a worker; fn and args must be picklable."""
+        end = None if timeout is None else time.monotonic() + timeout
+        worker = self._acquire(end)
+        try:
+            worker.conn.send((fn, args, memory_mb))
+            if not worker.conn.poll(None if end is None else max(end - time.monotonic(), 0)):
+                self._release(worker, discard=True)
+                raise StageTimeout(f"timed out after {timeout:.0f}s")
+            status, payload = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            self._release(worker, discard=True)
+            raise StageFailed(f"sandbox worker died: {str(e) or type(e).__name__}")
+        if status == "memory":
+            # Don't trust a worker that just hit MemoryError
+            self._release(worker, discard=True)
+            raise StageMemoryExceeded(payload)
+        self._release(worker)
+        if status == "error":
+            raise StageFailed(payload)
+        return payload
+
+    def shutdown(self, wait=True):
+        """Kill every idle worker; busy ones are killed when their stage ends or times out."""
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+        for worker in idle:
+            worker.kill()
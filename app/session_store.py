@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+DB_PATH = os.getenv("ANALYZER_DB", "logs/analyzer.db")
+BUSY_TIMEOUT_MS = int(os.getenv("ANALYZER_DB_BUSY_TIMEOUT_MS", "5000"))
+# Sessions older than this are swept; 0 keeps them forever
+SESSION_TTL_DAYS = int(os.getenv("SESSION_TTL_DAYS", "30"))
+SWEEP_INTERVAL_SECONDS = 3600
+
+# The single definition of the sessions schema, used by init_db and every connection
+SESSIONS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        created_at DATETIME,
+        original_code TEXT,
+        analysis_results TEXT,
+        optimized_code TEXT,
+        conversation_history TEXT,
+        static_results TEXT,
+        readability_results TEXT,
+        complexity_data TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions (created_at);
+    CREATE TABLE IF NOT EXISTS conversation_turns (
+        session_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        created_at DATETIME,
+        user_command TEXT,
+        response TEXT,
+        PRIMARY KEY (session_id, seq)
+    ) WITHOUT ROWID;
+"""
+
+# Analysis artifacts stored alongside each session so exports don't recompute them
+SESSION_ARTIFACT_COLUMNS = ["static_results", "readability_results", "complexity_data"]
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_initialized_paths = set()
+_last_sweep = 0.0
+
+def ensure_session_columns(conn):
+    """Add artifact columns to a sessions table created by an older version."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(sessions)").fetchall()}
+    for column in SESSION_ARTIFACT_COLUMNS:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} TEXT")
+
+def migrate_history_blobs(conn):
+    """Move turns out of legacy conversation_history blobs into conversation_turns."""
+    rows = conn.execute(
+        "SELECT session_id, conversation_history FROM sessions "
+        "WHERE conversation_history IS NOT NULL AND conversation_history != '[]'"
+    ).fetchall()
+    for session_id, blob in rows:
+        try:
+            history = json.loads(blob)
+        except ValueError:
+            print("Skipping unreadable history for session", session_id)  # Debug
+            continue
+        conn.executemany(
+            "INSERT OR IGNORE INTO conversation_turns (session_id, seq, created_at, user_command, response) "
+            "VALUES (?, ?, NULL, ?, ?)",
+            [(session_id, seq, turn.get("user_command"), turn.get("response"))
+             for seq, turn in enumerate(history, start=1)]
+        )
+        conn.execute("UPDATE sessions SET conversation_history = '[]' WHERE session_id = ?", (session_id,))
+    return len(rows)
+
+def init_schema(conn):
+    """Create or migrate the schema on an open connection."""
+    conn.executescript(SESSIONS_SCHEMA)
+    ensure_session_columns(conn)
+    migrate_history_blobs(conn)
+    conn.commit()
+
+def _open(db_path):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    # Schema setup happens once per database per process, not on every write
+    with _schema_lock:
+        if db_path not in _initialized_paths:
+            init_schema(conn)
+            _initialized_paths.add(db_path)
+    return conn
+
+def get_connection(db_path=None):
+    """Return this thread's connection to the session database, opening it on first use."""
+    db_path = db_path or DB_PATH
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = _open(db_path)
+    return conn
+
+def close_connection(db_path=None):
+    """Close this thread's connection, if any."""
+    connections = getattr(_local, "connections", {})
+    conn = connections.pop(db_path or DB_PATH, None)
+    if conn is not None:
+        conn.close()
+
+def init_db(db_path=None):
+    """Initialize the session database at startup."""
+    get_connection(db_path)
+
+def sweep_expired_sessions(conn, ttl_days=None):
+    """Delete sessions older than ttl_days; return how many were removed."""
+    ttl_days = SESSION_TTL_DAYS if ttl_days is None else ttl_days
+    if ttl_days <= 0:
+        return 0
+    cutoff = f"-{int(ttl_days)} days"
+    conn.execute(
+        "DELETE FROM conversation_turns WHERE session_id IN "
+        "(SELECT session_id FROM sessions WHERE created_at < datetime('now', ?))",
+        (cutoff,)
+    )
+    cursor = conn.execute("DELETE FROM sessions WHERE created_at < datetime('now', ?)", (cutoff,))
+    conn.commit()
+    return cursor.rowcount
+
+def maybe_sweep_expired_sessions(conn):
+    """Run the retention sweep at most once per SWEEP_INTERVAL_SECONDS."""
+    global _last_sweep
+    now = time.time()
+    if now - _last_sweep < SWEEP_INTERVAL_SECONDS:
+        return 0
+    _last_sweep = now
+    try:
+        return sweep_expired_sessions(conn)
+    except sqlite3.Error as e:
+        print("Session sweep failed:", str(e))  # Debug
+        return 0
@@ -0,0 +1,42 @@
+import os
+import time
+from app import ai_helper, readability
+from app.analyzer import analyze_code_static
+from app.pipeline import register_stage
+from app.visualize import create_complexity_chart
+
+# Per-stage limits within the overall ANALYSIS_DEADLINE_SECONDS
+STATIC_STAGE_TIMEOUT = float(os.getenv("STATIC_STAGE_TIMEOUT_SECONDS", "60"))
+AI_STAGE_TIMEOUT = float(os.getenv("AI_STAGE_TIMEOUT_SECONDS", "90"))
+READABILITY_STAGE_TIMEOUT = float(os.getenv("READABILITY_STAGE_TIMEOUT_SECONDS", "60"))
+CHART_STAGE_TIMEOUT = float(os.getenv("CHART_STAGE_TIMEOUT_SECONDS", "10"))
+
+# These stages run as threads, so only their time is limited. Memory limits apply to the
+# sandboxed static tools (STATIC_TOOL_MEMORY_MB), which hold the request's largest
+# allocations; ai and readability are bounded by prompt token budgets, and the chart
+# by CHART_TOP_N, the number of functions it plots.
+
+# Stages of a full analysis, in the order they are reported
+ANALYSIS_STAGES = ["static", "chart", "ai", "readability"]
+
+def run_static(context):
+    """Static analysis; its own tools are bounded by the same request deadline."""
+    return analyze_code_static(context["code"], parsed=context.get("parsed"), deadline=context["deadline"])
+
+def run_ai(context):
+    """AI bug report and optimized code; no OpenAI call is made once the stage's time is up."""
+    deadline = min(context["deadline"], time.monotonic() + AI_STAGE_TIMEOUT)
+    return ai_helper.analyze_code_with_ai(context["code"], context["session_id"], deadline=deadline)
+
+def run_readability(context):
+    """AI readability score."""
+    return readability.get_readability_score(context["code"])
+
+def run_chart(context):
+    """Complexity chart built from the static stage's radon results."""
+    return create_complexity_chart(context.get("parsed") or context["code"], context["results"]["static"].get("complexity"))
+
+register_stage("static", run_static, STATIC_STAGE_TIMEOUT)
+register_stage("chart", run_chart, CHART_STAGE_TIMEOUT, requires=["static"])
+register_stage("ai", run_ai, AI_STAGE_TIMEOUT)
+register_stage("readability", run_readability, READABILITY_STAGE_TIMEOUT)
@@ -1,41 +1,40 @@
-import plotly.graph_objects as go
-import radon.complexity as radon_cc
+import os
+from app.parsing import ParsedModule, parse_module
 
-def create_complexity_chart(code):
-    """Create a Plotly chart for function complexity distribution."""
+# Charts show at most this many functions (the most complex ones); 0 shows all
+CHART_TOP_N = int(os.getenv("CHART_TOP_N", "50"))
+
+def create_complexity_chart(code, complexity=None, top_n=None):
+    """Create a compact chart spec for function complexity, rendered client-side with Plotly.
+
+    `code` may be source text or a ParsedModule. When the analyzer's
+    `complexity` result is passed, the chart is built from it without re-running radon.
+    Only the `top_n` most complex functions are kept, in source order.
+    """
     try:
-        cc_results = radon_cc.cc_visit(code)
-        functions = [
-            {"name": block.name, "complexity": block.complexity}
-            for block in cc_results
-            if block.classname is None
-        ]
-        
+        if complexity is not None:
+            functions = complexity.get("functions", [])
+        else:
+            parsed = code if isinstance(code, ParsedModule) else parse_module(code)
+            functions = parsed.function_complexity
+
         if not functions:
             return {"error": "No functions found for complexity analysis"}
-        
-        names = [f["name"] for f in functions]
-        complexities = [f["complexity"] for f in functions]
-        
-        fig = go.Figure(data=[
-            go.Bar(
-                x=names,
-                y=complexities,
-                marker_color='#4B8BBE',
-                text=complexities,
-                textposition='auto'
-            )
-        ])
-        fig.update_layout(
-            title="Function Complexity Distribution",
-            xaxis_title="Function Name",
-            yaxis_title="Cyclomatic Complexity",
-            plot_bgcolor='#F5F5F5',
-            paper_bgcolor='#F5F5F5',
-            font_color='#333333'
-        )
-        
-        return {"chart_html": fig.to_html(full_html=False)}
-    
+
+        top_n = CHART_TOP_N if top_n is None else top_n
+        shown = list(range(len(functions)))
+        if top_n and len(functions) > top_n:
+            shown = sorted(sorted(shown, key=lambda i: functions[i]["complexity"], reverse=True)[:top_n])
+
+        return {
+            "chart": {
+                "title": "Function Complexity Distribution",
+                "names": [functions[i]["name"] for i in shown],
+                "complexities": [functions[i]["complexity"] for i in shown],
+                "total_functions": len(functions),
+                "truncated": len(shown) < len(functions)
+            }
+        }
+
     except Exception as e:
-        return {"error": f"Failed to create complexity chart: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Failed to create complexity chart: {str(e)}"}
@@ -0,0 +1,62 @@
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from app.sandbox import SandboxPool
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+def get_executor(name, max_workers):
+    """Return a named, bounded thread pool shared for the life of the process."""
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+                _executors[name] = executor
+    return executor
+
+def get_process_pool(name, max_workers, initializer=None):
+    """Return a named process pool for CPU-bound work, shared for the life of the process.
+
+    Workers are spawned rather than forked so they don't inherit the server's threads and locks.
+    """
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=initializer
+                )
+                _executors[name] = executor
+    return executor
+
+def get_sandbox(name, size):
+    """Return a named sandbox pool for stages that must be killable, shared for the life of the process."""
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = SandboxPool(size)
+                _executors[name] = executor
+    return executor
+
+def shutdown_executors(wait=True):
+    """Shut down every shared thread, process and sandbox pool (used at exit and by tests)."""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
+
+def reset_executor(name):
+    """Drop a pool that can no longer be used (e.g. a broken process pool) so the next call builds a new one."""
+    with _executors_lock:
+        executor = _executors.pop(name, None)
+    if executor is not None:
+        executor.shutdown(wait=False)
@@ -0,0 +1,37 @@
+import pytest
+from app import llm, session_store
+from app.llm import StandInChatClient
+from app.cache import ResultCache, static_cache
+from app.fingerprints import function_index
+
+@pytest.fixture(autouse=True)
+def isolated_llm_cache(tmp_path, monkeypatch):
+    """Keep tests from reading or polluting the real LLM response cache."""
+    cache = ResultCache(db_path=str(tmp_path / "llm_cache.db"), max_entries=8, table='llm_cache', ttl=3600)
+    monkeypatch.setattr(llm, "llm_cache", cache)
+    return cache
+
+@pytest.fixture(autouse=True)
+def isolated_databases(tmp_path, monkeypatch):
+    """Point the static cache, function index and session store at scratch files instead of logs/."""
+    previous = [(cache, cache.db_path) for cache in (static_cache, function_index)]
+    static_cache.use_database(str(tmp_path / "analysis_cache.db"))
+    function_index.use_database(str(tmp_path / "function_index.db"))
+    monkeypatch.setattr(session_store, "DB_PATH", str(tmp_path / "analyzer.db"))
+    yield
+    session_store.close_connection(str(tmp_path / "analyzer.db"))
+    for cache, db_path in previous:
+        cache.use_database(db_path)
+
+@pytest.fixture
+def stand_in_client():
+    """Install a StandInChatClient as the shared client; call it with the responses to serve."""
+    installed = []
+
+    def install(*responses):
+        fake = StandInChatClient(responses)
+        installed.append(llm.use_client(fake))
+        return fake
+    yield install
+    if installed:
+        llm.use_client(installed[0])
@@ -3,8 +3,10 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import pytest
+import json
 import sqlite3
-from app.ai_helper import validate_code_content, save_session, load_session, update_session
+from app import session_store
+from app.ai_helper import validate_code_content, save_session, load_session, update_session, save_analysis_artifacts
 
 def test_validate_code_content_safe():
     code = """
@@ -40,6 +42,7 @@ def db():
             conversation_history TEXT
         )
     ''')
+    session_store.init_schema(conn)
     yield conn
     conn.close()
 
@@ -47,15 +50,15 @@ def test_save_and_load_session(db, monkeypatch):
     def mock_get_db():
         return db
     monkeypatch.setattr("app.ai_helper.get_db", mock_get_db)
-    
+
     session_id = "test-session"
     code = "def test(): pass"
     analysis_results = {"bugs": []}
     optimized_code = "def test(): return None"
-    
+
     save_session(session_id, code, analysis_results, optimized_code)
     session = load_session(session_id)
-    
+
     assert session["session_id"] == session_id
     assert session["original_code"] == code
     assert session["ai_analysis"] == analysis_results
@@ -66,6 +69,171 @@ def test_load_nonexistent_session(db, monkeypatch):
     def mock_get_db():
         return db
     monkeypatch.setattr("app.ai_helper.get_db", mock_get_db)
-    
+
     session = load_session("nonexistent")
-    assert session is None
\ No newline at end of file
+    assert session is None
+
+@pytest.fixture
+def file_db(tmp_path, monkeypatch):
+    from app import session_store
+    db_path = str(tmp_path / "analyzer.db")
+    monkeypatch.setattr(session_store, "DB_PATH", db_path)
+    yield db_path
+    session_store.close_connection(db_path)
+
+def test_save_analysis_artifacts(file_db):
+    save_session("artifacts", "def test(): pass", {"bugs": []}, "def test(): pass")
+    assert load_session("artifacts")["static_analysis"] is None
+
+    static_result = {"complexity": {"functions": [], "module_complexity": 1}, "style_issues": [], "warnings": []}
+    save_analysis_artifacts("artifacts", static_result, {"score": 8}, static_result["complexity"])
+    session = load_session("artifacts")
+    assert session["static_analysis"] == static_result
+    assert session["readability_analysis"] == {"score": 8}
+    assert session["complexity"] == {"functions": [], "module_complexity": 1}
+
+def test_old_sessions_table_is_migrated(file_db):
+    conn = sqlite3.connect(file_db)
+    conn.execute(
+        "CREATE TABLE sessions (session_id TEXT PRIMARY KEY, created_at TEXT, original_code TEXT, "
+        "analysis_results TEXT, optimized_code TEXT, conversation_history TEXT)"
+    )
+    conn.commit()
+    conn.close()
+    save_session("old", "x = 1", {}, "x = 1")
+    save_analysis_artifacts("old", {}, {"score": 5}, {})
+    assert load_session("old")["readability_analysis"] == {"score": 5}
+
+def test_update_session_appends_turns(file_db):
+    save_session("turns", "x = 1", {}, "x = 1")
+    for i in range(5):
+        update_session("turns", f"x = {i + 2}", f"step {i}")
+
+    session = load_session("turns")
+    assert session["optimized_code"] == "x = 6"
+    assert [turn["user_command"] for turn in session["conversation_history"]] == [f"step {i}" for i in range(5)]
+    assert load_session("turns", history_limit=2)["conversation_history"] == [
+        {"user_command": "step 3", "response": "x = 5"},
+        {"user_command": "step 4", "response": "x = 6"}
+    ]
+
+    update_session("missing", "x = 0", "ignored")
+    assert load_session("missing") is None
+
+def test_late_save_keeps_artifacts_and_turns(file_db):
+    save_session("late", "x = 1", {"error": "AI analysis timed out"}, "x = 1")
+    save_analysis_artifacts("late", {"warnings": []}, {"score": 6}, {"module_complexity": 1})
+    update_session("late", "x = 2", "rename")
+
+    # The abandoned AI stage finishes afterwards and saves its own result
+    save_session("late", "x = 1", {"bugs": []}, "x = 1  # optimized")
+    session = load_session("late")
+    assert session["ai_analysis"] == {"bugs": []}
+    assert session["static_analysis"] == {"warnings": []}
+    assert session["readability_analysis"] == {"score": 6}
+    assert session["optimized_code"] == "x = 2"
+    assert session["conversation_history"] == [{"user_command": "rename", "response": "x = 2"}]
+
+def test_history_blobs_are_migrated_to_turns(file_db):
+    conn = sqlite3.connect(file_db)
+    conn.execute(
+        "CREATE TABLE sessions (session_id TEXT PRIMARY KEY, created_at TEXT, original_code TEXT, "
+        "analysis_results TEXT, optimized_code TEXT, conversation_history TEXT)"
+    )
+    history = [{"user_command": "first", "response": "x = 2"}, {"user_command": "second", "response": "x = 3"}]
+    conn.execute(
+        "INSERT INTO sessions VALUES ('legacy', datetime('now'), 'x = 1', '{}', 'x = 3', ?)",
+        (json.dumps(history),)
+    )
+    conn.commit()
+    conn.close()
+
+    assert load_session("legacy")["conversation_history"] == history
+    update_session("legacy", "x = 4", "third")
+    assert load_session("legacy", history_limit=1)["conversation_history"] == [{"user_command": "third", "response": "x = 4"}]
+
+def test_stream_regenerate_code_persists_on_completion(file_db, stand_in_client):
+    from app.ai_helper import stream_regenerate_code
+    save_session("stream", "def f(): pass", {}, "def f(): pass")
+    fake = stand_in_client('```json\n{"optimized_code": "def f():\\n    return None", "explanation": "Explicit return"}\n```')
+
+    events = list(stream_regenerate_code("stream", "be explicit"))
+    deltas = [payload for event, payload in events if event == "delta"]
+    assert len(deltas) > 1
+    event, result = events[-1]
+    assert event == "result"
+    assert result["optimized_code"] == "def f():\n    return None"
+    assert result["explanation"] == "Explicit return"
+    assert result["prompt_budget"]["saved_tokens"] == 0
+    assert fake.calls[0]["stream"] is True
+
+    session = load_session("stream")
+    assert session["optimized_code"] == "def f():\n    return None"
+    assert session["conversation_history"] == [{"user_command": "be explicit", "response": "def f():\n    return None"}]
+
+def test_stream_regenerate_code_bad_response_not_persisted(file_db, stand_in_client):
+    from app.ai_helper import stream_regenerate_code
+    save_session("stream-bad", "def f(): pass", {}, "def f(): pass")
+    stand_in_client("not json at all")
+    events = list(stream_regenerate_code("stream-bad", "change it"))
+    assert events[-1] == ("error", "AI response not in expected JSON format")
+    assert load_session("stream-bad")["conversation_history"] == []
+
+def test_analyze_code_with_ai_chunked(monkeypatch):
+    import re
+    from app import ai_helper
+    saved = {}
+
+    def fake_chat_completion(prompt, max_tokens, use_cache=True, **kwargs):
+        start, end = map(int, re.search(r"lines (\d+)-(\d+)", prompt).groups())
+        body = {"bugs": [{"line_number": 1, "description": f"chunk {start}", "severity": "low"}],
+                "refactoring_suggestions": [], "issues_severity": [], "optimized_code": None}
+        return "```json\n" + json.dumps(body) + "\n```"
+    monkeypatch.setattr(ai_helper, "chat_completion", fake_chat_completion)
+    monkeypatch.setattr(ai_helper, "save_session", lambda *args: saved.setdefault("args", args))
+    monkeypatch.setattr(ai_helper, "AI_CHUNK_TOKENS", 50)
+
+    code = "".join(f"def f{n}(a, b):\n    total = a + b * {n}\n    return total\n\n" for n in range(8))
+    result = ai_helper.analyze_code_with_ai(code, "chunked", chunked=True)
+    starts = [bug["line_number"] for bug in result["bugs"]]
+    assert result["chunks"] > 1
+    assert starts == sorted(starts) and starts[0] == 1
+    assert all(bug["description"] == f"chunk {bug['line_number']}" for bug in result["bugs"])
+    assert result["optimized_code"] == code
+    assert saved["args"][0] == "chunked"
+
+def test_chunks_are_cancelled_at_the_deadline(monkeypatch):
+    import time
+    from app import ai_helper
+    sent = []
+
+    def slow_chat_completion(prompt, max_tokens, use_cache=True, **kwargs):
+        sent.append(prompt)
+        time.sleep(0.2)
+        return "```json\n{}\n```"
+    monkeypatch.setattr(ai_helper, "chat_completion", slow_chat_completion)
+    # More chunks than the chunk pool has workers (which may already exist at its default size)
+    code = "".join(f"def f{n}(a, b):\n    total = a + b * {n}\n    return total\n\n" for n in range(ai_helper.AI_CHUNK_WORKERS * 3))
+    start = time.monotonic()
+    result = ai_helper.analyze_in_chunks(code, max_tokens=20, deadline=time.monotonic() + 0.3)
+    assert result == {"error": ai_helper.DEADLINE_EXCEEDED_ERROR}
+    assert time.monotonic() - start < 1
+    time.sleep(0.5)
+    # The first wave ran; the queued chunks were cancelled or stopped at the deadline
+    assert len(sent) <= ai_helper.AI_CHUNK_WORKERS * 2
+
+def test_no_retry_after_the_deadline(monkeypatch):
+    import time
+    from tenacity import wait_none
+    from app import ai_helper
+    attempts = []
+
+    def failing_chat_completion(prompt, max_tokens, use_cache=True, **kwargs):
+        attempts.append(prompt)
+        time.sleep(0.1)
+        raise RuntimeError("rate limited")
+    monkeypatch.setattr(ai_helper, "chat_completion", failing_chat_completion)
+    monkeypatch.setattr(ai_helper.request_analysis.retry, "wait", wait_none())
+    with pytest.raises(RuntimeError):
+        ai_helper.request_analysis("x = 1\n", use_cache=False, deadline=time.monotonic() + 0.05)
+    assert len(attempts) == 1
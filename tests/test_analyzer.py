@@ -1,5 +1,4 @@
-import pytest
-from app.analyzer import analyze_code
+from app.analyzer import analyze_code_static as analyze_code
 
 def test_analyze_code_valid():
     code = """
@@ -21,4 +20,66 @@ def test_analyze_code_invalid():
     code = "def invalid():"  # Missing indentation
     result = analyze_code(code)
     assert "error" in result
-    assert "Invalid Python code" in result["error"]
\ No newline at end of file
+    assert "Invalid Python code" in result["error"]
+
+def test_analyze_code_parallel_matches_sequential():
+    code = "import os\ndef example_function(lst):\n    if lst:\n        return lst\n    return []\n"
+    parallel = analyze_code(code, use_cache=False, parallel=True)
+    sequential = analyze_code(code, use_cache=False, parallel=False)
+    assert parallel == sequential
+
+def test_analyze_code_isolates_tool_failures(monkeypatch):
+    from app import analyzer
+
+    def broken_radon(parsed):
+        raise RuntimeError("boom")
+    analyzers = [
+        (name, label, broken_radon if name == "radon" else fn)
+        for name, label, fn in analyzer.STATIC_ANALYZERS
+    ]
+    monkeypatch.setattr(analyzer, "STATIC_ANALYZERS", analyzers)
+    # Radon always runs in-process; keep the linters there too so no sandbox workers start
+    monkeypatch.setattr(analyzer, "STATIC_ANALYSIS_ISOLATION", "thread")
+    result = analyze_code("def test():\n    pass\n", use_cache=False)
+    assert result["complexity"] == {}
+    assert {"line": 0, "message": "Radon failed: boom"} in result["warnings"]
+    assert len(result["style_issues"]) > 0
+
+def test_analyze_code_reports_flake8_lines():
+    code = "def first():\n    return 1\ndef second():\n    return 2\n"
+    result = analyze_code(code, use_cache=False)
+    assert {"line": 3, "message": "expected 2 blank lines, found 0"} in result["style_issues"]
+    assert not any("Flake8 failed" in w["message"] for w in result["warnings"])
+
+def test_analyze_code_reports_tool_timeout(monkeypatch):
+    import time
+    from app import analyzer
+
+    def slow_radon(parsed):
+        time.sleep(2)
+        return {"functions": [], "module_complexity": 0}
+    analyzers = [
+        (name, label, slow_radon if name == "radon" else fn)
+        for name, label, fn in analyzer.STATIC_ANALYZERS
+    ]
+    monkeypatch.setattr(analyzer, "STATIC_ANALYZERS", analyzers)
+    monkeypatch.setattr(analyzer, "STATIC_ANALYSIS_ISOLATION", "thread")
+    monkeypatch.setitem(analyzer.STATIC_TOOL_TIMEOUTS, "radon", 0.2)
+    result = analyze_code("def test():\n    pass\n", use_cache=False)
+    assert result["stages"]["radon"]["status"] == "timeout"
+    assert {"line": 0, "message": "Radon stopped: timed out after 0.2s"} in result["warnings"]
+    assert result["stages"]["pylint"] == {"status": "done"}
+    assert len(result["style_issues"]) > 0
+
+def test_only_source_analyzers_run_in_the_sandbox():
+    from app import analyzer
+    stages = {stage.name: stage for stage in analyzer._tool_stages("process")}
+    assert stages["pylint"].isolated and stages["pylint"].run is analyzer._pylint_issues
+    assert stages["flake8"].isolated and stages["flake8"].run is analyzer._flake8_issues
+    assert not stages["radon"].isolated
+
+def test_static_analysis_pool_uses_its_own_size():
+    from app import analyzer
+    from app.workers import get_executor
+    analyze_code("x = 1\n", use_cache=False, isolation="thread")
+    assert get_executor("static-analysis", 99)._max_workers == analyzer.STATIC_ANALYSIS_WORKERS
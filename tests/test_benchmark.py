@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import ast
+from app.benchmark import make_corpus, run_benchmarks, compare, FAKE_LLM_RESPONSE
+from app.llm import StandInChatClient
+
+def test_corpus_is_valid_python_within_size():
+    for size in [512, 10 * 1024]:
+        code = make_corpus(size)
+        ast.parse(code)
+        assert len(code) <= size
+        assert make_corpus(size) == code
+
+def test_stand_in_client_reports_usage():
+    fake = StandInChatClient(default=FAKE_LLM_RESPONSE)
+    response = fake.create(model="m", messages=[{"role": "system", "content": "x" * 40}], max_tokens=10, temperature=0)
+    assert response.usage.prompt_tokens == 10
+    assert json.loads(response.choices[0].message.content[7:-4])["score"] == 7
+    streamed = list(fake.create(model="m", messages=[{"role": "system", "content": "x"}], max_tokens=10, stream=True))
+    assert ''.join(chunk.choices[0].delta.content for chunk in streamed if chunk.choices) == FAKE_LLM_RESPONSE
+    assert streamed[-1].usage.completion_tokens == len(FAKE_LLM_RESPONSE) // 4
+
+def test_run_benchmarks_offline():
+    report = run_benchmarks(["tiny"], ["parse", "static", "chart", "route"], iterations=1, llm_latency=0, isolation="thread")
+    by_stage = {result["stage"]: result for result in report["results"]}
+    assert by_stage["static"]["statuses"] == {"pylint": "done", "flake8": "done", "radon": "done"}
+    assert {"pylint", "flake8", "radon"} <= set(by_stage["static"]["substages_seconds"])
+    assert by_stage["route"]["statuses"] == {"http": 200}
+    assert "ai" in by_stage["route"]["substages_seconds"]
+    assert by_stage["parse"]["peak_memory_bytes"] > 0
+    assert by_stage["chart"]["latency_seconds"]["median"] > 0
+    assert report["config"]["llm_calls"] >= 2
+    json.dumps(report)
+
+def test_compare_flags_slowdowns():
+    def doc(median):
+        return {"results": [{"corpus": "tiny", "stage": "static", "latency_seconds": {"median": median}}]}
+    assert compare(doc(1.1), doc(1.0), threshold=0.2) == []
+    regressions = compare(doc(1.5), doc(1.0), threshold=0.2)
+    assert regressions[0]["stage"] == "static" and regressions[0]["ratio"] == 1.5
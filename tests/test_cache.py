@@ -0,0 +1,55 @@
+import pytest
+from app.cache import ResultCache, make_cache_key
+from app import analyzer
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(db_path=str(tmp_path / "cache.db"), max_entries=2)
+
+def test_make_cache_key_depends_on_code_and_config():
+    key = make_cache_key("x = 1\n", {"pylint": "2.17.4"})
+    assert key == make_cache_key("x = 1\n", {"pylint": "2.17.4"})
+    assert key != make_cache_key("x = 2\n", {"pylint": "2.17.4"})
+    assert key != make_cache_key("x = 1\n", {"pylint": "3.0.0"})
+
+def test_lru_eviction_falls_back_to_sqlite(cache):
+    cache.set("a", {"value": 1})
+    cache.set("b", {"value": 2})
+    cache.set("c", {"value": 3})
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get("a") == {"value": 1}
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["misses"] == 1
+
+def test_cache_survives_restart(cache):
+    cache.set("key", {"complexity": {}})
+    restarted = ResultCache(db_path=cache.db_path)
+    assert restarted.get("key") == {"complexity": {}}
+    assert restarted.stats()["disk_hits"] == 1
+
+def test_analyze_code_static_uses_cache(cache, monkeypatch):
+    monkeypatch.setattr(analyzer, "static_cache", cache)
+    calls = []
+    original = analyzer._run_static_analysis
+
+    def counting_run(code, *args):
+        calls.append(code)
+        return original(code, *args)
+    monkeypatch.setattr(analyzer, "_run_static_analysis", counting_run)
+
+    code = "def test():\n    pass\n"
+    first = analyzer.analyze_code_static(code)
+    second = analyzer.analyze_code_static(code)
+    assert first == second
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+def test_disk_tier_is_size_bounded(tmp_path):
+    cache = ResultCache(db_path=str(tmp_path / "bounded.db"), max_entries=1, max_disk_entries=2)
+    for key in ["a", "b", "c"]:
+        cache.set(key, key)
+    restarted = ResultCache(db_path=cache.db_path)
+    assert restarted.get("a") is None
+    assert restarted.get("c") == "c"
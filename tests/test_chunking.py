@@ -0,0 +1,64 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.chunking import chunk_module, merge_chunk_results, remap_line, CodeChunk
+
+def make_module(functions, body_lines=10):
+    parts = ["import os\n\n"]
+    for n in range(functions):
+        body = "".join(f"    value_{i} = os.path.join('a', str({i}))\n" for i in range(body_lines))
+        parts.append(f"def function_{n}():\n{body}    return value_0\n\n")
+    return "".join(parts)
+
+def test_small_module_is_one_chunk():
+    code = make_module(2)
+    chunks = chunk_module(code, max_tokens=10000)
+    assert len(chunks) == 1
+    assert chunks[0].code == code
+
+def test_chunks_follow_function_boundaries_and_cover_file():
+    code = make_module(6)
+    chunks = chunk_module(code, max_tokens=300)
+    assert len(chunks) > 1
+    assert "".join(chunk.code for chunk in chunks) == code
+    assert chunks[0].start_line == 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.start_line == previous.end_line + 1
+        # Every chunk after the first starts with a whole function
+        assert chunk.code.lstrip().startswith("def function_")
+
+def test_oversized_class_is_split_by_method():
+    methods = "".join(
+        f"    def method_{n}(self):\n" + "".join(f"        self.v{i} = {i} * {n}\n" for i in range(15)) + "\n"
+        for n in range(6)
+    )
+    code = f"class Big:\n    \"\"\"Doc.\"\"\"\n\n{methods}"
+    chunks = chunk_module(code, max_tokens=300)
+    assert len(chunks) > 1
+    assert chunks[0].code.startswith("class Big:")
+    assert "".join(chunk.code for chunk in chunks) == code
+
+def test_remap_line_clamps_to_chunk():
+    chunk = CodeChunk("a\nb\nc\n", 11, 13)
+    assert remap_line(1, chunk) == 11
+    assert remap_line("3", chunk) == 13
+    assert remap_line(99, chunk) == 13
+    assert remap_line(None, chunk) is None
+
+def test_merge_chunk_results_remaps_and_keeps_failed_chunks():
+    chunks = [CodeChunk("x = 1\n", 1, 1), CodeChunk("y = 2\nz = 3\n", 2, 3), CodeChunk("w = 4\n", 4, 4)]
+    results = [
+        {"bugs": [{"line_number": 1, "description": "a", "severity": "low"}], "refactoring_suggestions": [],
+         "issues_severity": [{"issue": "a", "severity": "low"}], "optimized_code": "x = 1"},
+        {"bugs": [{"line_number": 2, "description": "b", "severity": "high"}],
+         "refactoring_suggestions": [{"description": "r", "example_code": ""}],
+         "issues_severity": [], "optimized_code": "y = 2\nz = 3\n"},
+        {"error": "OpenAI API failed: timeout"}
+    ]
+    merged = merge_chunk_results(chunks, results)
+    assert [bug["line_number"] for bug in merged["bugs"]] == [1, 3]
+    assert len(merged["refactoring_suggestions"]) == 1
+    assert merged["optimized_code"] == "x = 1\ny = 2\nz = 3\nw = 4\n"
+    assert merged["chunk_errors"] == [{"start_line": 4, "end_line": 4, "error": "OpenAI API failed: timeout"}]
+    assert merged["chunks"] == 3
@@ -0,0 +1,93 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app import cli
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "a.py").write_text("def a(x):\n    return x\n")
+    (tmp_path / "b.py").write_text("def b(x):\n    if x:\n        return 1\n    return 0\n")
+    (tmp_path / "__pycache__").mkdir()
+    (tmp_path / "__pycache__" / "skip.py").write_text("x = 1\n")
+    (tmp_path / "notes.txt").write_text("not python")
+    return tmp_path
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+def test_iter_python_files_skips_caches_and_excludes(tree):
+    assert list(cli.iter_python_files(str(tree))) == ["b.py", "pkg/a.py"]
+    assert list(cli.iter_python_files(str(tree), exclude=["pkg/*"])) == ["b.py"]
+
+def test_manifest_makes_second_run_incremental(tree, executor, monkeypatch):
+    results, reanalyzed = cli.run(str(tree), jobs=2, executor=executor)
+    assert [result["file"] for result in results] == ["b.py", "pkg/a.py"]
+    assert reanalyzed == 2
+    assert os.path.exists(tree / cli.MANIFEST_NAME)
+
+    submitted = []
+    original_submit = executor.submit
+    monkeypatch.setattr(executor, "submit", lambda fn, path, data: submitted.append(path) or original_submit(fn, path, data))
+    (tree / "pkg" / "a.py").write_text("def a(x):\n    return x + 1\n")
+    results, reanalyzed = cli.run(str(tree), jobs=2, executor=executor)
+    assert submitted == ["pkg/a.py"]
+    assert reanalyzed == 1
+    assert len(results) == 2
+
+def test_manifest_ignored_when_configuration_changes(tree, executor):
+    cli.run(str(tree), jobs=2, executor=executor)
+    manifest_path = tree / cli.MANIFEST_NAME
+    manifest = json.loads(manifest_path.read_text())
+    manifest["config"]["static"] = "stale"
+    manifest_path.write_text(json.dumps(manifest))
+    assert cli.run(str(tree), jobs=2, executor=executor)[1] == 2
+
+def test_failed_results_are_not_kept_in_manifest(tree, executor, monkeypatch):
+    (tree / "broken.py").write_text("def broken(:\n")
+    analyze = cli.analyze_project_file
+
+    def flaky(path, data):
+        result = analyze(path, data)
+        if path == "b.py":
+            result["static_analysis"]["stages"]["pylint"] = {"status": "timeout", "error": "timed out after 30s"}
+        return result
+    monkeypatch.setattr(cli, "analyze_project_file", flaky)
+    cli.run(str(tree), jobs=2, executor=executor)
+    manifest = json.loads((tree / cli.MANIFEST_NAME).read_text())
+    assert list(manifest["files"]) == ["pkg/a.py"]
+    assert cli.run(str(tree), jobs=2, executor=executor)[1] == 2
+
+def test_sarif_output():
+    results = [
+        {"file": "bad.py", "error": "Invalid Python code: oops"},
+        {"file": "big.py", "lines": 3, "function_lines": {"big": 7},
+         "static_analysis": {"complexity": {"functions": [{"name": "big", "complexity": 12}], "module_complexity": 12},
+                             "style_issues": [{"line": 2, "message": "E225 missing whitespace"}], "warnings": []},
+         "ai_analysis": {"bugs": [{"line_number": 3, "description": "Off by one", "severity": "high"}]}}
+    ]
+    sarif = cli.to_sarif(results, max_complexity=10)
+    assert sarif["version"] == "2.1.0"
+    found = [(r["ruleId"], r["level"], r["locations"][0]["physicalLocation"]["region"]["startLine"])
+             for r in sarif["runs"][0]["results"]]
+    assert found == [
+        ("analysis-error", "error", 1),
+        ("static-analysis", "warning", 2),
+        ("high-complexity", "warning", 7),
+        ("ai-bug", "error", 3)
+    ]
+
+def test_sarif_tolerates_non_integer_ai_lines():
+    result = {"file": "a.py", "static_analysis": {"complexity": {}, "style_issues": [], "warnings": []},
+              "ai_analysis": {"bugs": [{"line_number": "12-14", "description": "range"},
+                                       {"line_number": "n/a", "description": "unknown"},
+                                       {"line_number": None, "description": "missing"}]}}
+    sarif = cli.to_sarif([result])
+    lines = [r["locations"][0]["physicalLocation"]["region"]["startLine"] for r in sarif["runs"][0]["results"]]
+    assert lines == [12, 1, 1]
@@ -0,0 +1,137 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ast
+import json
+import time
+import pytest
+from app import fingerprints, ai_helper
+from app.cache import ResultCache
+from app.fingerprints import function_fingerprint, index_functions, complexity_delta
+from app.parsing import parse_module
+
+ORIGINAL = '''
+def simple(x):
+    return x + 1
+
+def branchy(items):
+    total = 0
+    for item in items:
+        if item > 0:
+            total += item
+        elif item < 0:
+            total -= item
+    return total
+
+class Box:
+    def size(self):
+        return 1
+'''
+
+OPTIMIZED = '''
+def simple(x):
+    # reformatted, same AST
+    return x  +  1
+
+def branchy(items):
+    return sum(abs(item) for item in items)
+
+class Box:
+    def size(self):
+        return 1
+
+def added(y):
+    return y if y else 0
+'''
+
+@pytest.fixture(autouse=True)
+def isolated_index(tmp_path, monkeypatch):
+    index = ResultCache(db_path=str(tmp_path / "function_index.db"), max_entries=64, table='function_index')
+    monkeypatch.setattr(fingerprints, "function_index", index)
+    return index
+
+def test_fingerprint_ignores_formatting_and_comments():
+    first = ast.parse("def f(a):\n    return a+1\n").body[0]
+    second = ast.parse("\n\ndef f(a):\n    # comment\n    return (a + 1)\n").body[0]
+    third = ast.parse("def f(a):\n    return a + 2\n").body[0]
+    assert function_fingerprint(first) == function_fingerprint(second)
+    assert function_fingerprint(first) != function_fingerprint(third)
+
+def test_only_changed_functions_are_reanalyzed(monkeypatch):
+    first = index_functions(ORIGINAL)
+    assert first["reanalyzed"] == 3 and first["reused"] == 0
+    assert [record["name"] for record in first["functions"]] == ["simple", "branchy", "Box.size"]
+
+    calls = []
+    original_analyze = fingerprints.analyze_function_static
+    monkeypatch.setattr(fingerprints, "analyze_function_static", lambda source: calls.append(source) or original_analyze(source))
+    second = index_functions(OPTIMIZED)
+    assert second["reanalyzed"] == 2 and second["reused"] == 2
+    assert any("sum(abs" in source for source in calls)
+    assert any("def added" in source for source in calls)
+
+def test_lint_lines_refer_to_the_whole_file():
+    code = "import os\n\n\ndef spaced(a):\n    return a+1  \n"
+    record = index_functions(code)["functions"][0]
+    assert record["lineno"] == 4
+    assert any(issue["line"] == 5 for issue in record["lint"])
+
+def test_method_with_column_zero_string_is_analyzed():
+    code = 'class Report:\n    def render(self):\n        text = """\nheader\n"""\n        return text\n'
+    record = index_functions(code)["functions"][0]
+    assert record["name"] == "Report.render"
+    assert record["complexity"] == 1
+    source, start = fingerprints.function_source(code.splitlines(keepends=True), parse_module(code).functions[0])
+    assert start == 2 and source.startswith("def render(self):\n    text")
+    ast.parse(source)
+
+def test_linter_config_is_fingerprinted_once_per_call(monkeypatch):
+    calls = []
+    original = fingerprints.lint_config_fingerprint
+    monkeypatch.setattr(fingerprints, "lint_config_fingerprint", lambda: calls.append(1) or original())
+    index_functions(ORIGINAL)
+    assert len(calls) == 1
+
+def test_complexity_delta():
+    delta = {entry["name"]: entry for entry in complexity_delta(ORIGINAL, OPTIMIZED)}
+    assert delta["simple"]["status"] == "unchanged" and delta["simple"]["delta"] == 0
+    assert delta["branchy"]["status"] == "changed"
+    assert delta["branchy"]["original"] > delta["branchy"]["optimized"]
+    assert delta["branchy"]["delta"] < 0
+    assert delta["added"]["status"] == "added" and delta["added"]["original"] is None
+
+def test_ai_findings_cached_per_function(monkeypatch):
+    requested = []
+
+    def fake_chat_completion(prompt, max_tokens, use_cache=True, **kwargs):
+        requested.append(prompt)
+        body = {"bugs": [{"line_number": 2, "description": "d", "severity": "low"}], "issues_severity": [],
+                "refactoring_suggestions": [], "optimized_code": ""}
+        return "```json\n" + json.dumps(body) + "\n```"
+    monkeypatch.setattr(ai_helper, "chat_completion", fake_chat_completion)
+
+    result = index_functions(ORIGINAL, ai=True)
+    assert len(requested) == 3
+    branchy = result["functions"][1]
+    assert branchy["ai_findings"]["bugs"][0]["line_number"] == branchy["lineno"] + 1
+
+    index_functions(OPTIMIZED, ai=True)
+    assert len(requested) == 5
+
+
+def test_functions_not_analyzed_by_the_deadline_are_marked(monkeypatch):
+    original_analyze = fingerprints.analyze_function_static
+
+    def slow_analyze(source):
+        time.sleep(0.5)
+        return original_analyze(source)
+    monkeypatch.setattr(fingerprints, "analyze_function_static", slow_analyze)
+
+    started = time.monotonic()
+    result = index_functions(ORIGINAL, deadline=time.monotonic() + 0.1)
+    assert time.monotonic() - started < 0.5
+    assert result["reanalyzed"] == 0 and result["incomplete"] == 3
+    branchy = result["functions"][1]
+    assert branchy["error"] == "Not analyzed: request deadline exceeded"
+    assert branchy["complexity"] > 1 and branchy["lint"] == []
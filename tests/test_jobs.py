@@ -0,0 +1,62 @@
+import time
+import threading
+import pytest
+from app.jobs import JobQueue
+
+@pytest.fixture
+def slow_ai(monkeypatch):
+    release = threading.Event()
+
+    def fake_analyze_code_with_ai(code, session_id, **kwargs):
+        release.wait(5)
+        return {"bugs": [], "issues_severity": [], "optimized_code": code, "refactoring_suggestions": []}
+    monkeypatch.setattr("app.ai_helper.analyze_code_with_ai", fake_analyze_code_with_ai)
+    monkeypatch.setattr("app.readability.get_readability_score", lambda code: {"score": 7, "justification": "ok"})
+    monkeypatch.setattr("app.ai_helper.save_analysis_artifacts", lambda *args: None)
+    return release
+
+def wait_until(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_static_results_available_before_ai(slow_ai):
+    queue = JobQueue(max_workers=2)
+    job = queue.submit("def test():\n    pass\n")
+    assert wait_until(lambda: queue.get(job.job_id)["stages"]["static"]["status"] == "done")
+    snapshot = queue.get(job.job_id)
+    assert snapshot["status"] == "running"
+    assert snapshot["stages"]["ai"]["status"] == "running"
+    assert snapshot["stages"]["static"]["result"]["complexity"]["module_complexity"] == 1
+
+    slow_ai.set()
+    assert wait_until(lambda: queue.get(job.job_id)["status"] == "completed")
+    snapshot = queue.get(job.job_id)
+    assert snapshot["stages"]["readability"]["result"]["score"] == 7
+    assert snapshot["stages"]["ai"]["status"] == "done"
+
+def test_queue_rejects_when_full(slow_ai):
+    queue = JobQueue(max_workers=1, max_pending=1)
+    assert queue.submit("x = 1\n") is not None
+    assert queue.submit("x = 2\n") is None
+    slow_ai.set()
+
+def test_unknown_job():
+    assert JobQueue().get("missing") is None
+
+def test_ai_failure_keeps_static_results(monkeypatch):
+    from app import ai_helper
+    monkeypatch.setattr("app.ai_helper.analyze_code_with_ai", lambda code, session_id, **kwargs: {"error": "OpenAI API failed: offline"})
+    monkeypatch.setattr("app.readability.get_readability_score", lambda code: {"score": 7, "justification": "ok"})
+    queue = JobQueue(max_workers=1)
+    job = queue.submit("def test():\n    pass\n")
+    assert wait_until(lambda: queue.get(job.job_id)["status"] in ("completed", "failed"))
+    snapshot = queue.get(job.job_id)
+    assert snapshot["status"] == "completed"
+    assert snapshot["stages"]["ai"]["status"] == "failed"
+    session = ai_helper.load_session(job.job_id)
+    assert session["ai_analysis"] == {"error": "OpenAI API failed: offline"}
+    assert session["static_analysis"]["complexity"]["module_complexity"] == 1
@@ -0,0 +1,36 @@
+from app.linters import get_pylint_engine, get_flake8_engine
+
+def test_pylint_engine_reports_issues():
+    code = "def test():\n    pass\n"
+    messages = get_pylint_engine().check(code)
+    symbols = [message.symbol for message in messages]
+    assert "missing-module-docstring" in symbols
+    assert "missing-function-docstring" in symbols
+    assert all(message.line >= 1 for message in messages)
+
+def test_pylint_engine_is_reused_without_leaking_state():
+    engine = get_pylint_engine()
+    assert get_pylint_engine() is engine
+    engine.check("import os\n")
+    messages = engine.check('"""Clean module."""\n')
+    assert messages == []
+
+def test_flake8_engine_checks_source_in_memory(monkeypatch):
+    engine = get_flake8_engine()
+
+    def no_disk(*args, **kwargs):
+        raise AssertionError("flake8 engine should not read from disk")
+    monkeypatch.setattr("flake8.processor.FileProcessor.read_lines", no_disk)
+    code = "import os\ndef f( a ):\n    return a  # noqa: E501\nx=1\n"
+    violations = engine.check(code)
+    found = [(v.code, v.line_number) for v in violations]
+    assert ("F401", 1) in found
+    assert ("E302", 2) in found
+    assert ("E201", 2) in found
+    assert ("E225", 4) in found
+    assert found == sorted(found, key=lambda item: item[1])
+
+def test_flake8_engine_respects_noqa():
+    violations = get_flake8_engine().check("import os  # noqa\n")
+    assert violations == []
+    assert get_flake8_engine() is get_flake8_engine()
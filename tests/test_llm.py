@@ -0,0 +1,52 @@
+from app import llm
+
+def test_chat_completion_uses_shared_client(stand_in_client):
+    fake = stand_in_client("hello")
+    assert llm.chat_completion("prompt", max_tokens=10) == "hello"
+    assert fake.calls[0]["model"] == llm.DEFAULT_MODEL
+    assert fake.calls[0]["max_tokens"] == 10
+
+
+JSON_RESPONSE = '```json\n{"score": 7, "justification": "ok"}\n```'
+
+def test_chat_completion_cache_hit(stand_in_client, isolated_llm_cache):
+    fake = stand_in_client(JSON_RESPONSE)
+    assert llm.chat_completion("same prompt", max_tokens=50) == JSON_RESPONSE
+    assert llm.chat_completion("same prompt", max_tokens=50) == JSON_RESPONSE
+    assert len(fake.calls) == 1
+    stats = isolated_llm_cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+def test_chat_completion_key_includes_parameters(stand_in_client):
+    fake = stand_in_client(JSON_RESPONSE, JSON_RESPONSE)
+    llm.chat_completion("prompt", max_tokens=50)
+    llm.chat_completion("prompt", max_tokens=60)
+    assert len(fake.calls) == 2
+
+def test_chat_completion_opt_out_and_uncacheable(stand_in_client):
+    fake = stand_in_client(JSON_RESPONSE, JSON_RESPONSE, "not json", "not json")
+    llm.chat_completion("prompt", max_tokens=50, use_cache=False)
+    llm.chat_completion("prompt", max_tokens=50, use_cache=False)
+    llm.chat_completion("other", max_tokens=50)
+    llm.chat_completion("other", max_tokens=50)
+    assert len(fake.calls) == 4
+
+def test_llm_cache_ttl_expiry(tmp_path, monkeypatch):
+    from app.cache import ResultCache
+    cache = ResultCache(db_path=str(tmp_path / "ttl.db"), ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr("app.cache.time.time", lambda: now[0])
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+    now[0] += 11
+    assert cache.get("key") is None
+    assert cache.stats()["misses"] == 1
+
+def test_readability_offline(stand_in_client):
+    from app.readability import get_readability_score
+    fake = stand_in_client(JSON_RESPONSE)
+    code = "def add(a, b):\n    return a + b\n"
+    assert get_readability_score(code)["score"] == 7
+    assert get_readability_score(code)["score"] == 7
+    assert len(fake.calls) == 1
@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from io import BytesIO
+from app import metrics, llm
+from app.metrics import Counter, Histogram, render
+from app import create_app
+
+@pytest.fixture
+def scratch_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, "_registry", [])
+
+def test_histogram_renders_cumulative_buckets(scratch_metrics):
+    histogram = Histogram("demo_seconds", "Demo.", ["stage"], buckets=(0.1, 1))
+    histogram.observe(0.05, "pylint")
+    histogram.observe(0.5, "pylint")
+    histogram.observe(5, "pylint")
+    text = render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{stage="pylint",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="pylint",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="pylint",le="+Inf"} 3' in text
+    assert 'demo_seconds_sum{stage="pylint"} 5.55' in text
+    assert 'demo_seconds_count{stage="pylint"} 3' in text
+
+def test_counter_and_timer(scratch_metrics):
+    counter = Counter("demo_calls", "Demo.", ["outcome"])
+    counter.inc("ok")
+    counter.inc("ok", amount=2)
+    histogram = Histogram("demo_timed_seconds", "Demo.")
+
+    @histogram.time()
+    def work():
+        return 42
+    assert work() == 42
+    text = render()
+    assert "# TYPE demo_calls_total counter" in text
+    assert 'demo_calls_total{outcome="ok"} 3' in text
+    assert "demo_timed_seconds_count 1" in text
+
+def test_chat_completion_records_outcomes(stand_in_client):
+    stand_in_client("```json\n{}\n```")
+    before = metrics.OPENAI_REQUESTS._values.get(("analysis", "ok"), 0)
+    llm.chat_completion("prompt", max_tokens=10, operation="analysis")
+    llm.chat_completion("prompt", max_tokens=10, operation="analysis")
+    assert metrics.OPENAI_REQUESTS._values[("analysis", "ok")] == before + 1
+    assert metrics.OPENAI_REQUESTS._values[("analysis", "cached")] >= 1
+
+def test_metrics_endpoint_reports_request_stages(monkeypatch):
+    monkeypatch.setattr("app.ai_helper.analyze_code_with_ai", lambda code, session_id, **kwargs: {"bugs": []})
+    monkeypatch.setattr("app.readability.get_readability_score", lambda code: {"score": 5, "justification": "ok"})
+    client = create_app().test_client()
+    upload = (BytesIO(b"def f():\n    return 1\n"), 'sample.py')
+    assert client.post('/analyze', data={'file': upload}, content_type='multipart/form-data').status_code == 200
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    for stage in ["upload_read", "validation", "pylint", "flake8", "radon", "ai", "template_render"]:
+        assert f'analyzer_stage_duration_seconds_count{{stage="{stage}"}}' in text
+    assert 'sqlite_query_duration_seconds_count{store="sessions",operation="write"}' in text
+
+def test_openai_retries_are_counted(monkeypatch):
+    from tenacity import wait_none
+    from app import ai_helper
+    replies = [RuntimeError("rate limited"), "```json\n{\"bugs\": []}\n```"]
+
+    def flaky_chat_completion(prompt, max_tokens, use_cache=True, **kwargs):
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+    monkeypatch.setattr(ai_helper, "chat_completion", flaky_chat_completion)
+    monkeypatch.setattr(ai_helper.request_analysis.retry, "wait", wait_none())
+    before = metrics.OPENAI_RETRIES._values.get(("request_analysis",), 0)
+    assert ai_helper.request_analysis("x = 1\n", use_cache=False) == {"bugs": []}
+    assert metrics.OPENAI_RETRIES._values[("request_analysis",)] == before + 1
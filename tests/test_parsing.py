@@ -0,0 +1,30 @@
+import pytest
+from app.parsing import parse_module
+
+def test_parse_module_inventory_and_complexity():
+    code = """
+class Shape:
+    def area(self):
+        return 0
+
+def outer(x):
+    def inner():
+        return x
+    if x:
+        return inner()
+    return None
+"""
+    parsed = parse_module(code)
+    assert [info.qualname for info in parsed.functions] == ["Shape.area", "outer", "outer.inner"]
+    assert parsed.functions[1].lineno == 6
+    assert parsed.function_complexity == [{"name": "outer", "complexity": 2}]
+    assert parsed.source.endswith("\n")
+
+def test_radon_blocks_are_computed_once():
+    parsed = parse_module("def f():\n    return 1")
+    assert parsed.radon_blocks is parsed.radon_blocks
+    assert parsed.source == "def f():\n    return 1\n"
+
+def test_parse_module_invalid():
+    with pytest.raises(SyntaxError):
+        parse_module("def invalid():")
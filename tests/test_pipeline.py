@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import threading
+import pytest
+from app.pipeline import Stage, run_pipeline, make_deadline
+
+def stage(name, run, timeout=5, requires=()):
+    return Stage(name, run, timeout, None, tuple(requires), False)
+
+def test_slow_stage_times_out_with_partial_results():
+    release = threading.Event()
+    stages = [
+        stage("fast", lambda context: {"value": 1}),
+        stage("slow", lambda context: release.wait(10), timeout=0.2),
+        stage("after_slow", lambda context: "never", requires=["slow"]),
+    ]
+    start = time.monotonic()
+    report = run_pipeline(stages, {"code": ""})
+    release.set()
+    assert time.monotonic() - start < 2
+    assert report["results"] == {"fast": {"value": 1}}
+    assert report["stages"]["fast"]["status"] == "done"
+    assert report["stages"]["slow"] == {"status": "timeout", "elapsed": pytest.approx(0.2, abs=0.5), "error": "timed out after 0.2s"}
+    assert report["stages"]["after_slow"]["status"] == "skipped"
+    assert not report["deadline_exceeded"]
+
+def test_request_deadline_bounds_every_stage():
+    release = threading.Event()
+    stages = [stage("a", lambda context: release.wait(10)), stage("b", lambda context: release.wait(10))]
+    report = run_pipeline(stages, {"code": ""}, deadline=make_deadline(0.2))
+    release.set()
+    assert report["deadline_exceeded"]
+    assert {state["status"] for state in report["stages"].values()} == {"timeout"}
+
+def test_error_results_and_exceptions_fail_only_their_stage():
+    def boom(context):
+        raise RuntimeError("boom")
+    stages = [
+        stage("error", lambda context: {"error": "bad input"}),
+        stage("raises", boom),
+        stage("uses_results", lambda context: sorted(context["results"]), requires=["ok"]),
+        stage("ok", lambda context: 1),
+    ]
+    report = run_pipeline(stages, {"code": ""}, parallel=False)
+    assert report["stages"]["error"]["error"] == "bad input"
+    assert report["stages"]["raises"] == {"status": "failed", "elapsed": pytest.approx(0, abs=1), "error": "boom"}
+    assert report["results"]["uses_results"] == ["error", "ok"]
+
+def test_callbacks_report_progress():
+    events = []
+    run_pipeline(
+        [stage("one", lambda context: 1)], {"code": ""},
+        on_start=lambda name: events.append(("start", name)),
+        on_done=lambda name, state, output: events.append((state["status"], name, output))
+    )
+    assert events == [("start", "one"), ("done", "one", 1)]
+
+def test_memory_limit_requires_isolation():
+    from app.pipeline import register_stage
+    with pytest.raises(ValueError):
+        register_stage("unbounded", lambda context: None, 5, memory_mb=64)
+
+def test_pool_size_bounds_the_named_pool():
+    from app.workers import get_executor
+    run_pipeline([stage("only", lambda context: 1)], {"code": ""}, pool="test-sized", pool_size=1)
+    assert get_executor("test-sized", 8)._max_workers == 1
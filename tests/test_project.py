@@ -0,0 +1,43 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app import project
+from app.project import analyze_project, iter_archive_files, ProjectTooLarge
+
+SIMPLE = b"def simple(x):\n    return x\n"
+BRANCHY = b"def branchy(x):\n    if x > 1:\n        return 1\n    elif x < 0:\n        return -1\n    return 0\n"
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+def test_iter_archive_files_skips_non_python():
+    archive = make_zip({"pkg/a.py": SIMPLE, "README.md": b"docs", "pkg/": b""})
+    assert list(iter_archive_files(archive)) == [("pkg/a.py", SIMPLE)]
+
+def test_report_aggregates_files():
+    files = [("b.py", BRANCHY), ("a.py", SIMPLE), ("broken.py", b"def oops(:\n")]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        report = analyze_project(iter(files), max_workers=2, executor=executor)
+    assert [result["file"] for result in report["files"]] == ["a.py", "b.py", "broken.py"]
+    assert report["totals"]["files"] == 3
+    assert report["totals"]["analyzed"] == 2
+    assert report["totals"]["failed"] == 1
+    assert report["totals"]["functions"] == 2
+    assert report["worst_functions"][0] == {"file": "b.py", "name": "branchy", "complexity": 3}
+    assert "Invalid Python code" in report["files"][2]["error"]
+
+def test_total_size_limit(monkeypatch):
+    monkeypatch.setattr(project, "PROJECT_MAX_TOTAL_BYTES", len(SIMPLE) + 1)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(ProjectTooLarge):
+            analyze_project(iter([("a.py", SIMPLE), ("b.py", SIMPLE)]), max_workers=1, executor=executor)
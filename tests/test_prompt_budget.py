@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.prompt_budget import count_tokens, compact_history
+
+def make_history(turns, lines=40):
+    code = "\n".join(f"value_{i} = compute(value_{i - 1})" for i in range(lines))
+    return [{"user_command": f"step {n}", "response": code} for n in range(turns)]
+
+def test_count_tokens_grows_with_text():
+    assert count_tokens("") == 0
+    assert 0 < count_tokens("def f(): pass") < count_tokens("def f(): pass\n" * 10)
+
+def test_history_within_budget_is_untouched():
+    history = make_history(2, lines=2)
+    compacted, report = compact_history(history, budget=10000)
+    assert compacted == history
+    assert report["saved_tokens"] == 0
+    assert report["turns_verbatim"] == 2
+
+def test_older_turns_are_summarized_recent_kept():
+    history = make_history(10)
+    one_turn = count_tokens(str(history[0]))
+    compacted, report = compact_history(history, budget=one_turn * 3, keep_recent=2)
+    assert compacted[-2:] == history[-2:]
+    assert all("summary" in turn and "response" not in turn for turn in compacted[:-2])
+    assert [turn["user_command"] for turn in compacted][-1] == "step 9"
+    assert report["turns_verbatim"] == 2
+    assert report["saved_tokens"] > 0
+    assert report["prompt_tokens"] <= report["budget"]
+
+def test_oldest_turns_dropped_when_summaries_do_not_fit():
+    history = make_history(50)
+    compacted, report = compact_history(history, budget=300, reserved_tokens=100)
+    assert report["turns_dropped"] > 0
+    assert len(compacted) + report["turns_dropped"] == 50
+    assert compacted[-1]["user_command"] == "step 49"
+    assert report["prompt_tokens"] <= 300
+    assert not report["over_budget"]
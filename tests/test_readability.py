@@ -1,8 +1,7 @@
-import pytest
-from app.readability import get_readability_score
-from unittest.mock import patch
+import json
+from app.readability import get_readability_score, get_readability_scores, pack_batches
 
-def test_readability_valid():
+def test_readability_valid(stand_in_client):
     code = """
 def example_function(lst):
     for i in range(len(lst)):
@@ -10,22 +9,71 @@ def example_function(lst):
             lst[i] = 0
     return lst
 """
-    with patch("app.readability.client.chat.completions.create") as mock_create:
-        mock_create.return_value.choices = [
-            type("obj", (), {"message": type("obj", (), {"content": """```json
+    stand_in_client("""```json
 {
     "score": 6,
     "justification": "Readable but could use better naming."
 }
-```"""})})
-        ]
-        result = get_readability_score(code)
-        assert "score" in result
-        assert result["score"] == 6
-        assert "justification" in result
+```""")
+    result = get_readability_score(code)
+    assert "score" in result
+    assert result["score"] == 6
+    assert "justification" in result
 
 def test_readability_invalid_content():
     code = "eval('malicious')"
     result = get_readability_score(code)
     assert "error" in result
-    assert "Invalid code content" in result["error"]
\ No newline at end of file
+    assert "Invalid code content" in result["error"]
+
+def batch_response(*items):
+    return "```json\n" + json.dumps({"results": [
+        {"id": number, "score": score, "justification": "ok"} for number, score in items
+    ]}) + "\n```"
+
+def test_batch_packs_snippets_into_one_call(stand_in_client):
+    fake = stand_in_client(batch_response((1, 7), (2, 4), (3, 9)))
+    snippets = ["def a():\n    return 1\n", "x=1\n", "def c(value):\n    return value\n"]
+    results = get_readability_scores(snippets)
+    assert [result["score"] for result in results] == [7, 4, 9]
+    assert len(fake.calls) == 1
+    assert "Snippet 3:" in fake.calls[0]["messages"][0]["content"]
+
+def test_batch_retries_only_failed_items(stand_in_client):
+    single = "```json\n" + json.dumps({"score": 5, "justification": "retried"}) + "\n```"
+    fake = stand_in_client(batch_response((1, 8), (3, 6), (2, "high")), single)
+    results = get_readability_scores(["a = 1\n", "b = 2\n", "c = 3\n"])
+    assert results == [
+        {"score": 8, "justification": "ok"},
+        {"score": 5, "justification": "retried"},
+        {"score": 6, "justification": "ok"},
+    ]
+    # The retry carries only the snippet whose score was malformed
+    assert "b = 2" in fake.calls[1]["messages"][0]["content"]
+    assert "a = 1" not in fake.calls[1]["messages"][0]["content"]
+
+def test_batches_respect_token_budget():
+    snippets = ["x = 1\n" * 50, "y = 2\n" * 50, "z = 3\n"]
+    assert pack_batches(range(3), snippets, token_budget=200) == [[0], [1, 2]]
+    assert pack_batches(range(3), snippets, token_budget=10_000, max_items=2) == [[0, 1], [2]]
+
+def test_unsafe_snippets_are_not_sent(stand_in_client):
+    fake = stand_in_client("```json\n" + json.dumps({"score": 6, "justification": "fine"}) + "\n```")
+    results = get_readability_scores(["eval('x')\n", "ok = True\n"])
+    assert "Invalid code content" in results[0]["error"]
+    assert results[1]["score"] == 6
+    assert len(fake.calls) == 1
+
+def test_single_snippet_malformed_score_is_retried(stand_in_client):
+    fake = stand_in_client('```json\n["not", "an", "object"]\n```', '```json\n{"score": "high"}\n```', '```json\n{"score": 7, "justification": "ok"}\n```')
+    assert get_readability_score("def f():\n    return 1\n") == {"score": 7, "justification": "ok"}
+    assert len(fake.calls) == 3
+
+def test_retries_counted_per_call(stand_in_client):
+    from app.metrics import OPENAI_RETRIES
+    before = OPENAI_RETRIES._values.get(("get_readability_scores",), 0)
+    fake = stand_in_client(batch_response((1, "high"), (2, "high"), (3, 6)), batch_response((1, 5), (2, 4)))
+    results = get_readability_scores(["a = 1\n", "b = 2\n", "c = 3\n"])
+    assert [result["score"] for result in results] == [5, 4, 6]
+    assert len(fake.calls) == 2
+    assert OPENAI_RETRIES._values[("get_readability_scores",)] == before + 1
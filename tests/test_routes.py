@@ -1,5 +1,7 @@
 import pytest
 import os
+import json
+import importlib
 from io import BytesIO
 from app import create_app
 
@@ -22,7 +24,7 @@ def test_index(client):
 
 def test_analyze_valid_file(client, monkeypatch):
     # Mock analyze_code_with_ai to avoid OpenAI API calls
-    def mock_analyze_code_with_ai(code, session_id):
+    def mock_analyze_code_with_ai(code, session_id, **kwargs):
         return {
             "bugs": [],
             "issues_severity": [],
@@ -30,12 +32,12 @@ def test_analyze_valid_file(client, monkeypatch):
             "refactoring_suggestions": []
         }
     monkeypatch.setattr("app.ai_helper.analyze_code_with_ai", mock_analyze_code_with_ai)
-    
+
     # Create a temporary sample.py
     sample_code = 'def example_function(lst):\n    return [x for x in lst]\n'
     with open('sample.py', 'w', encoding='utf-8') as f:
         f.write(sample_code)
-    
+
     try:
         with open('sample.py', 'rb') as f:
             data = {'file': (f, 'sample.py')}
@@ -54,9 +56,63 @@ def test_analyze_invalid_file(client):
     assert response.status_code == 400
     assert b"Invalid file: Only .py files allowed" in response.data
 
+def test_analyze_rejects_oversized_upload(client):
+    data = {'file': (BytesIO(b"x = 1\n" * (1024 * 1024)), 'big.py')}
+    response = client.post('/analyze', content_type='multipart/form-data', data=data)
+    assert response.status_code == 400
+    assert b"File too large" in response.data
+
+def test_analyze_caps_chunked_upload_without_content_length(app):
+    from werkzeug.test import EnvironBuilder, run_wsgi_app
+    data = {'file': (BytesIO(b"x = 1\n" * (1024 * 1024)), 'big.py')}
+    environ = EnvironBuilder(path='/analyze', method='POST', data=data).get_environ()
+    body = environ['wsgi.input'].read()
+    # A chunked request: no Content-Length, the server terminates the stream
+    del environ['CONTENT_LENGTH']
+    environ['wsgi.input_terminated'] = True
+    environ['wsgi.input'] = BytesIO(body)
+    app_iter, status, headers = run_wsgi_app(app, environ)
+    assert status.startswith("400")
+    assert json.loads(b"".join(app_iter)) == {"error": "File too large (max 5MB)"}
+    routes_module = importlib.import_module("app.routes")
+    assert environ['wsgi.input'].tell() <= routes_module.UPLOAD_BODY_LIMITS['routes.analyze'] + routes_module.UPLOAD_CHUNK_SIZE * 4
+    assert environ['wsgi.input'].tell() < len(body)
+
+def test_upload_files_stay_in_memory(app):
+    from flask import request
+    with app.test_request_context('/analyze', method='POST'):
+        assert isinstance(request._get_file_stream(4 * 1024 * 1024, "text/x-python", "a.py"), BytesIO)
+    with app.test_request_context('/analyze_project', method='POST'):
+        assert request.max_content_length is None
+
+def test_read_upload_stops_at_limit():
+    from werkzeug.datastructures import FileStorage
+    routes_module = importlib.import_module("app.routes")
+    assert routes_module.read_upload(FileStorage(BytesIO(b"x = 1\n")), limit=10) == ("x = 1\n", None)
+    assert routes_module.read_upload(FileStorage(BytesIO(b"x" * 11)), limit=10) == (None, "File too large (max 5MB)")
+    assert routes_module.read_upload(FileStorage(BytesIO(b"\xff\xfe")), limit=10) == (None, "File must be UTF-8 encoded")
+
+def test_analyze_retains_upload_only_when_configured(app, client, monkeypatch, tmp_path):
+    monkeypatch.setattr("app.ai_helper.analyze_code_with_ai", lambda code, session_id, **kwargs: {"bugs": []})
+    monkeypatch.setattr("app.readability.get_readability_score", lambda code: {"score": 5, "justification": "ok"})
+    code = b"def f():\n    return 1\n"
+    assert app.config['UPLOAD_FOLDER'] is None
+    response = client.post('/analyze', content_type='multipart/form-data', data={'file': (BytesIO(code), 'a.py')})
+    assert response.status_code == 200
+
+    retained = tmp_path / "uploads"
+    retained.mkdir()
+    app.config['UPLOAD_FOLDER'] = str(retained)
+    response = client.post('/analyze', content_type='multipart/form-data', data={'file': (BytesIO(code), 'a.py')})
+    assert response.status_code == 200
+    response = client.post('/analyze', content_type='multipart/form-data', data={'file': (BytesIO(b"eval('1')\n"), 'b.py')})
+    assert response.status_code == 400
+    kept = list(retained.iterdir())
+    assert len(kept) == 1 and kept[0].read_bytes() == code
+
 def test_analyze_code_valid(client, monkeypatch):
     # Mock analyze_code_with_ai
-    def mock_analyze_code_with_ai(code, session_id):
+    def mock_analyze_code_with_ai(code, session_id, **kwargs):
         return {
             "bugs": [],
             "issues_severity": [],
@@ -64,7 +120,7 @@ def test_analyze_code_valid(client, monkeypatch):
             "refactoring_suggestions": []
         }
     monkeypatch.setattr("app.ai_helper.analyze_code_with_ai", mock_analyze_code_with_ai)
-    
+
     code = "def test():\n    pass\n"
     response = client.post('/analyze_code', data={'code': code})
     assert response.status_code == 200
@@ -73,8 +129,157 @@ def test_analyze_code_valid(client, monkeypatch):
     assert b"static_result" in response.data
     assert b"ai_result" in response.data
 
+def test_analyze_code_renders_partial_results_when_ai_fails(client, monkeypatch):
+    monkeypatch.setattr("app.ai_helper.analyze_code_with_ai", lambda code, session_id, **kwargs: {"error": "AI analysis failed: offline"})
+    monkeypatch.setattr("app.readability.get_readability_score", lambda code: {"score": 6, "justification": "ok"})
+    code = "def partial():\n    return 1\n"
+    response = client.post('/analyze_code', data={'code': code})
+    assert response.status_code == 200
+    assert b"ai: failed" in response.data
+    assert b"static: done" in response.data
+    assert b"Missing module docstring" in response.data
+
+def test_analyze_code_rejects_harmful_code(client):
+    response = client.post('/analyze_code', data={'code': "import os\nos.system('ls')\n"})
+    assert response.status_code == 400
+    assert b"Potentially harmful code detected" in response.data
+
 def test_analyze_code_invalid(client):
     code = "invalid python code"
     response = client.post('/analyze_code', data={'code': code})
     assert response.status_code == 400
-    assert b"Invalid Python code" in response.data
\ No newline at end of file
+    assert b"Invalid Python code" in response.data
+
+def test_export_serves_stored_results(client, monkeypatch):
+    stored = {
+        "session_id": "stored",
+        "original_code": "def test():\n    pass\n",
+        "ai_analysis": {"bugs": []},
+        "optimized_code": "def test():\n    pass\n",
+        "conversation_history": [],
+        "static_analysis": {"complexity": {"functions": [{"name": "test", "complexity": 1}], "module_complexity": 1}},
+        "readability_analysis": {"score": 9, "justification": "stored"},
+        "complexity": {"functions": [{"name": "test", "complexity": 1}], "module_complexity": 1}
+    }
+    # `app.routes` resolves to the blueprint, so patch the module itself
+    routes_module = importlib.import_module("app.routes")
+    monkeypatch.setattr(routes_module, "load_session", lambda session_id: stored)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("export should not recompute stored results")
+    monkeypatch.setattr(routes_module, "analyze_code_static", fail)
+    monkeypatch.setattr(routes_module, "get_readability_score", fail)
+
+    response = client.get('/export/stored')
+    assert response.status_code == 200
+    assert response.is_streamed
+    data = json.loads(response.get_data())
+    assert data["readability_analysis"]["score"] == 9
+    assert data["complexity_chart"]["module_complexity"] == 1
+    assert data["complexity_chart"]["functions"][0]["name"] == "test"
+
+def test_submit_and_poll_job(client, monkeypatch):
+    monkeypatch.setattr("app.ai_helper.analyze_code_with_ai", lambda code, session_id, **kwargs: {"bugs": []})
+    monkeypatch.setattr("app.readability.get_readability_score", lambda code: {"score": 5, "justification": "ok"})
+    monkeypatch.setattr("app.ai_helper.save_analysis_artifacts", lambda *args: None)
+
+    response = client.post('/jobs', data={'code': "def test():\n    pass\n"})
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+
+    events = client.get(f'/jobs/{job_id}/events').get_data(as_text=True)
+    assert '"status": "completed"' in events
+    status = client.get(f'/jobs/{job_id}').get_json()
+    assert status["stages"]["static"]["status"] == "done"
+    assert client.get('/jobs/missing').status_code == 404
+
+def test_submit_job_invalid_code(client):
+    response = client.post('/jobs', data={'code': "def invalid("})
+    assert response.status_code == 400
+
+def test_submit_job_rejects_harmful_code(client, monkeypatch):
+    routes_module = importlib.import_module("app.routes")
+    submitted = []
+    monkeypatch.setattr(routes_module.job_queue, "submit", lambda *args: submitted.append(args))
+    response = client.post('/jobs', data={'code': "import os\nos.system('ls')\n"})
+    assert response.status_code == 400
+    assert b"os.system() on line 2" in response.data
+    assert submitted == []
+
+def test_regenerate_stream_sse(client, monkeypatch):
+    def fake_stream(session_id, user_command):
+        yield "delta", "```json\n"
+        yield "delta", '{"optimized_code": "x = 1"}'
+        yield "result", {"optimized_code": "x = 1"}
+    routes_module = importlib.import_module("app.routes")
+    monkeypatch.setattr(routes_module, "stream_regenerate_code", fake_stream)
+
+    response = client.post('/regenerate/stream', data={'session_id': 'abc', 'user_command': 'simplify'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert body.count("event: delta") == 2
+    assert 'event: done\ndata: {"response": {"optimized_code": "x = 1"}}' in body
+
+def test_regenerate_stream_missing_params(client):
+    response = client.post('/regenerate/stream', data={'session_id': 'abc'})
+    assert response.status_code == 400
+
+def test_regenerate_stream_rejects_get(client):
+    response = client.get('/regenerate/stream?session_id=abc&user_command=simplify')
+    assert response.status_code == 405
+
+def test_session_functions_reports_complexity_delta(client, monkeypatch):
+    routes_module = importlib.import_module("app.routes")
+    stored = {
+        "session_id": "fn-session",
+        "original_code": "def f(x):\n    if x:\n        return 1\n    return 0\n",
+        "optimized_code": "def f(x):\n    return 1 if x else 0\n",
+        "conversation_history": []
+    }
+    monkeypatch.setattr(routes_module, "load_session", lambda session_id: stored if session_id == "fn-session" else None)
+
+    response = client.get('/functions/fn-session')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [record["name"] for record in body["functions"]] == ["f"]
+    assert body["complexity_delta"][0]["status"] == "changed"
+    assert client.get('/functions/missing').status_code == 404
+
+def test_analyze_project_zip(client):
+    buffer = BytesIO()
+    import zipfile
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr("svc/a.py", "def a(x):\n    return x\n")
+        archive.writestr("svc/b.py", "def b(x):\n    if x:\n        return 1\n    return 0\n")
+    buffer.seek(0)
+    response = client.post('/analyze_project', content_type='multipart/form-data',
+                           data={'archive': (buffer, 'svc.zip')})
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report["totals"]["analyzed"] == 2
+    assert report["worst_functions"][0]["name"] == "b"
+
+def test_analyze_project_rejects_missing_files(client):
+    assert client.post('/analyze_project', data={}).status_code == 400
+    response = client.post('/analyze_project', content_type='multipart/form-data',
+                           data={'archive': (BytesIO(b"not a zip"), 'svc.zip')})
+    assert response.status_code == 400
+
+def test_chart_endpoint_serves_compact_spec(client, monkeypatch):
+    routes_module = importlib.import_module("app.routes")
+    stored = {
+        "session_id": "chart",
+        "original_code": "def a():\n    pass\n",
+        "complexity": {"functions": [{"name": "a", "complexity": 1}, {"name": "b", "complexity": 5}], "module_complexity": 6}
+    }
+    monkeypatch.setattr(routes_module, "load_session", lambda session_id: stored if session_id == "chart" else None)
+
+    response = client.get('/chart/chart?top=1')
+    assert response.status_code == 200
+    assert response.get_json()["chart"]["names"] == ["b"]
+    assert b"<div" not in response.data
+
+    etag = response.headers["ETag"]
+    assert client.get('/chart/chart?top=1', headers={"If-None-Match": etag}).status_code == 304
+    assert client.get('/chart/missing').status_code == 404
@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ast
+import pytest
+from app import safety
+from app.safety import check_code, find_dangerous_calls
+
+def calls(code):
+    return find_dangerous_calls(ast.parse(code))
+
+def test_aliases_are_resolved():
+    code = (
+        "import subprocess as sp\n"
+        "from os import system as run\n"
+        "def f():\n"
+        "    sp.check_output(['ls'])\n"
+        "    run('ls')\n"
+    )
+    assert calls(code) == [{"line": 4, "call": "subprocess.check_output"}, {"line": 5, "call": "os.system"}]
+
+def test_strings_and_comments_are_not_flagged():
+    code = (
+        "# never call eval(x) or os.system(cmd)\n"
+        "HELP = 'use subprocess.run( carefully'\n"
+        "def evaluate(x):\n"
+        "    return x\n"
+    )
+    assert check_code(code) == {"is_safe": True, "findings": []}
+
+def test_dynamic_import_is_flagged_with_its_line():
+    result = check_code("x = 1\n__import__('os').system('ls')\n")
+    assert result["is_safe"] is False
+    assert result["message"] == "Potentially harmful code detected: __import__() on line 2"
+
+def test_verdict_is_cached_per_source(monkeypatch):
+    code = "def cached_check():\n    return eval('1')\n"
+    first = check_code(code)
+    monkeypatch.setattr(safety, "find_dangerous_calls", lambda tree: pytest.fail("scanned twice"))
+    assert check_code(code) is first
+
+def test_unparseable_source_falls_back_to_patterns():
+    assert check_code("eval('x'\n")["is_safe"] is False
+    assert check_code("def broken(:\n")["is_safe"] is True
+
+def test_builtins_module_calls_are_flagged():
+    assert calls("import builtins\nbuiltins.exec('x = 1')\n") == [{"line": 2, "call": "builtins.exec"}]
+    assert calls("from builtins import eval as e\ne('1')\n") == [{"line": 2, "call": "builtins.eval"}]
+
+def test_importlib_import_module_is_flagged():
+    result = check_code("import importlib\nimportlib.import_module('os').system('ls')\n")
+    assert result["is_safe"] is False
+    assert result["findings"][0] == {"line": 2, "call": "importlib.import_module"}
+    assert calls("from importlib import import_module\nimport_module(name)\n") == [{"line": 2, "call": "importlib.import_module"}]
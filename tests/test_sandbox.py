@@ -0,0 +1,35 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import pytest
+from app.sandbox import SandboxPool, StageTimeout, StageMemoryExceeded, StageFailed
+
+@pytest.fixture
+def sandbox():
+    pool = SandboxPool(1)
+    yield pool
+    pool.shutdown()
+
+def test_runs_function_in_worker(sandbox):
+    assert sandbox.run(sum, ([1, 2, 3],), timeout=30) == 6
+
+def test_overrunning_stage_is_killed_and_worker_replaced(sandbox):
+    # Warm the worker so the timeout measures the stage, not process startup
+    sandbox.run(abs, (-1,), timeout=30)
+    start = time.monotonic()
+    with pytest.raises(StageTimeout):
+        sandbox.run(time.sleep, (30,), timeout=0.5)
+    assert time.monotonic() - start < 5
+    assert sandbox.run(abs, (-2,), timeout=30) == 2
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="memory limits rely on RLIMIT_AS")
+def test_memory_limit_stops_stage(sandbox):
+    with pytest.raises(StageMemoryExceeded):
+        sandbox.run(bytearray, (2 * 1024 ** 3,), timeout=30, memory_mb=64)
+    assert sandbox.run(abs, (-3,), timeout=30) == 3
+
+def test_stage_errors_are_reported(sandbox):
+    with pytest.raises(StageFailed, match="invalid literal"):
+        sandbox.run(int, ("x",), timeout=30)
@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+import pytest
+from app import session_store
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    yield path
+    session_store.close_connection(path)
+
+def test_connection_is_reused_per_thread(db_path):
+    conn = session_store.get_connection(db_path)
+    assert session_store.get_connection(db_path) is conn
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(session_store.get_connection(db_path)))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+def test_connection_uses_wal_and_busy_timeout(db_path):
+    conn = session_store.get_connection(db_path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == session_store.BUSY_TIMEOUT_MS
+
+def test_schema_has_artifact_columns_and_created_at_index(db_path):
+    conn = session_store.get_connection(db_path)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+    assert set(session_store.SESSION_ARTIFACT_COLUMNS) <= columns
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(sessions)")}
+    assert "idx_sessions_created_at" in indexes
+
+def test_sweep_removes_only_expired_sessions(db_path):
+    conn = session_store.get_connection(db_path)
+    conn.execute("INSERT INTO sessions (session_id, created_at) VALUES ('old', datetime('now', '-40 days'))")
+    conn.execute("INSERT INTO sessions (session_id, created_at) VALUES ('new', datetime('now'))")
+    conn.commit()
+
+    assert session_store.sweep_expired_sessions(conn, ttl_days=30) == 1
+    remaining = [row[0] for row in conn.execute("SELECT session_id FROM sessions")]
+    assert remaining == ["new"]
+    assert session_store.sweep_expired_sessions(conn, ttl_days=0) == 0
@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import importlib
+import subprocess
+from app import create_app
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Cold `import app` must stay under this many seconds (override for slow CI machines)
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "1.0"))
+# Loaded on first use only; importing any of them at startup is a regression
+LAZY_MODULES = ["openai", "httpx", "astroid", "pylint.lint", "flake8.checker", "plotly"]
+
+COLD_IMPORT = f"""
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def cold_import():
+    env = dict(os.environ, OPENAI_API_KEY="sk-secret-test-key", PYTHONDONTWRITEBYTECODE="1")
+    output = subprocess.run(
+        [sys.executable, "-c", COLD_IMPORT], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return output, json.loads(output.strip().splitlines()[-1])
+
+def test_cold_import_is_lazy_and_within_budget():
+    output, report = cold_import()
+    assert report["loaded"] == []
+    assert report["elapsed"] < IMPORT_TIME_BUDGET
+    # No environment or client debugging at import time
+    assert "sk-secret-test-key" not in output
+    assert output.strip().count("\n") == 0
+
+def test_requests_do_not_reload_modules(monkeypatch):
+    def no_reload(module):
+        raise AssertionError(f"module reloaded during a request: {module.__name__}")
+    monkeypatch.setattr(importlib, "reload", no_reload)
+    monkeypatch.setattr("app.ai_helper.analyze_code_with_ai", lambda code, session_id, **kwargs: {"bugs": []})
+    monkeypatch.setattr("app.readability.get_readability_score", lambda code: {"score": 5, "justification": "ok"})
+
+    analyzer = importlib.import_module("app.analyzer")
+    client = create_app().test_client()
+    for _ in range(2):
+        response = client.post('/analyze_code', data={'code': "def f():\n    return 1\n"})
+        assert response.status_code == 200
+    assert importlib.import_module("app.analyzer") is analyzer
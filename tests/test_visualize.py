@@ -1,4 +1,3 @@
-import pytest
 from app.visualize import create_complexity_chart
 
 def test_complexity_chart_valid():
@@ -10,11 +9,29 @@ def example_function(lst):
     return lst
 """
     result = create_complexity_chart(code)
-    assert "chart_html" in result
-    assert "example_function" in result["chart_html"]
+    assert "chart" in result
+    assert result["chart"]["names"] == ["example_function"]
+    assert result["chart"]["complexities"] == [3]
 
 def test_complexity_chart_no_functions():
     code = "x = 1"
     result = create_complexity_chart(code)
     assert "error" in result
-    assert "No functions found" in result["error"]
\ No newline at end of file
+    assert "No functions found" in result["error"]
+
+def test_complexity_chart_from_analyzer_result(monkeypatch):
+    def fail_parse(code):
+        raise AssertionError("chart should not re-parse when complexity is given")
+    monkeypatch.setattr("app.visualize.parse_module", fail_parse)
+    complexity = {"functions": [{"name": "precomputed", "complexity": 4}], "module_complexity": 4}
+    result = create_complexity_chart("ignored", complexity)
+    assert result["chart"]["names"] == ["precomputed"]
+
+def test_complexity_chart_top_n_keeps_most_complex_in_source_order():
+    complexity = {"functions": [{"name": f"f{i}", "complexity": c} for i, c in enumerate([1, 9, 3, 7, 2])]}
+    chart = create_complexity_chart("ignored", complexity, top_n=2)["chart"]
+    assert chart["names"] == ["f1", "f3"]
+    assert chart["complexities"] == [9, 7]
+    assert chart["total_functions"] == 5
+    assert chart["truncated"] is True
+    assert create_complexity_chart("ignored", complexity, top_n=0)["chart"]["truncated"] is False